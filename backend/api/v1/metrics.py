@@ -0,0 +1,17 @@
+from common.api import *
+from modules.amap import AMAP_CIRCUIT_BREAKERS
+from modules.amap import AMAP_HEDGE_STATS
+from modules.amap import AMAP_LATENCY_TRACKER
+from modules.amap import AMAP_METRICS
+
+router = get_router()
+
+
+@router.get("", summary="获取运行指标")
+async def get_metrics(user: User = Depends(get_user)) -> dict:
+    return {
+        "amap": AMAP_METRICS.snapshot(),
+        "amap_circuit_breakers": AMAP_CIRCUIT_BREAKERS.snapshot(),
+        "amap_hedging": AMAP_HEDGE_STATS.snapshot(),
+        "amap_latency": AMAP_LATENCY_TRACKER.snapshot(),
+    }
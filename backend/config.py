@@ -71,15 +71,26 @@ class Config(BaseModel):
     llm_retry_count: int
     llm_timeout: int
     llm_temperature: float
+    llm_max_connections: int = 100  # 与LLM服务之间的最大连接数（进程内所有模型共享）
+    llm_max_keepalive_connections: int = 20  # 保持空闲的最大连接数
+    llm_keepalive_expiry: float = 60.0  # 空闲连接的保持时间（秒）
+    llm_tokenizer: str = "cl100k_base"  # Token计数使用的tiktoken编码名或模型名，heuristic表示使用估算
+    llm_history_backend: str = "memory"  # 对话历史存储后端：memory(进程内)/sqlite/database(db_uri配置的数据库)
+    llm_history_sqlite_path: str = "data/llm_history.db"  # sqlite后端的数据库文件路径
+    llm_history_load_limit: int = 200  # 恢复会话时从存储加载的最近消息条数
     # endregion
 
     # region 会话压缩配置
     compression_token_threshold_ratio: float
+    compression_background_ratio: float = 0.6  # 超过该比例时在后台提前压缩（低水位，应小于compression_token_threshold_ratio）
     compression_preserve_ratio: float
+    compression_summary_levels: int = 2  # 滚动摘要的层数（1表示只维护一份摘要）
+    compression_summary_max_tokens: int = 2000  # 单层摘要的最大token数，超过时并入上一层
     compression_min_messages: int
     compression_model_token_limit: int
     compression_enable_auto: bool
     compression_max_attempts: int
+    compression_failure_cooldown: float = 300.0  # 后台压缩连续失败达到上限后的暂停时间（秒），连续多轮失败时指数增长
     compression_min_ratio: float
     compression_max_inflation: float
     compression_preserve_system: bool
@@ -109,6 +120,25 @@ class Config(BaseModel):
     amap_retry_delay: int = 1  # 重试延迟（秒）
     amap_base_url: str = "https://restapi.amap.com"  # API基础URL
     amap_max_requests_per_second: int = 2  # 每秒最大请求数（避免配额限制）
+    amap_circuit_failure_threshold: int = 5  # 触发熔断的连续失败次数
+    amap_circuit_recovery_timeout: float = 30.0  # 熔断后进入半开探测前的等待时间（秒）
+    amap_circuit_half_open_max_calls: int = 1  # 半开状态下允许的探测请求数
+    amap_stale_cache_size: int = 256  # 熔断期间可用于降级的最近成功响应缓存条数（每个主机，0表示禁用）
+    amap_transport_mode: str = "http"  # 传输层模式：http(直连)/record(录制响应)/replay(回放录制的响应)
+    amap_fixture_dir: str = "fixtures/amap"  # 录制/回放响应文件目录
+    amap_hedge_enabled: bool = False  # 是否对延迟敏感的端点启用对冲请求
+    amap_hedge_endpoints: list[str] = ["/v3/geocode/geo", "/v3/geocode/regeo", "/v5/place/detail"]  # 启用对冲请求的端点
+    amap_hedge_percentile: float = 0.95  # 请求耗时超过该分位数后发送对冲请求
+    amap_hedge_budget_ratio: float = 0.05  # 对冲请求数占可对冲请求总数的上限
+    amap_hedge_min_samples: int = 20  # 端点至少积累多少样本后才启用对冲
+
+    @field_validator("amap_hedge_endpoints", mode="before")
+    @classmethod
+    def split_hedge_endpoints(cls, v):
+        if isinstance(v, str):
+            return [x.strip() for x in v.split(",") if x.strip()]
+        return v
+
     # endregion
 
     class Config:
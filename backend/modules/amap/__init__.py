@@ -1,8 +1,23 @@
+from .client import AMAP_CIRCUIT_BREAKERS
+from .client import AMAP_HEDGE_STATS
+from .client import AMAP_LATENCY_TRACKER
+from .client import AMAP_METRICS
 from .client import AmapAPIException
+from .client import AmapCircuitOpenException
 from .client import AmapClient
+from .client import CircuitBreakerRegistry
+from .client import HedgeStats
+from .client import LatencyTracker
 from .enums import *
 from .schemas import *
 from .services import *
+from .transport import AmapStubServer
+from .transport import AmapTransport
+from .transport import FixtureMissingError
+from .transport import HttpTransport
+from .transport import RecordingTransport
+from .transport import ReplayTransport
+from .transport import TransportMode
 
 
 class AMapSDK:
@@ -46,7 +61,23 @@ __all__ = [
     # 主SDK类
     "AMapSDK",
     "AmapAPIException",
+    "AmapCircuitOpenException",
     "AmapClient",
+    "AMAP_METRICS",
+    "AMAP_CIRCUIT_BREAKERS",
+    "CircuitBreakerRegistry",
+    "AMAP_LATENCY_TRACKER",
+    "AMAP_HEDGE_STATS",
+    "LatencyTracker",
+    "HedgeStats",
+    # 传输层
+    "AmapTransport",
+    "FixtureMissingError",
+    "HttpTransport",
+    "RecordingTransport",
+    "ReplayTransport",
+    "AmapStubServer",
+    "TransportMode",
     # 枚举
     "Language",
     "Extensions",
@@ -1,17 +1,29 @@
 import asyncio
+import copy
+import threading
 import time
 import uuid
+from collections import defaultdict
+from collections import deque
+from collections import OrderedDict
 from enum import Enum
 from typing import Any
 from urllib.parse import urljoin
+from urllib.parse import urlsplit
 
 import aiohttp
 from aiohttp import ClientSession
 from aiohttp import ClientTimeout
 from config import CONFIG
 from pydantic import BaseModel
+from utils import Histogram
 from utils import RateLimiter
 
+from .transport import AmapTransport
+from .transport import create_transport
+from .transport import FixtureMissingError
+from .transport import request_fingerprint
+
 
 class AmapAPIException(Exception):
     """高德地图API异常"""
@@ -22,6 +34,12 @@ class AmapAPIException(Exception):
         self.info_code = info_code
 
 
+class AmapCircuitOpenException(AmapAPIException):
+    """熔断器打开时快速失败的异常"""
+
+    pass
+
+
 class RequestStatus(str, Enum):
     """请求状态"""
 
@@ -32,6 +50,14 @@ class RequestStatus(str, Enum):
     TIMEOUT = "timeout"
 
 
+class CircuitState(str, Enum):
+    """熔断器状态"""
+
+    CLOSED = "closed"  # 正常放行
+    OPEN = "open"  # 熔断中，快速失败
+    HALF_OPEN = "half_open"  # 半开，放行少量探测请求
+
+
 class AmapRequest(BaseModel):
     """高德地图请求信息"""
 
@@ -104,16 +130,367 @@ class AmapRequestQueue:
         return self._queue.qsize()
 
 
+class CircuitBreaker:
+    """
+    熔断器
+
+    连续失败达到阈值后打开，打开期间所有请求快速失败；
+    经过恢复时间后进入半开状态，放行少量探测请求：探测成功则关闭，失败则重新打开。
+    只统计网络/超时等后端不可用类错误，高德返回的业务错误（如参数错误）说明后端可用，按成功处理。
+    进程内按主机共享（见 CircuitBreakerRegistry），状态变更加锁。
+    """
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float, half_open_max_calls: int = 1):
+        """
+        初始化熔断器
+
+        Args:
+            failure_threshold: 触发熔断的连续失败次数
+            recovery_timeout: 熔断后进入半开状态前的等待时间（秒）
+            half_open_max_calls: 半开状态下允许同时进行的探测请求数
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at: float | None = None
+        self._half_open_calls = 0
+        self._lock = threading.RLock()
+        # 统计信息
+        self.opened_count = 0
+        self.rejected_count = 0
+
+    @property
+    def state(self) -> CircuitState:
+        """获取当前状态（打开且已过恢复时间时视为半开）"""
+        with self._lock:
+            if self._state == CircuitState.OPEN and self._opened_at is not None:
+                if time.monotonic() - self._opened_at >= self.recovery_timeout:
+                    self._state = CircuitState.HALF_OPEN
+                    self._half_open_calls = 0
+            return self._state
+
+    def is_open(self) -> bool:
+        """是否处于熔断状态（不占用半开探测名额）"""
+        return self.state == CircuitState.OPEN
+
+    def allow_request(self) -> bool:
+        """
+        判断是否放行新请求
+
+        Returns:
+            bool: True表示放行，False表示应快速失败
+        """
+        with self._lock:
+            state = self.state
+            if state == CircuitState.CLOSED:
+                return True
+            if state == CircuitState.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            self.rejected_count += 1
+            return False
+
+    def record_success(self) -> None:
+        """记录一次成功"""
+        with self._lock:
+            if self._state == CircuitState.HALF_OPEN:
+                self._state = CircuitState.CLOSED
+                self._opened_at = None
+                self._half_open_calls = 0
+            if self._state == CircuitState.CLOSED:
+                self._consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        """记录一次失败"""
+        with self._lock:
+            if self._state == CircuitState.HALF_OPEN:
+                self._open()
+                return
+            if self._state == CircuitState.CLOSED:
+                self._consecutive_failures += 1
+                if self._consecutive_failures >= self.failure_threshold:
+                    self._open()
+
+    def _open(self) -> None:
+        """打开熔断器"""
+        self._state = CircuitState.OPEN
+        self._opened_at = time.monotonic()
+        self._half_open_calls = 0
+        self._consecutive_failures = 0
+        self.opened_count += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        """获取熔断器状态快照"""
+        with self._lock:
+            return {
+                "state": self.state.value,
+                "consecutive_failures": self._consecutive_failures,
+                "opened_count": self.opened_count,
+                "rejected_count": self.rejected_count,
+                "failure_threshold": self.failure_threshold,
+                "recovery_timeout": self.recovery_timeout,
+            }
+
+
+class CircuitBreakerRegistry:
+    """
+    熔断器注册表
+
+    客户端实例通常随请求创建和销毁，熔断状态和降级用的最近成功响应需要跨实例保持，
+    因此按高德API主机在进程内共享一个熔断器和一份响应缓存（同一主机的故障影响其所有端点）。
+    """
+
+    def __init__(self, stale_cache_size: int | None = None):
+        """
+        初始化熔断器注册表
+
+        Args:
+            stale_cache_size: 每个主机的最近成功响应缓存条数，默认使用 amap_stale_cache_size
+        """
+        self.stale_cache_size = CONFIG.amap_stale_cache_size if stale_cache_size is None else stale_cache_size
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._stale_caches: dict[str, OrderedDict[str, dict[str, Any]]] = {}
+        self._stale_served: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, host: str) -> CircuitBreaker:
+        """获取（或创建）主机的熔断器"""
+        with self._lock:
+            if host not in self._breakers:
+                self._breakers[host] = CircuitBreaker(
+                    CONFIG.amap_circuit_failure_threshold, CONFIG.amap_circuit_recovery_timeout, CONFIG.amap_circuit_half_open_max_calls
+                )
+                self._stale_caches[host] = OrderedDict()
+                self._stale_served[host] = 0
+            return self._breakers[host]
+
+    def store_stale(self, host: str, key: str, response_data: dict[str, Any]) -> None:
+        """缓存主机最近一次成功的响应（保存副本）"""
+        if self.stale_cache_size <= 0:
+            return
+        self.get(host)
+        response_data = copy.deepcopy(response_data)
+        with self._lock:
+            cache = self._stale_caches[host]
+            cache[key] = response_data
+            cache.move_to_end(key)
+            while len(cache) > self.stale_cache_size:
+                cache.popitem(last=False)
+
+    def get_stale(self, host: str, key: str) -> dict[str, Any] | None:
+        """获取缓存的响应副本，没有缓存时返回None"""
+        with self._lock:
+            if (cached := self._stale_caches.get(host, {}).get(key)) is None:
+                return None
+            self._stale_served[host] += 1
+        return copy.deepcopy(cached)
+
+    def host_snapshot(self, host: str) -> dict[str, Any]:
+        """获取主机的熔断器状态快照"""
+        breaker = self.get(host)
+        return {**breaker.snapshot(), "stale_served": self._stale_served[host], "stale_cache_size": len(self._stale_caches[host])}
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """获取各主机的熔断器状态快照"""
+        with self._lock:
+            hosts = list(self._breakers)
+        return {host: self.host_snapshot(host) for host in hosts}
+
+    def reset(self) -> None:
+        """清空所有熔断器和响应缓存"""
+        with self._lock:
+            self._breakers.clear()
+            self._stale_caches.clear()
+            self._stale_served.clear()
+
+
+class LatencyTracker:
+    """按端点记录最近请求耗时，用于计算延迟分位数（进程内共享，记录和读取加锁）"""
+
+    def __init__(self, window_size: int = 500):
+        """
+        初始化延迟统计
+
+        Args:
+            window_size: 每个端点保留的最近样本数
+        """
+        self._samples: dict[str, deque[float]] = defaultdict(lambda: deque(maxlen=window_size))
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, latency: float) -> None:
+        """记录一次请求耗时（秒）"""
+        with self._lock:
+            self._samples[endpoint].append(latency)
+
+    def count(self, endpoint: str) -> int:
+        """获取端点的样本数"""
+        with self._lock:
+            return len(self._samples.get(endpoint, ()))
+
+    def percentile(self, endpoint: str, q: float) -> float | None:
+        """
+        计算端点耗时分位数
+
+        Args:
+            endpoint: API端点
+            q: 分位数（0~1）
+
+        Returns:
+            float | None: 分位数耗时（秒），没有样本时返回None
+        """
+        with self._lock:
+            if not (samples := self._samples.get(endpoint)):
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """获取各端点的分位数快照"""
+        with self._lock:
+            endpoints = [endpoint for endpoint, samples in self._samples.items() if samples]
+        return {
+            endpoint: {"samples": self.count(endpoint), "p50": self.percentile(endpoint, 0.5), "p95": self.percentile(endpoint, 0.95)}
+            for endpoint in endpoints
+        }
+
+
+class HedgeStats:
+    """对冲请求统计与预算（进程内共享，对冲请求总数不超过可对冲请求的 amap_hedge_budget_ratio）"""
+
+    def __init__(self):
+        self.eligible_count = 0
+        self.sent_count = 0
+        self.win_count = 0
+        self._lock = threading.Lock()
+
+    def record_eligible(self) -> None:
+        """记录一个可对冲的请求"""
+        with self._lock:
+            self.eligible_count += 1
+
+    def within_budget(self) -> bool:
+        """是否还能发送对冲请求"""
+        with self._lock:
+            return self.sent_count < self.eligible_count * CONFIG.amap_hedge_budget_ratio
+
+    def record_sent(self) -> None:
+        """记录一次已发送的对冲请求"""
+        with self._lock:
+            self.sent_count += 1
+
+    def record_win(self) -> None:
+        """记录一次对冲请求先于原请求返回"""
+        with self._lock:
+            self.win_count += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        """获取对冲请求统计快照"""
+        with self._lock:
+            return {
+                "enabled": CONFIG.amap_hedge_enabled,
+                "eligible_requests": self.eligible_count,
+                "hedged_requests": self.sent_count,
+                "hedge_wins": self.win_count,
+                "budget_ratio": CONFIG.amap_hedge_budget_ratio,
+            }
+
+
+class AmapMetrics:
+    """
+    高德地图请求指标
+
+    按端点统计队列等待时间、执行时间、重试次数和最终状态，用于定位规划耗时主要花在哪些高德服务上。
+    """
+
+    def __init__(self):
+        self._endpoints: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _get_endpoint(self, endpoint: str) -> dict[str, Any]:
+        """获取（或创建）端点的统计数据"""
+        with self._lock:
+            if endpoint not in self._endpoints:
+                self._endpoints[endpoint] = {
+                    "queue_wait": Histogram(),
+                    "execution": Histogram(),
+                    "retries": 0,
+                    "retried_requests": 0,
+                    "status": {status.value: 0 for status in (RequestStatus.COMPLETED, RequestStatus.FAILED, RequestStatus.TIMEOUT)},
+                }
+            return self._endpoints[endpoint]
+
+    def record(self, request: AmapRequest) -> None:
+        """记录一个已结束请求的指标"""
+        stats = self._get_endpoint(request.endpoint)
+        if (queue_wait := request.queue_wait_time) is not None:
+            stats["queue_wait"].observe(queue_wait)
+        if (duration := request.duration) is not None:
+            stats["execution"].observe(duration)
+        if request.retry_count:
+            stats["retries"] += request.retry_count
+            stats["retried_requests"] += 1
+        stats["status"][request.status.value] += 1
+
+    def record_timeout(self, endpoint: str) -> None:
+        """记录一个等待结果超时的请求"""
+        self._get_endpoint(endpoint)["status"][RequestStatus.TIMEOUT.value] += 1
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """
+        获取各端点指标快照（按总执行时间降序）
+
+        Returns:
+            指标字典
+        """
+        with self._lock:
+            endpoints = list(self._endpoints.items())
+        result = {}
+        for endpoint, stats in sorted(endpoints, key=lambda x: x[1]["execution"].sum, reverse=True):
+            result[endpoint] = {
+                "queue_wait": stats["queue_wait"].snapshot(),
+                "execution": stats["execution"].snapshot(),
+                "retries": stats["retries"],
+                "retried_requests": stats["retried_requests"],
+                "status": dict(stats["status"]),
+            }
+        return result
+
+
+# 进程级共享指标，客户端实例通常随请求创建和销毁，指标需要跨实例累计
+AMAP_METRICS = AmapMetrics()
+# 进程级共享熔断器，按主机保持熔断状态
+AMAP_CIRCUIT_BREAKERS = CircuitBreakerRegistry()
+# 进程级共享的端点耗时统计和对冲请求统计，短生命周期的客户端也能积累足够样本，对冲预算按进程整体计算
+AMAP_LATENCY_TRACKER = LatencyTracker()
+AMAP_HEDGE_STATS = HedgeStats()
+
+
 class AmapClient:
-    """高德地图API客户端 - 集成队列和速率限制"""
+    """高德地图API客户端 - 集成队列、速率限制和熔断"""
 
-    def __init__(self, logger, session: ClientSession | None = None):
+    def __init__(
+        self,
+        logger,
+        session: ClientSession | None = None,
+        transport: AmapTransport | None = None,
+        metrics: AmapMetrics | None = None,
+        circuit_breakers: CircuitBreakerRegistry | None = None,
+        latency_tracker: LatencyTracker | None = None,
+        hedge_stats: HedgeStats | None = None,
+    ):
         """
         初始化高德地图API客户端
 
         Args:
             logger: 日志记录器
             session: 可选的aiohttp会话，如果不提供则自动创建
+            transport: 可选的传输层（录制/回放等），如果不提供则根据配置创建
+            metrics: 可选的指标收集器，如果不提供则使用进程级共享的AMAP_METRICS
+            circuit_breakers: 可选的熔断器注册表，如果不提供则使用进程级共享的AMAP_CIRCUIT_BREAKERS
+            latency_tracker: 可选的端点耗时统计，如果不提供则使用进程级共享的AMAP_LATENCY_TRACKER
+            hedge_stats: 可选的对冲请求统计，如果不提供则使用进程级共享的AMAP_HEDGE_STATS
         """
         self.logger = logger
         self.api_key = CONFIG.amap_key
@@ -125,13 +502,30 @@ class AmapClient:
         self.max_requests_per_second = CONFIG.amap_max_requests_per_second
         self._session = session
         self._own_session = session is None
+        self.transport = transport or create_transport(CONFIG.amap_transport_mode, CONFIG.amap_fixture_dir)
         # 队列和限制器（每秒限制，时间窗口1秒）
         self.rate_limiter = RateLimiter(self.max_requests_per_second, 1.0)
         self.request_queue = AmapRequestQueue()
+        # 熔断器及熔断时使用的最近成功响应缓存（按主机在进程内共享，缓存按请求指纹索引）
+        self.circuit_breakers = circuit_breakers or AMAP_CIRCUIT_BREAKERS
+        # 请求指标、延迟统计与对冲请求
+        self.metrics = metrics or AMAP_METRICS
+        self.latency_tracker = latency_tracker or AMAP_LATENCY_TRACKER
+        self.hedge_stats = hedge_stats or AMAP_HEDGE_STATS
         # 后台任务
         self._worker_task: asyncio.Task | None = None
         self._shutdown_event = asyncio.Event()
 
+    @property
+    def _host(self) -> str:
+        """当前请求的高德API主机（base_url可能在创建后被修改，如指向桩服务器）"""
+        return urlsplit(self.base_url).netloc
+
+    @property
+    def circuit_breaker(self) -> CircuitBreaker:
+        """当前主机的共享熔断器"""
+        return self.circuit_breakers.get(self._host)
+
     async def __aenter__(self):
         """异步上下文管理器入口"""
         if self._session is None:
@@ -189,6 +583,9 @@ class AmapClient:
     async def _execute_request(self, request: AmapRequest) -> None:
         """执行单个请求"""
         try:
+            # 熔断期间，队列中积压的请求直接快速失败
+            if self.circuit_breaker.is_open():
+                raise AmapCircuitOpenException("高德地图API熔断中，请求被快速拒绝")
             # 速率限制检查
             while not self.rate_limiter.can_proceed():
                 wait_time = self.rate_limiter.wait_time()
@@ -197,14 +594,33 @@ class AmapClient:
             request.status = RequestStatus.EXECUTING
             request.started_at = time.time()
             # 执行HTTP请求
-            result = await self._make_request(request.method, request.endpoint, request.params, request.data, request.headers)
+            result = await self._send_request(request)
             request.result = result
             request.status = RequestStatus.COMPLETED
             request.completed_at = time.time()
+            self.latency_tracker.record(request.endpoint, request.completed_at - request.started_at)
+            self.circuit_breaker.record_success()
+            self._store_stale(request)
             self.logger.debug(f"请求完成: {request.request_id}")
+        except AmapCircuitOpenException as e:
+            request.error = e
+            request.status = RequestStatus.FAILED
+            request.completed_at = time.time()
+            self.logger.debug(f"请求熔断: {request.request_id}")
+        except FixtureMissingError as e:
+            # 录制文件缺失不是后端故障，不计入熔断器，原样抛给调用方
+            request.error = e
+            request.status = RequestStatus.FAILED
+            request.completed_at = time.time()
+            self.logger.error(f"请求失败: {request.request_id} - {e}")
         except AmapAPIException as e:
             request.error = e
             request.completed_at = time.time()
+            # 有状态码说明高德已正常响应（业务错误），否则为网络层失败
+            if e.status_code is None:
+                self._record_failure()
+            else:
+                self.circuit_breaker.record_success()
             # 检查是否需要重试
             if e.info_code in ["10021", "10022", "10023"] and request.retry_count < self.retry_count:  # 配额相关错误
                 # 重试
@@ -224,11 +640,92 @@ class AmapClient:
             request.error = AmapAPIException(f"请求执行异常: {str(e)}")
             request.status = RequestStatus.FAILED
             request.completed_at = time.time()
+            self._record_failure()
             self.logger.exception(f"请求执行异常: {request.request_id}")
         finally:
+            # 记录指标（重新入队等待重试的请求在最终结束时再记录）
+            if request.status != RequestStatus.QUEUED:
+                self.metrics.record(request)
             # 保存结果
             await self.request_queue.set_result(request)
 
+    async def _send_request(self, request: AmapRequest) -> dict[str, Any]:
+        """
+        发送请求，对延迟敏感的端点在超过p95耗时后发送对冲请求
+
+        对冲请求与原请求竞争，取先成功返回的结果并取消另一个；
+        对冲请求总数受 amap_hedge_budget_ratio 限制，且同样受速率限制约束。
+        """
+        args = (request.method, request.endpoint, request.params, request.data, request.headers)
+        if not CONFIG.amap_hedge_enabled or request.endpoint not in CONFIG.amap_hedge_endpoints:
+            return await self._make_request(*args)
+        self.hedge_stats.record_eligible()
+        delay = None
+        if self.latency_tracker.count(request.endpoint) >= CONFIG.amap_hedge_min_samples:
+            delay = self.latency_tracker.percentile(request.endpoint, CONFIG.amap_hedge_percentile)
+        if delay is None:
+            return await self._make_request(*args)
+        primary = asyncio.create_task(self._make_request(*args))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        # 在阈值内完成、超出对冲预算或速率受限时，继续等待原请求
+        if done or not self.hedge_stats.within_budget() or not self.rate_limiter.can_proceed():
+            return await primary
+        self.hedge_stats.record_sent()
+        self.logger.debug(f"请求超过p{int(CONFIG.amap_hedge_percentile * 100)}耗时({delay:.2f}秒)，发送对冲请求: {request.request_id}")
+        hedge = asyncio.create_task(self._make_request(*args))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_stats.record_win()
+                        return task.result()
+            # 两个请求都失败时，以原请求的异常为准
+            raise primary.exception()
+        finally:
+            for task in (primary, hedge):
+                if not task.done():
+                    task.cancel()
+
+    def _record_failure(self) -> None:
+        """记录一次后端失败，必要时打开熔断器"""
+        was_open = self.circuit_breaker.is_open()
+        self.circuit_breaker.record_failure()
+        if not was_open and self.circuit_breaker.is_open():
+            self.logger.warning(f"高德地图API连续失败，熔断器打开 {self.circuit_breaker.recovery_timeout} 秒")
+
+    def _store_stale(self, request: AmapRequest) -> None:
+        """缓存最近一次成功的JSON响应，供熔断期间降级使用"""
+        if not request.result or "content" in request.result:
+            return
+        key = request_fingerprint(request.method, request.endpoint, request.params, request.data)
+        self.circuit_breakers.store_stale(self._host, key, request.result)
+
+    def _serve_stale(self, method: str, endpoint: str, params: dict[str, Any] | None, data: dict[str, Any] | None) -> dict[str, Any]:
+        """熔断期间尝试返回缓存的响应，没有缓存则快速失败"""
+        key = request_fingerprint(method, endpoint, params, data)
+        if (cached := self.circuit_breakers.get_stale(self._host, key)) is not None:
+            self.logger.debug(f"熔断中，返回缓存响应: {method} {endpoint}")
+            return cached
+        raise AmapCircuitOpenException("高德地图API熔断中，请稍后重试")
+
+    def get_metrics(self) -> dict[str, Any]:
+        """
+        获取客户端运行指标
+
+        Returns:
+            指标字典
+        """
+        return {
+            "circuit_breaker": self.circuit_breakers.host_snapshot(self._host),
+            "hedging": self.hedge_stats.snapshot(),
+            "latency": self.latency_tracker.snapshot(),
+            "endpoints": self.metrics.snapshot(),
+            "queue_size": self.request_queue.size(),
+        }
+
     def _build_url(self, endpoint: str) -> str:
         """构建完整的API URL"""
         return urljoin(self.base_url, endpoint)
@@ -288,15 +785,10 @@ class AmapClient:
 
         self.logger.debug(f"发起请求: {method} {url}, 参数: {params}")
         try:
-            async with self._session.request(method=method, url=url, params=params, json=data, headers=request_headers) as response:
-                response.raise_for_status()
-                content_type = response.headers.get("content-type", "")
-                if "application/json" in content_type:
-                    response_data = await response.json()
-                else:
-                    # 处理非JSON响应（如静态地图图片）
-                    response_data = {"status": "1", "info": "OK", "content": await response.read(), "content_type": content_type}
-                return self._handle_response(response_data)
+            response_data = await self.transport.send(self._session, method, url, params, data, request_headers)
+            return self._handle_response(response_data)
+        except (AmapAPIException, FixtureMissingError):
+            raise
         except aiohttp.ClientError as e:
             error_msg = f"HTTP请求失败: {str(e)}"
             self.logger.error(error_msg)
@@ -315,6 +807,9 @@ class AmapClient:
         headers: dict[str, str] | None = None,
     ) -> dict[str, Any]:
         """将请求加入队列并等待结果"""
+        # 熔断检查：打开时快速失败或返回缓存
+        if not self.circuit_breaker.allow_request():
+            return self._serve_stale(method, endpoint, params, data)
         # 创建请求对象
         request_id = str(uuid.uuid4())
         request = AmapRequest(
@@ -339,9 +834,12 @@ class AmapClient:
             if result_request and result_request.status in [RequestStatus.COMPLETED, RequestStatus.FAILED, RequestStatus.TIMEOUT]:
                 if result_request.status == RequestStatus.COMPLETED:
                     return result_request.result
+                elif isinstance(result_request.error, AmapCircuitOpenException):
+                    return self._serve_stale(method, endpoint, params, data)
                 else:
                     raise result_request.error or AmapAPIException("请求失败")
             await asyncio.sleep(0.1)
+        self.metrics.record_timeout(endpoint)
         raise AmapAPIException(f"请求超时: {request_id}")
 
     async def get(self, endpoint: str, params: dict[str, Any] | None = None, headers: dict[str, str] | None = None) -> dict[str, Any]:
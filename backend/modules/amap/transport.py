@@ -0,0 +1,301 @@
+import asyncio
+import base64
+import hashlib
+import json
+import random
+from enum import Enum
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+from aiohttp import ClientSession
+from aiohttp import web
+
+# 不参与请求指纹计算的参数（鉴权相关，录制与回放环境可能不同）
+_IGNORED_PARAMS = {"key", "sig"}
+
+
+class FixtureMissingError(Exception):
+    """
+    回放模式下未找到录制的响应
+
+    说明录制文件不完整（或请求参数变化导致指纹不同），属于测试环境问题而非后端故障：
+    不计入熔断器失败次数、不重试，直接抛给调用方。
+    """
+
+    def __init__(self, method: str, endpoint: str, fingerprint: str):
+        super().__init__(f"未找到录制的响应: {method} {endpoint} ({fingerprint})，请先使用 record 模式录制")
+        self.method = method
+        self.endpoint = endpoint
+        self.fingerprint = fingerprint
+
+
+class TransportMode(str, Enum):
+    """传输层模式"""
+
+    HTTP = "http"  # 直接请求高德API
+    RECORD = "record"  # 请求高德API并将响应录制到磁盘
+    REPLAY = "replay"  # 按请求指纹从磁盘回放响应，不访问网络
+
+
+def request_fingerprint(method: str, endpoint: str, params: dict[str, Any] | None = None, data: dict[str, Any] | None = None) -> str:
+    """
+    计算请求指纹
+
+    忽略鉴权参数和值为None的参数，参数值统一转为字符串，保证录制、回放和桩服务器三方计算结果一致。
+
+    Args:
+        method: 请求方法
+        endpoint: API端点（路径）
+        params: URL参数
+        data: 请求体数据
+
+    Returns:
+        str: 请求指纹
+    """
+    normalized = {k: str(v) for k, v in (params or {}).items() if v is not None and k not in _IGNORED_PARAMS}
+    raw = json.dumps([method.upper(), endpoint, normalized, data or {}], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _encode_response(response_data: dict[str, Any]) -> dict[str, Any]:
+    """将响应转换为可写入JSON文件的格式（二进制内容使用base64编码）"""
+    if isinstance(response_data.get("content"), bytes):
+        return {**response_data, "content": base64.b64encode(response_data["content"]).decode("ascii"), "binary": True}
+    return response_data
+
+
+def _decode_response(fixture: dict[str, Any]) -> dict[str, Any]:
+    """从录制文件还原响应"""
+    response_data = dict(fixture)
+    if response_data.pop("binary", False):
+        response_data["content"] = base64.b64decode(response_data["content"])
+    return response_data
+
+
+class AmapTransport:
+    """
+    传输层基类
+
+    负责把已构建好的请求发送出去并返回原始响应数据（未经状态码校验）。
+    """
+
+    async def send(
+        self,
+        session: ClientSession,
+        method: str,
+        url: str,
+        params: dict[str, Any] | None = None,
+        data: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> dict[str, Any]:
+        """
+        发送请求
+
+        Args:
+            session: aiohttp会话
+            method: 请求方法
+            url: 完整URL
+            params: 已处理的URL参数
+            data: 请求体数据
+            headers: 请求头
+
+        Returns:
+            原始响应数据
+        """
+        raise NotImplementedError
+
+
+class HttpTransport(AmapTransport):
+    """通过HTTP访问高德API的传输层"""
+
+    async def send(self, session, method, url, params=None, data=None, headers=None):
+        async with session.request(method=method, url=url, params=params, json=data, headers=headers) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "")
+            if "application/json" in content_type:
+                return await response.json()
+            # 处理非JSON响应（如静态地图图片）
+            return {"status": "1", "info": "OK", "content": await response.read(), "content_type": content_type}
+
+
+class FixtureStore:
+    """录制文件存储，每个请求指纹对应一个JSON文件（同步读写，在事件循环中通过 asyncio.to_thread 调用）"""
+
+    def __init__(self, fixture_dir: str | Path):
+        self.fixture_dir = Path(fixture_dir)
+
+    def _path(self, fingerprint: str) -> Path:
+        return self.fixture_dir / f"{fingerprint}.json"
+
+    def load(self, fingerprint: str) -> dict[str, Any] | None:
+        """读取录制的响应，不存在时返回None"""
+        path = self._path(fingerprint)
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return _decode_response(json.load(f)["response"])
+
+    def save(self, fingerprint: str, method: str, endpoint: str, params, data, response_data: dict[str, Any]) -> None:
+        """保存响应"""
+        self.fixture_dir.mkdir(parents=True, exist_ok=True)
+        fixture = {
+            "request": {
+                "method": method.upper(),
+                "endpoint": endpoint,
+                "params": {k: v for k, v in (params or {}).items() if k not in _IGNORED_PARAMS},
+                "data": data,
+            },
+            "response": _encode_response(response_data),
+        }
+        with open(self._path(fingerprint), "w", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False, indent=2)
+
+
+class RecordingTransport(AmapTransport):
+    """请求真实API并把响应录制到磁盘"""
+
+    def __init__(self, fixture_dir: str | Path, inner: AmapTransport | None = None):
+        self.store = FixtureStore(fixture_dir)
+        self.inner = inner or HttpTransport()
+
+    async def send(self, session, method, url, params=None, data=None, headers=None):
+        response_data = await self.inner.send(session, method, url, params, data, headers)
+        endpoint = urlsplit(url).path
+        fingerprint = request_fingerprint(method, endpoint, params, data)
+        await asyncio.to_thread(self.store.save, fingerprint, method, endpoint, params, data, response_data)
+        return response_data
+
+
+class ReplayTransport(AmapTransport):
+    """按请求指纹回放录制的响应，不访问网络"""
+
+    def __init__(self, fixture_dir: str | Path):
+        self.store = FixtureStore(fixture_dir)
+
+    async def send(self, session, method, url, params=None, data=None, headers=None):
+        endpoint = urlsplit(url).path
+        fingerprint = request_fingerprint(method, endpoint, params, data)
+        if (response_data := await asyncio.to_thread(self.store.load, fingerprint)) is None:
+            raise FixtureMissingError(method, endpoint, fingerprint)
+        return response_data
+
+
+def create_transport(mode: TransportMode | str, fixture_dir: str | Path) -> AmapTransport:
+    """
+    根据模式创建传输层
+
+    Args:
+        mode: 传输层模式
+        fixture_dir: 录制文件目录
+
+    Returns:
+        AmapTransport: 传输层实例
+    """
+    match TransportMode(mode):
+        case TransportMode.RECORD:
+            return RecordingTransport(fixture_dir)
+        case TransportMode.REPLAY:
+            return ReplayTransport(fixture_dir)
+        case _:
+            return HttpTransport()
+
+
+class AmapStubServer:
+    """
+    本地高德API桩服务器
+
+    基于录制文件响应请求，支持注入延迟和错误，用于离线压测。
+    将客户端的base_url指向 `server.base_url` 并使用HttpTransport即可。
+
+    示例:
+        async with AmapStubServer("fixtures/amap", latency=0.05, error_rate=0.01) as server:
+            client = AmapClient(logger)
+            client.base_url = server.base_url
+    """
+
+    def __init__(
+        self,
+        fixture_dir: str | Path,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+    ):
+        """
+        初始化桩服务器
+
+        Args:
+            fixture_dir: 录制文件目录
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+            latency: 固定响应延迟（秒）
+            jitter: 在固定延迟基础上增加的随机延迟上限（秒）
+            error_rate: 返回错误响应的概率（0~1）
+            error_status: 注入错误时返回的HTTP状态码
+        """
+        self.store = FixtureStore(fixture_dir)
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.request_count = 0
+        self.error_count = 0
+        self.miss_count = 0
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def base_url(self) -> str:
+        """桩服务器的基础URL"""
+        return f"http://{self.host}:{self.port}"
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        """处理所有请求"""
+        self.request_count += 1
+        if delay := self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0):
+            await asyncio.sleep(delay)
+        if self.error_rate and random.random() < self.error_rate:
+            self.error_count += 1
+            return web.json_response({"status": "0", "info": "INJECTED_ERROR"}, status=self.error_status)
+        data = await request.json() if request.can_read_body else None
+        fingerprint = request_fingerprint(request.method, request.path, dict(request.query), data)
+        if (response_data := await asyncio.to_thread(self.store.load, fingerprint)) is None:
+            self.miss_count += 1
+            return web.json_response({"status": "0", "info": "FIXTURE_NOT_FOUND"}, status=404)
+        if isinstance(response_data.get("content"), bytes):
+            return web.Response(body=response_data["content"], headers={"Content-Type": response_data.get("content_type") or "image/png"})
+        return web.json_response(response_data)
+
+    async def start(self) -> str:
+        """
+        启动服务器
+
+        Returns:
+            str: 服务器基础URL
+        """
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # 端口为0时获取实际分配的端口
+        self.port = self._runner.addresses[0][1]
+        return self.base_url
+
+    async def stop(self) -> None:
+        """停止服务器"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
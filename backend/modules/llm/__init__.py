@@ -1,3 +1,4 @@
+import asyncio
 import json
 import time
 from collections.abc import AsyncGenerator
@@ -8,6 +9,8 @@ from langchain.schema import AIMessage
 from langchain.schema import HumanMessage
 from langchain.schema import SystemMessage
 from langchain.tools import BaseTool
+from langchain_core.messages import BaseMessageChunk
+from langchain_core.messages import message_chunk_to_message
 from pydantic import BaseModel
 from utils import *
 
@@ -16,10 +19,16 @@ from .enums import *
 from .exceptions import *
 from .schemas import *
 
+# 流式输出结束标记
+_STREAM_END = object()
+
 
 class LLMClient:
     """
     LangChain模型适配器，支持工具调用和结果解析
+
+    每个实例是一个对话会话，只保存对话历史、工具列表和压缩状态；
+    请求管理、指标、缓存等重量级组件来自共享核心（LLMCore），多个会话传入同一个核心即可共享。
     """
 
     def __init__(
@@ -31,53 +40,107 @@ class LLMClient:
         max_history_size: int = 1000,
         max_concurrent_calls: int = 3,
         request_config: RequestConfig | None = None,
+        response_cache: ResponseCache | None = None,
+        semantic_cache: SemanticCache | None = None,
+        conversation_id: str | None = None,
+        history_store: HistoryStore | None = None,
+        core: LLMCore | None = None,
+        tenant_id: str | None = None,
     ) -> None:
         """
         初始化客户端
 
         Args:
             system_prompt: 系统提示词
-            logger: 日志记录器（可选，默认自动创建）
+            logger: 日志记录器（可选，默认使用核心的日志记录器）
             max_history_size: 历史消息最大数量
             max_concurrent_calls: 最大并发调用数（工具管理器使用）
-            request_config: RequestManager 统一配置（包含模型、重试、并发等所有配置）
+            request_config: RequestManager 统一配置（包含模型、重试、并发等所有配置，仅在未提供 core 时使用）
+            response_cache: 响应缓存（可选，传入同一实例可在多个客户端间共享，仅在未提供 core 时使用）
+            semantic_cache: 语义缓存（可选，默认按 request_config.enable_semantic_cache 创建，仅在未提供 core 时使用）
+            conversation_id: 会话ID（可选，提供时对话历史写入存储后端，可在重启或其他进程中恢复）
+            history_store: 对话历史存储后端（可选，默认按 CONFIG.llm_history_backend 创建）
+            core: 共享核心（可选，如 get_llm_core()；默认为本客户端单独创建一个核心）
+            tenant_id: 租户标识（可选，如用户ID；共享核心时同一优先级内各租户的请求轮流调度）
         """
+        if core is None:
+            core = LLMCore(logger, request_config, response_cache, semantic_cache)
+        self.core = core
         self.system_prompt = system_prompt
         self.tools: list[BaseTool] = []
-        self.logger = logger or get_logger("llm")
-        self.metrics = MetricsCollector(self.logger)
-        self.request_config = request_config or RequestConfig()
+        self.logger = logger or core.logger
+        self.metrics = core.metrics
+        self.request_config = core.request_config
         self.model_name = model_name
         self.temperature = temperature
-        self.request_manager = RequestManager(self.logger, self.metrics, self.request_config)
-        self.history_manager = HistoryManager(self.logger, self.metrics, max_history_size=max_history_size, enable_validation=True, auto_cleanup=True)
-        self.tool_manager = ToolManager(self.logger, self.metrics, max_concurrent_calls=max_concurrent_calls)
-        self.chat_compressor = ChatCompressor(self.logger, self.metrics)
-        self.model = create_llm_model(self.model_name, temperature=self.temperature)
-        if self.system_prompt:
+        self.request_manager = core.request_manager
+        if conversation_id and history_store is None:
+            history_store = create_history_store(CONFIG.llm_history_backend, CONFIG.llm_history_sqlite_path)
+        self.conversation_id = conversation_id
+        self.tenant_id = tenant_id
+        self.history_manager = HistoryManager(
+            self.logger,
+            self.metrics,
+            max_history_size=max_history_size,
+            enable_validation=True,
+            auto_cleanup=True,
+            store=history_store,
+            conversation_id=conversation_id,
+            load_limit=CONFIG.llm_history_load_limit,
+            token_counter=core.chat_compressor.token_counter,
+        )
+        self.tool_manager = ToolManager(
+            self.logger,
+            self.metrics,
+            max_concurrent_calls=max_concurrent_calls,
+            executor=core.tool_executor,
+            memo=core.tool_memo,
+        )
+        self.chat_compressor = core.chat_compressor
+        # 后台压缩：任务、压缩快照的最后一条精选历史ID、连续失败次数、连续冷却轮数及冷却结束时间
+        self._compression_task: asyncio.Task | None = None
+        self._compression_marker: str | None = None
+        self._compression_failures = 0
+        self._compression_cooldowns = 0
+        self._compression_retry_at = 0.0
+        self.response_cache = core.response_cache
+        self.semantic_cache = core.semantic_cache
+        # 未绑定工具的模型；工具绑定按工具集缓存，见 model 属性
+        self._base_model = create_llm_model(self.model_name, temperature=self.temperature)
+        # 恢复的会话已包含系统消息，不再重复添加
+        if self.system_prompt and not self.history_manager.get_history(limit=1):
             system_msg = SystemMessage(content=self.system_prompt)
             self.history_manager.add_message(system_msg, MessageMetadata(timestamp=time.time(), model_name="system"))
 
+    @property
+    def model(self):
+        """当前使用的模型（已绑定全部工具，相同工具集复用缓存的绑定结果）"""
+        return bind_tools_cached(self._base_model, self.tools)
+
+    @model.setter
+    def model(self, value) -> None:
+        """替换底层模型（工具在使用时重新绑定）"""
+        self._base_model = value
+
     # region 工具管理
 
-    def add_tools(self, tools: list[BaseTool]) -> None:
+    def add_tools(self, tools: list[BaseTool], memoize: bool = False, memo_ttl: float | None = None) -> None:
         """
         添加工具到模型
 
         Args:
             tools: 工具列表
+            memoize: 是否记忆工具结果（仅用于相同参数总是返回相同结果的工具，如地理编码、POI详情、天气）
+            memo_ttl: 记忆结果的有效期（秒），None表示不过期
         """
         if not self.tools:
             self.tools = []
         # 扩展工具列表而不是替换
         self.tools.extend(tools)
-        # 添加到工具管理器
+        # 添加到工具管理器（模型在使用时按工具集绑定，无需立即重新绑定）
         for tool in tools:
-            self.tool_manager.register_tool(tool)
-        # 重新绑定所有工具到 LLMClient 的模型
-        if self.tools and self.model:
-            self.model = self.model.bind_tools(self.tools)
-            self.logger.debug(f"已为模型绑定 {len(self.tools)} 个工具")
+            self.tool_manager.register_tool(tool, memoize=memoize, memo_ttl=memo_ttl)
+        self.logger.debug(f"当前共 {len(self.tools)} 个工具")
 
     def get_tools(self) -> list[BaseTool]:
         """
@@ -103,12 +166,9 @@ class LLMClient:
 
         for i, tool in enumerate(self.tools):
             if tool.name == tool_name:
-                # 重新绑定剩余工具到 LLMClient 的模型
-                if self.tools and self.model:
-                    self.model = self.model.bind_tools(self.tools)
-                elif self.model:
-                    # 如果没有工具了，重新创建原始模型
-                    self.model = create_llm_model(self.model_name, temperature=self.temperature)
+                # 使用新列表，模型按新的工具集重新绑定（之前用过的工具集直接复用缓存）
+                self.tools = self.tools[:i] + self.tools[i + 1 :]
+                self.tool_manager.unregister_tool(tool_name)
                 self.logger.debug(f"移除工具: {tool_name}")
                 return True
 
@@ -118,10 +178,10 @@ class LLMClient:
     def clear_tools(self) -> None:
         """清空所有工具"""
         tool_count = len(self.tools) if self.tools else 0
+        for tool in self.tools or []:
+            self.tool_manager.unregister_tool(tool.name)
+        # 无工具时直接使用未绑定工具的模型，无需重新创建
         self.tools = []
-        # 重新创建原始模型（无工具绑定）
-        if self.model:
-            self.model = create_llm_model(self.model_name, temperature=self.temperature)
         self.logger.debug(f"清空了 {tool_count} 个工具")
 
     def get_tool_by_name(self, tool_name: str) -> BaseTool | None:
@@ -165,6 +225,7 @@ class LLMClient:
         Args:
             keep_system_messages: 是否保留系统消息
         """
+        self._cancel_background_compression()
         self.history_manager.clear_history(keep_system_messages)
         self.logger.debug("历史记录已清空")
 
@@ -176,6 +237,9 @@ class LLMClient:
         """
         创建消息列表（集成智能压缩）
 
+        历史超过低水位（compression_background_ratio）时在后台生成摘要，完成后在下一轮开始时替换历史前缀；
+        超过压缩阈值而后台压缩尚未完成时，本轮只截断历史，不等待摘要。
+
         Args:
             user_prompt: 用户提示
             use_history: 是否使用历史记录
@@ -186,44 +250,25 @@ class LLMClient:
         messages = []
 
         if use_history and self.history_manager:
-            # 获取更多历史记录用于压缩分析
+            # 后台压缩已完成时先替换历史记录前缀
+            self._apply_background_compression()
             if context_messages := self.history_manager.get_history(mode=HistoryMode.CURATED, include_metadata=False):
-                # 🔥 检查是否需要压缩
-                should_compress = self.chat_compressor.should_compress(context_messages)
-                if should_compress:
-                    self.logger.info("触发聊天压缩：Token数量超过阈值")
-                    try:
-                        # 执行压缩
-                        compression_result = await self.chat_compressor.compress_messages(context_messages, self.model_name)
-                        # 更新指标
-                        self.metrics.increment_metric("chat_compression", "total_compressions")
-                        if compression_result.status == CompressionStatus.COMPRESSED:
-                            # 压缩成功，使用压缩后的消息
-                            messages.extend(compression_result.compressed_messages)
-                            # 🔥 更新历史记录，避免重复压缩
-                            self.history_manager.replace_with_compressed_messages(compression_result.compressed_messages)
-                            self.metrics.increment_metric("chat_compression", "successful_compressions")
-                            self.metrics.update_metric(
-                                "chat_compression",
-                                "total_tokens_saved",
-                                compression_result.original_token_count - compression_result.compressed_token_count,
-                            )
-                            self.logger.debug(
-                                f"聊天压缩成功: {compression_result.original_message_count}条→{compression_result.compressed_message_count}条消息"
-                            )
-                        else:
-                            # 压缩失败，使用原始消息的截断版本
-                            messages.extend(context_messages[-20:])  # 保留最后20条
-                            self.metrics.increment_metric("chat_compression", "failed_compressions")
-                            self.logger.warning(f"聊天压缩失败: {compression_result.error_message}")
-                    except Exception as e:
-                        # 压缩过程出错，使用原始消息
-                        messages.extend(context_messages[-20:])
-                        self.metrics.increment_metric("chat_compression", "failed_compressions")
-                        self.logger.error(f"聊天压缩异常: {e}")
-                else:
-                    # 不需要压缩，使用原始消息（限制数量）
-                    messages.extend(context_messages[-20:])
+                # 使用历史记录缓存的token总数，无需重新计数
+                context_tokens = self.history_manager.count_tokens(HistoryMode.CURATED)
+                # 🔥 超过低水位时提前在后台压缩，不阻塞本轮对话
+                if self.chat_compressor.should_compress(
+                    context_messages, token_count=context_tokens, threshold_ratio=CONFIG.compression_background_ratio
+                ):
+                    self._start_background_compression(context_messages, context_tokens)
+                if self.chat_compressor.should_compress(context_messages, token_count=context_tokens):
+                    # 超过压缩阈值但后台压缩尚未完成，本轮回退为截断
+                    self.metrics.increment_metric("chat_compression", "truncation_fallbacks")
+                    self.logger.info("Token数量超过压缩阈值，后台压缩尚未完成，本轮截断历史记录")
+                # 使用原始消息（限制数量），截断后不能以缺少对应工具调用的工具结果开头
+                recent_messages = context_messages[-20:]
+                while recent_messages and recent_messages[0].type == "tool":
+                    recent_messages = recent_messages[1:]
+                messages.extend(recent_messages)
         else:
             # 传统方式：只添加系统提示
             if self.system_prompt:
@@ -235,6 +280,68 @@ class LLMClient:
 
         return messages
 
+    def _start_background_compression(self, context_messages: list, context_tokens: int) -> None:
+        """在后台压缩当前的精选历史（已有任务运行或连续失败后的冷却期内跳过，冷却结束后重新计数）"""
+        if self._compression_task is not None:
+            return
+        if self._compression_failures >= CONFIG.compression_max_attempts:
+            if time.monotonic() < self._compression_retry_at:
+                return
+            self._compression_failures = 0
+        self._compression_marker = self.history_manager.get_history(mode=HistoryMode.CURATED, limit=1, include_metadata=True)[0].entry_id
+        self._compression_task = asyncio.create_task(
+            self.chat_compressor.compress_messages(list(context_messages), self.model_name, force=True, token_count=context_tokens)
+        )
+        self.logger.debug(f"开始后台聊天压缩: {len(context_messages)}条消息, {context_tokens}tokens")
+
+    def _apply_background_compression(self) -> None:
+        """后台压缩完成时替换历史记录前缀（同步执行，对话轮次只会看到替换前或替换后的完整历史）"""
+        task = self._compression_task
+        if task is None or not task.done():
+            return
+        self._compression_task = None
+        if task.cancelled():
+            return
+        self.metrics.increment_metric("chat_compression", "total_compressions")
+        compression_result = task.result()
+        if compression_result.status == CompressionStatus.COMPRESSED and self.history_manager.replace_with_compressed_messages(
+            compression_result.compressed_messages, upto_entry_id=self._compression_marker
+        ):
+            self._compression_failures = 0
+            self._compression_cooldowns = 0
+            self.metrics.increment_metric("chat_compression", "successful_compressions")
+            self.metrics.update_metric(
+                "chat_compression",
+                "total_tokens_saved",
+                compression_result.original_token_count - compression_result.compressed_token_count,
+            )
+            self.logger.debug(f"聊天压缩成功: {compression_result.original_message_count}条→{compression_result.compressed_message_count}条消息")
+        else:
+            self._compression_failures += 1
+            self.metrics.increment_metric("chat_compression", "failed_compressions")
+            self.logger.warning(f"聊天压缩失败: {compression_result.error_message or '压缩期间历史记录已被清空'}")
+            if self._compression_failures >= CONFIG.compression_max_attempts:
+                # 连续失败后暂停后台压缩，冷却时间按连续冷却轮数指数增长（最多16倍）
+                cooldown = CONFIG.compression_failure_cooldown * 2 ** min(self._compression_cooldowns, 4)
+                self._compression_cooldowns += 1
+                self._compression_retry_at = time.monotonic() + cooldown
+                self.logger.warning(f"聊天压缩连续失败{self._compression_failures}次，{cooldown:.0f}秒内暂停后台压缩")
+
+    def _cancel_background_compression(self) -> None:
+        """取消进行中的后台压缩（历史记录被清空后结果已失效）"""
+        if self._compression_task is not None:
+            self._compression_task.cancel()
+            self._compression_task = None
+        self._compression_failures = 0
+        self._compression_cooldowns = 0
+        self._compression_retry_at = 0.0
+
+    async def wait_for_compression(self) -> None:
+        """等待进行中的后台压缩完成并应用结果"""
+        if self._compression_task is not None:
+            await asyncio.wait([self._compression_task])
+            self._apply_background_compression()
+
     async def chat(
         self,
         user_prompt: str,
@@ -260,6 +367,11 @@ class LLMClient:
             - 标准模式: AIMessage
             - 流式模式: AsyncGenerator
             - 结构化模式: dict 或 BaseModel
+
+        Note:
+            非流式请求默认使用精确匹配响应缓存（temperature 为 0 时），可通过 use_cache 参数控制：
+            use_cache=True 在 temperature > 0 时也使用缓存，use_cache=False 不使用缓存。
+            模型返回工具调用时自动执行并将结果交回模型，execute_tools=False 时直接返回包含工具调用的响应。
         """
         # 输入验证
         if not user_prompt or not user_prompt.strip():
@@ -274,130 +386,362 @@ class LLMClient:
             user_message = HumanMessage(content=user_prompt)
             self.history_manager.add_message(user_message, MessageMetadata(timestamp=start_time))
 
+        self.logger.debug(f"开始执行聊天请求: stream={stream}, response_format={response_format is not None}")
+        self.logger.debug(f"消息数量: {len(messages)}, 模型: {self.model_name}")
+        if stream:
+            # 流式请求：返回异步生成器，整个流在 RequestManager 中执行
+            return self._stream_chat(messages, user_prompt, config, save_history, response_format, start_time, **kwargs)
+
         try:
-            self.logger.debug(f"开始执行聊天请求: stream={stream}, response_format={response_format is not None}")
-            self.logger.debug(f"消息数量: {len(messages)}, 模型: {self.model_name}")
-            # 通过 RequestManager 统一的 request 方法调用模型
-            if stream:
-                # 流式请求
-                async def stream_model_call():
-                    """流式模型调用函数"""
-                    self.logger.debug("执行流式模型调用")
-                    try:
-                        if response_format:
-                            # 流式 + 结构化输出（需要特殊处理）
-                            structured_model = self.model.with_structured_output(response_format)
-                            result = structured_model.astream(messages, config or {})
-                            self.logger.debug("流式结构化输出模型调用完成")
-                            return result
-                        else:
-                            result = self.model.astream(messages, config or {})
-                            self.logger.debug("流式普通模型调用完成")
-                            return result
-                    except Exception as e:
-                        self.logger.exception(f"流式模型调用内部异常: {e}")
-                        raise
-
-                response = await self.request_manager.request(
-                    stream_model_call,
-                    priority=kwargs.get("priority", RequestPriority.NORMAL),
-                    timeout=kwargs.get("timeout", 30.0),
-                    metadata={"type": "stream", "user_prompt": user_prompt},
-                )
-            else:
-                # 标准请求
-                async def standard_model_call():
-                    """标准模型调用函数"""
-                    self.logger.debug("执行标准模型调用")
-                    try:
-                        if response_format:
-                            # 结构化输出
-                            self.logger.debug(f"使用结构化输出格式: {response_format}")
-                            structured_model = self.model.with_structured_output(response_format)
-                            result = structured_model.invoke(messages, config or {})
-                            self.logger.debug(f"标准结构化输出模型调用完成, 响应类型: {type(result)}")
-                            return result
-                        else:
-                            result = self.model.invoke(messages, config or {})
-                            self.logger.debug(f"标准普通模型调用完成, 响应类型: {type(result)}")
-                            return result
-                    except Exception as e:
-                        self.logger.exception(f"标准模型调用内部异常: {e}")
-                        raise
-
-                self.logger.debug("通过RequestManager提交标准请求")
-                response = await self.request_manager.request(
-                    standard_model_call,
-                    priority=kwargs.get("priority", RequestPriority.NORMAL),
-                    timeout=kwargs.get("timeout", 30.0),
-                    metadata={"type": "standard", "user_prompt": user_prompt},
-                )
+            cache_key, semantic_scope = self._get_cache_keys(messages, response_format, kwargs.get("use_cache"))
+            response = await self.response_cache.get(cache_key, response_format) if cache_key else None
+            if response is None and semantic_scope:
+                # 精确匹配未命中时按提示词相似度查找结构化结果
+                response = self.semantic_cache.lookup(user_prompt, semantic_scope)
+            if response is not None:
+                processing_time = time.time() - start_time
+                self.logger.debug("命中响应缓存")
+                self._record_chat_success(processing_time)
+                if save_history:
+                    self._save_response(response, response_format, processing_time)
+                return response
+
+            # 标准请求（原生异步调用，不占用线程池）
+            async def standard_model_call():
+                """标准模型调用函数"""
+                self.logger.debug("执行标准模型调用")
+                try:
+                    if response_format:
+                        # 结构化输出
+                        self.logger.debug(f"使用结构化输出格式: {response_format}")
+                        structured_model = self.model.with_structured_output(response_format)
+                        result = await structured_model.ainvoke(messages, config or {})
+                        self.logger.debug(f"标准结构化输出模型调用完成, 响应类型: {type(result)}")
+                        return result
+                    else:
+                        result = await self.model.ainvoke(messages, config or {})
+                        self.logger.debug(f"标准普通模型调用完成, 响应类型: {type(result)}")
+                        return result
+                except Exception as e:
+                    self.logger.exception(f"标准模型调用内部异常: {e}")
+                    raise
 
+            # 通过 RequestManager 统一的 request 方法调用模型
+            self.logger.debug("通过RequestManager提交标准请求")
+            response = await self.request_manager.request(
+                standard_model_call,
+                priority=kwargs.get("priority", RequestPriority.NORMAL),
+                timeout=kwargs.get("timeout", 30.0),
+                metadata={"type": "standard", "user_prompt": user_prompt},
+                estimated_tokens=self.chat_compressor.token_counter.count_messages(messages),
+                tenant_id=self.tenant_id,
+            )
             self.logger.debug(f"RequestManager返回响应: {type(response)}")
 
             # 处理成功响应
             processing_time = time.time() - start_time
-            # 更新成功指标
-            self.metrics.increment_metric("global_metrics", "total_successful_chats")
-            current_avg = self.metrics.global_metrics.get("average_response_time", 0.0)
-            total_successful = self.metrics.global_metrics.get("total_successful_chats", 1)
-            if total_successful > 0:
-                new_avg = (current_avg * (total_successful - 1) + processing_time) / total_successful
-                self.metrics.update_metric("global_metrics", "average_response_time", new_avg)
+            self._record_chat_success(processing_time)
 
             # 确保响应不为None
             if response is None:
                 raise ValueError("模型返回了None响应，可能是API调用失败")
 
-            # 保存响应到历史记录（非流式）
-            if save_history and not stream:
-                response_metadata = MessageMetadata(timestamp=time.time(), model_name=self.model_name, processing_time=processing_time)
-
-                # 处理结构化输出 - 转换为AIMessage以便历史记录处理
-                if response_format and not hasattr(response, "content"):
-                    # 结构化输出：将其转换为AIMessage
-                    if hasattr(response, "model_dump"):
-                        # Pydantic模型
-                        content_str = json.dumps(response.model_dump(), ensure_ascii=False, indent=2)
-                    elif isinstance(response, dict):
-                        # 字典格式
-                        content_str = json.dumps(response, ensure_ascii=False, indent=2)
-                    else:
-                        # 其他类型
-                        content_str = str(response)
-
-                    ai_message = AIMessage(content=f"[结构化输出]\n{content_str}")
-                    response_metadata.additional_data["structured_output"] = True
-                    response_metadata.additional_data["original_format"] = str(type(response).__name__)
-                    self.history_manager.add_message(ai_message, response_metadata)
-                    self.logger.debug(f"保存结构化输出到历史记录: {type(response).__name__}")
-                else:
-                    # 普通响应
-                    # 检查是否为工具调用响应
-                    if hasattr(response, "tool_calls") and response.tool_calls:
-                        self.logger.debug(f"检测到工具调用: {response.tool_calls}")
-                        response_metadata.additional_data["has_tool_calls"] = True
-                    self.history_manager.add_message(response, response_metadata)
+            # 执行模型返回的工具调用并将结果交回模型，直到模型不再调用工具
+            if getattr(response, "tool_calls", None) and kwargs.get("execute_tools", True):
+                response = await self._run_tool_calls(messages, response, config, save_history, start_time, **kwargs)
+                processing_time = time.time() - start_time
+
+            if cache_key:
+                await self.response_cache.set(cache_key, response, self._estimate_tokens(messages, response))
+            if semantic_scope:
+                self.semantic_cache.add(user_prompt, semantic_scope, response)
+
+            # 保存响应到历史记录
+            if save_history:
+                self._save_response(response, response_format, processing_time)
 
             self.logger.debug(f"聊天请求完成，处理时间: {processing_time:.2f}秒")
             return response
         except Exception as e:
-            self.logger.exception(f"聊天请求失败: {e}")
-            self.logger.debug(f"异常详情 - 类型: {type(e)}, 消息: {str(e)}")
-            # 更新失败指标
-            self.metrics.increment_metric("global_metrics", "total_failed_chats")
-            # 记录错误到历史
-            if save_history:
-                error_metadata = MessageMetadata(
-                    timestamp=time.time(),
-                    error_info={"error": str(e), "error_type": str(type(e))},
-                    validation_status="invalid",
-                )
-                error_response = AIMessage(content="[ERROR: Request failed]")
-                self.history_manager.add_message(error_response, error_metadata)
+            self._record_chat_failure(e, save_history)
             # 重新抛出异常
             raise
 
+    async def _run_tool_calls(
+        self, messages: list, response: AIMessage, config: dict | None, save_history: bool, start_time: float, **kwargs
+    ) -> AIMessage:
+        """
+        工具调用循环：每轮并发执行模型返回的全部工具调用，追加工具结果后再次调用模型
+
+        Args:
+            messages: 本次请求发送给模型的消息列表
+            response: 包含工具调用的模型响应
+            config: 模型配置
+            save_history: 是否将工具调用和结果保存到历史记录
+            start_time: 请求开始时间
+            **kwargs: 其他配置参数（priority、timeout）
+
+        Returns:
+            AIMessage: 模型的最终响应（达到最大轮数时可能仍包含工具调用）
+        """
+        messages = list(messages)
+        for _ in range(self.request_config.max_tool_iterations):
+            if not getattr(response, "tool_calls", None):
+                break
+            self.logger.debug(f"执行工具调用: {[tool_call['name'] for tool_call in response.tool_calls]}")
+            tool_messages = await self.tool_manager.execute_tool_calls(response.tool_calls, timeout=self.request_config.tool_call_timeout)
+            self.metrics.increment_metric("tool_management", "agent_iterations")
+            if save_history:
+                self._save_response(response, None, time.time() - start_time)
+                for tool_message in tool_messages:
+                    self.history_manager.add_message(tool_message, MessageMetadata(timestamp=time.time(), model_name=tool_message.name))
+            messages.extend([response, *tool_messages])
+            response = await self.request_manager.request(
+                self.model.ainvoke,
+                messages,
+                config or {},
+                priority=kwargs.get("priority", RequestPriority.NORMAL),
+                timeout=kwargs.get("timeout", 30.0),
+                metadata={"type": "tool_followup"},
+                estimated_tokens=self.chat_compressor.token_counter.count_messages(messages),
+                tenant_id=self.tenant_id,
+            )
+        else:
+            if getattr(response, "tool_calls", None):
+                self.logger.warning(f"达到最大工具调用轮数 {self.request_config.max_tool_iterations}，返回最后一次模型响应")
+        return response
+
+    def _get_cache_keys(
+        self, messages: list, response_format: dict | type[BaseModel] | None, use_cache: bool | None
+    ) -> tuple[str | None, str | None]:
+        """
+        计算响应缓存键和语义缓存作用域
+
+        Args:
+            messages: 发送给模型的消息列表
+            response_format: 结构化输出格式
+            use_cache: 调用方的缓存选项（None 表示仅在 temperature 为 0 时使用缓存）
+
+        Returns:
+            (精确匹配缓存键, 语义缓存作用域)，不使用对应缓存时为None
+        """
+        if use_cache is False or not (self.request_config.enable_response_cache or self.semantic_cache is not None):
+            return None, None
+        if use_cache is None and self.temperature > 0:
+            # 有随机性的输出默认不缓存
+            self.metrics.increment_metric("response_cache", "bypassed")
+            return None, None
+        cache_key = None
+        if self.request_config.enable_response_cache:
+            cache_key = make_cache_key(self.model_name, self.temperature, messages, self.tools, response_format)
+        # 语义缓存只匹配结构化输出，作用域为除当前提示词外的请求指纹（上下文、工具和输出格式相同）
+        semantic_scope = None
+        if self.semantic_cache is not None and response_format:
+            semantic_scope = make_cache_key(self.model_name, self.temperature, messages[:-1], self.tools, response_format)
+        return cache_key, semantic_scope
+
+    def _estimate_tokens(self, messages: list, response: Any) -> int:
+        """估算一次调用消耗的token数（优先使用模型返回的用量信息）"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage and usage.get("total_tokens"):
+            return usage["total_tokens"]
+        if hasattr(response, "content"):
+            output = response.content
+        else:
+            output = json.dumps(response.model_dump() if hasattr(response, "model_dump") else response, ensure_ascii=False)
+        return self.chat_compressor.count_tokens(messages + [AIMessage(content=output)])
+
+    async def _stream_chat(
+        self,
+        messages: list,
+        user_prompt: str,
+        config: dict | None,
+        save_history: bool,
+        response_format: dict | type[BaseModel] | None,
+        start_time: float,
+        **kwargs,
+    ) -> AsyncGenerator:
+        """
+        流式聊天
+
+        模型流在 RequestManager 的请求内被完整消费（占用并发槽位，受总超时、重试和指标约束），
+        分片经队列逐个转交给调用方，不等待完整响应；流结束后把拼装好的消息写入历史记录。
+
+        Args:
+            messages: 发送给模型的消息列表
+            user_prompt: 用户输入
+            config: 模型配置
+            save_history: 是否保存到历史记录
+            response_format: 可选的结构化输出格式
+            start_time: 聊天请求开始时间
+            **kwargs: 其他配置参数（priority、timeout 为流总超时、idle_timeout 为分片间隔超时）
+
+        Yields:
+            普通模式为 AIMessageChunk，结构化模式为逐步完善的结构化结果
+        """
+        idle_timeout = kwargs.get("idle_timeout", self.request_config.stream_idle_timeout)
+        total_timeout = kwargs.get("timeout", self.request_config.stream_total_timeout)
+        chunk_queue: asyncio.Queue = asyncio.Queue()
+        stop_event = asyncio.Event()
+        state: dict[str, Any] = {"aggregated": None, "chunks": 0, "first_token_at": None}
+
+        async def stream_model_call():
+            """流式模型调用函数（覆盖整个流的消费过程）"""
+            model = self.model.with_structured_output(response_format) if response_format else self.model
+            stream = model.astream(messages, config or {})
+            try:
+                while not stop_event.is_set():
+                    try:
+                        chunk = await asyncio.wait_for(anext(stream), timeout=idle_timeout)
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        self.metrics.increment_metric("stream_processing", "idle_timeouts")
+                        raise asyncio.TimeoutError(f"流式输出空闲超时 (当前超时设置: {idle_timeout}秒)。")
+                    if state["first_token_at"] is None:
+                        state["first_token_at"] = time.time()
+                    # 普通模式累加分片，结构化模式每个分片都是当前的完整结果
+                    aggregated = state["aggregated"]
+                    state["aggregated"] = aggregated + chunk if isinstance(aggregated, BaseMessageChunk) else chunk
+                    state["chunks"] += 1
+                    chunk_queue.put_nowait(chunk)
+            except asyncio.TimeoutError:
+                raise
+            except Exception as e:
+                self.logger.exception(f"流式模型调用内部异常: {e}")
+                # 已输出的内容无法撤回，此时重试会导致调用方收到重复内容
+                if state["chunks"]:
+                    raise StreamInterruptedError(f"流式输出在第 {state['chunks']} 个分片后中断: {e}") from e
+                raise
+            finally:
+                await stream.aclose()
+            return state["aggregated"]
+
+        self.metrics.increment_metric("stream_processing", "total_streams")
+        request_task = asyncio.create_task(
+            self.request_manager.request(
+                stream_model_call,
+                priority=kwargs.get("priority", RequestPriority.NORMAL),
+                timeout=total_timeout,
+                metadata={"type": "stream", "user_prompt": user_prompt},
+                estimated_tokens=self.chat_compressor.token_counter.count_messages(messages),
+                tenant_id=self.tenant_id,
+            )
+        )
+        request_task.add_done_callback(lambda _: chunk_queue.put_nowait(_STREAM_END))
+        finished = failed = False
+        try:
+            while (chunk := await chunk_queue.get()) is not _STREAM_END:
+                yield chunk
+            # 传播超时或失败异常
+            response = await request_task
+            finished = True
+            if response is None:
+                raise EmptyStreamError("模型流未返回任何内容")
+        except Exception as e:
+            failed = True
+            self.metrics.increment_metric("stream_processing", "failed_streams")
+            self._record_chat_failure(e, save_history)
+            raise
+        finally:
+            if not finished:
+                # 调用方提前结束迭代或流失败：通知生产方在下一个分片处停止
+                stop_event.set()
+                if not failed:
+                    self.metrics.increment_metric("stream_processing", "cancelled_streams")
+                if not request_task.done():
+                    request_task.cancel()
+                elif not request_task.cancelled():
+                    request_task.exception()
+
+        end_time = time.time()
+        processing_time = end_time - start_time
+        tokens = self._count_stream_tokens(response, state["chunks"])
+        first_token_at = state["first_token_at"] or end_time
+        self._record_stream_metrics(processing_time, first_token_at - start_time, tokens, state["chunks"], end_time - first_token_at)
+        self._record_chat_success(processing_time)
+        if save_history:
+            if isinstance(response, BaseMessageChunk):
+                response = message_chunk_to_message(response)
+            self._save_response(response, response_format, processing_time)
+        self.logger.debug(f"流式聊天完成: {state['chunks']}个分片, 首分片耗时 {first_token_at - start_time:.2f}秒, 总耗时 {processing_time:.2f}秒")
+
+    @staticmethod
+    def _count_stream_tokens(response: Any, chunk_count: int) -> int:
+        """统计流式输出的token数（优先使用模型返回的用量信息，否则按分片数近似）"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage and usage.get("output_tokens"):
+            return usage["output_tokens"]
+        return chunk_count
+
+    def _record_stream_metrics(self, duration: float, time_to_first_token: float, tokens: int, chunks: int, generation_time: float) -> None:
+        """更新流式处理指标"""
+        self.metrics.increment_metric("stream_processing", "successful_streams")
+        self.metrics.increment_metric("stream_processing", "total_chunks_processed", chunks)
+        self.metrics.increment_metric("stream_processing", "total_tokens_streamed", tokens)
+        count = self.metrics.stream_processing["successful_streams"]
+        tokens_per_second = tokens / generation_time if generation_time > 0 else 0.0
+        for name, value in (
+            ("average_stream_duration", duration),
+            ("average_time_to_first_token", time_to_first_token),
+            ("average_tokens_per_second", tokens_per_second),
+        ):
+            current_avg = self.metrics.stream_processing.get(name, 0.0)
+            self.metrics.update_metric("stream_processing", name, (current_avg * (count - 1) + value) / count)
+
+    def _record_chat_success(self, processing_time: float) -> None:
+        """更新聊天成功指标"""
+        self.metrics.increment_metric("global_metrics", "total_successful_chats")
+        current_avg = self.metrics.global_metrics.get("average_response_time", 0.0)
+        total_successful = self.metrics.global_metrics.get("total_successful_chats", 1)
+        if total_successful > 0:
+            new_avg = (current_avg * (total_successful - 1) + processing_time) / total_successful
+            self.metrics.update_metric("global_metrics", "average_response_time", new_avg)
+
+    def _record_chat_failure(self, error: Exception, save_history: bool) -> None:
+        """更新聊天失败指标并记录错误到历史"""
+        self.logger.exception(f"聊天请求失败: {error}")
+        self.logger.debug(f"异常详情 - 类型: {type(error)}, 消息: {str(error)}")
+        self.metrics.increment_metric("global_metrics", "total_failed_chats")
+        if save_history:
+            error_metadata = MessageMetadata(
+                timestamp=time.time(),
+                error_info={"error": str(error), "error_type": str(type(error))},
+                validation_status="invalid",
+            )
+            error_response = AIMessage(content="[ERROR: Request failed]")
+            self.history_manager.add_message(error_response, error_metadata)
+
+    def _save_response(self, response: Any, response_format: dict | type[BaseModel] | None, processing_time: float) -> None:
+        """保存模型响应到历史记录"""
+        response_metadata = MessageMetadata(timestamp=time.time(), model_name=self.model_name, processing_time=processing_time)
+
+        # 处理结构化输出 - 转换为AIMessage以便历史记录处理
+        if response_format and not hasattr(response, "content"):
+            # 结构化输出：将其转换为AIMessage
+            if hasattr(response, "model_dump"):
+                # Pydantic模型
+                content_str = json.dumps(response.model_dump(), ensure_ascii=False, indent=2)
+            elif isinstance(response, dict):
+                # 字典格式
+                content_str = json.dumps(response, ensure_ascii=False, indent=2)
+            else:
+                # 其他类型
+                content_str = str(response)
+
+            ai_message = AIMessage(content=f"[结构化输出]\n{content_str}")
+            response_metadata.additional_data["structured_output"] = True
+            response_metadata.additional_data["original_format"] = str(type(response).__name__)
+            self.history_manager.add_message(ai_message, response_metadata)
+            self.logger.debug(f"保存结构化输出到历史记录: {type(response).__name__}")
+        else:
+            # 普通响应
+            # 检查是否为工具调用响应
+            if hasattr(response, "tool_calls") and response.tool_calls:
+                self.logger.debug(f"检测到工具调用: {response.tool_calls}")
+                response_metadata.additional_data["has_tool_calls"] = True
+            self.history_manager.add_message(response, response_metadata)
+
     # endregion
 
     def get_system_status(self) -> dict[str, Any]:
@@ -412,4 +756,4 @@ class LLMClient:
         }
 
 
-__all__ = ["LLMClient", "RequestConfig"]
+__all__ = ["LLMClient", "LLMCore", "RequestConfig", "get_llm_core"]
@@ -0,0 +1,27 @@
+from common.command import CommandBase
+from config import CONFIG
+from utils import *
+
+from .core.token_counter import download_tokenizer
+
+logger = get_logger("llm")
+
+
+class LLMCommand(metaclass=CommandBase):
+    name = "llm"
+
+    @staticmethod
+    def add_parser(parser):
+        parser.add_argument(
+            "--download-tokenizer",
+            nargs="?",
+            const=CONFIG.llm_tokenizer,
+            default=None,
+            help="下载tiktoken编码文件到本地缓存（默认为配置的llm_tokenizer），运行时只从缓存加载",
+        )
+
+    @staticmethod
+    def run(params):
+        if params.download_tokenizer:
+            path = download_tokenizer(params.download_tokenizer)
+            logger.info(f"分词器 {params.download_tokenizer} 已缓存: {path}")
@@ -1,15 +1,49 @@
 from .chat_compressor import ChatCompressor
 from .history_manager import HistoryManager
+from .history_store import create_history_store
+from .history_store import DatabaseHistoryStore
+from .history_store import HistoryStore
+from .history_store import MemoryHistoryStore
+from .history_store import SQLiteHistoryStore
+from .llm_core import get_llm_core
+from .llm_core import LLMCore
 from .metrics_collector import MetricsCollector
+from .model import bind_tools_cached
 from .model import create_llm_model
+from .model import get_tool_schema
 from .request_manager import RequestManager
+from .response_cache import make_cache_key
+from .response_cache import ResponseCache
+from .semantic_cache import HashingVectorizer
+from .semantic_cache import SemanticCache
+from .semantic_cache import SlotExtractor
+from .token_counter import get_token_counter
+from .token_counter import TokenCounter
 from .tool_manager import ToolManager
+from .tool_manager import ToolMemo
 
 __all__ = [
     "create_llm_model",
+    "LLMCore",
+    "get_llm_core",
+    "bind_tools_cached",
+    "get_tool_schema",
     "HistoryManager",
+    "HistoryStore",
+    "MemoryHistoryStore",
+    "SQLiteHistoryStore",
+    "DatabaseHistoryStore",
+    "create_history_store",
     "ToolManager",
+    "ToolMemo",
     "ChatCompressor",
     "MetricsCollector",
     "RequestManager",
+    "ResponseCache",
+    "make_cache_key",
+    "SemanticCache",
+    "HashingVectorizer",
+    "SlotExtractor",
+    "TokenCounter",
+    "get_token_counter",
 ]
@@ -1,4 +1,7 @@
 import asyncio
+import hashlib
+import json
+from collections import OrderedDict
 
 from config import CONFIG
 from langchain.schema import BaseMessage
@@ -9,6 +12,8 @@ from pydantic import BaseModel
 
 from ..enums import *
 from .model import create_llm_model
+from .token_counter import get_token_counter
+from .token_counter import TokenCounter
 
 
 class CompressionResult(BaseModel):
@@ -39,47 +44,49 @@ class ChatCompressor:
     - 压缩质量监控
     """
 
-    def __init__(self, logger, metrics):
+    def __init__(self, logger, metrics, token_counter: TokenCounter | None = None, request_manager=None):
         """
         初始化聊天压缩器
 
         Args:
             logger: 日志记录器
             metrics: MetricsCollector实例，用于统计记录
+            token_counter: Token计数器，默认按 CONFIG.llm_tokenizer 创建
+            request_manager: RequestManager实例（可选，提供时摘要请求以低优先级提交，计入并发、速率和Token预算）
         """
         self.logger = logger
         self.metrics = metrics
-        # 创建独立的模型实例，避免与主LLMClient的历史记录冲突
+        self.request_manager = request_manager
+        self.token_counter = token_counter or get_token_counter(CONFIG.llm_tokenizer)
+        # 摘要缓存：内容哈希 -> 摘要（相同内容重试或重复压缩时不再调用模型）
+        self._summary_cache: OrderedDict[str, str] = OrderedDict()
+        # 摘要使用无工具绑定的共享模型实例（模型本身不保存历史记录，与主LLMClient互不影响）
         self._compression_model = create_llm_model()
 
     def count_tokens(self, messages: list[BaseMessage]) -> int:
         """
         计算消息列表的Token数量
 
-        这是一个简化的实现，实际应该使用具体模型的tokenizer
+        使用配置的分词器逐条计数；历史记录中的消息已缓存token数，应优先使用 HistoryManager.count_tokens
         """
         try:
-            # 将消息转换为字符串
-            text = get_buffer_string(messages)
-            # 简单估算：1 token ≈ 4 characters（对于英文）
-            # 对于中文，1 token ≈ 1.5-2 characters
-            # 这里使用保守估算
-            estimated_tokens = len(text) // 3
-            # 添加一些开销（系统消息、格式等）
-            overhead = len(messages) * 10
-            return estimated_tokens + overhead
+            return self.token_counter.count_messages(messages)
         except Exception as e:
             self.logger.error(f"Token计数失败: {e}")
             # 返回一个保守的估算
             return len(messages) * 100
 
-    def should_compress(self, messages: list[BaseMessage], force: bool = False) -> bool:
+    def should_compress(
+        self, messages: list[BaseMessage], force: bool = False, token_count: int | None = None, threshold_ratio: float | None = None
+    ) -> bool:
         """
         判断是否应该压缩
 
         Args:
             messages: 消息列表
             force: 是否强制压缩
+            token_count: 已知的消息token总数（如历史记录缓存的计数），None时重新计数
+            threshold_ratio: Token阈值比例，默认为 CONFIG.compression_token_threshold_ratio
 
         Returns:
             bool: 是否应该压缩
@@ -92,12 +99,16 @@ class ChatCompressor:
         if len(messages) < CONFIG.compression_min_messages:
             return False
         # 检查Token阈值
-        token_threshold = CONFIG.compression_model_token_limit * CONFIG.compression_token_threshold_ratio
-        if self.count_tokens(messages) > token_threshold:
+        token_threshold = CONFIG.compression_model_token_limit * (threshold_ratio or CONFIG.compression_token_threshold_ratio)
+        if token_count is None:
+            token_count = self.count_tokens(messages)
+        if token_count > token_threshold:
             return True
         return False
 
-    async def compress_messages(self, messages: list[BaseMessage], model_name: str, force: bool = False) -> CompressionResult:
+    async def compress_messages(
+        self, messages: list[BaseMessage], model_name: str, force: bool = False, token_count: int | None = None
+    ) -> CompressionResult:
         """
         压缩消息列表
 
@@ -105,6 +116,7 @@ class ChatCompressor:
             messages: 要压缩的消息列表
             model_name: 模型名称
             force: 是否强制压缩
+            token_count: 已知的消息token总数，None时重新计数
 
         Returns:
             CompressionResult: 压缩结果
@@ -113,11 +125,11 @@ class ChatCompressor:
         result = CompressionResult(status=CompressionStatus.NOOP, original_message_count=len(messages))
         try:
             # 检查是否应该压缩
-            should_compress = self.should_compress(messages, force)
+            should_compress = self.should_compress(messages, force, token_count)
             if not should_compress and not force:
                 return result
             # 计算原始Token数量
-            result.original_token_count = self.count_tokens(messages)
+            result.original_token_count = token_count if token_count is not None else self.count_tokens(messages)
             # 执行压缩
             compressed_messages, summary = await self._perform_compression(messages, model_name)
             # 计算压缩后Token数量
@@ -154,14 +166,17 @@ class ChatCompressor:
 
     async def _perform_compression(self, messages: list[BaseMessage], model_name: str) -> tuple[list[BaseMessage], str]:
         """
-        执行实际的压缩操作
+        执行实际的压缩操作（滚动摘要）
+
+        已有摘要不再重新摘要：只把上次压缩之后新增的消息合并进最低层摘要；
+        某层摘要超过 compression_summary_max_tokens 时并入上一层，最高层为 compression_summary_levels - 1。
 
         Args:
             messages: 要压缩的消息列表
             model_name: 模型名称
 
         Returns:
-            Tuple[list[BaseMessage], str]: (压缩后的消息, 摘要内容)
+            Tuple[list[BaseMessage], str]: (压缩后的消息, 最低层摘要内容)
         """
         # 计算要保留和压缩的消息分割点
         preserve_count = int(len(messages) * CONFIG.compression_preserve_ratio)
@@ -169,54 +184,108 @@ class ChatCompressor:
         # 分离要压缩的消息和要保留的消息
         messages_to_compress = messages[:-preserve_count]
         messages_to_keep = messages[-preserve_count:]
+        # 分离已有摘要（按层级）
+        summaries: dict[int, str] = {}
+        delta_messages = []
+        for msg in messages_to_compress:
+            if (level := self._summary_level(msg)) is not None:
+                summaries[level] = msg.content.split(": ", 1)[-1]
+            else:
+                delta_messages.append(msg)
         # 提取系统消息（如果需要保留）
         system_messages = []
         if CONFIG.compression_preserve_system:
-            system_messages = [msg for msg in messages_to_compress if isinstance(msg, SystemMessage)]
-            messages_to_compress = [msg for msg in messages_to_compress if not isinstance(msg, SystemMessage)]
-        # 生成摘要
-        summary = await self._generate_summary(messages_to_compress, model_name)
+            system_messages = [msg for msg in delta_messages if isinstance(msg, SystemMessage)]
+            delta_messages = [msg for msg in delta_messages if not isinstance(msg, SystemMessage)]
+        # 只把新增消息合并进最低层摘要
+        if delta_messages:
+            summaries[0] = await self._generate_summary(delta_messages, model_name, summaries.get(0))
+            self.metrics.increment_metric("chat_compression", "total_messages_compressed", len(delta_messages))
+        # 超出长度的摘要逐层上卷
+        top_level = max(CONFIG.compression_summary_levels, 1) - 1
+        for level in range(top_level):
+            if level in summaries and self.token_counter.count(summaries[level]) > CONFIG.compression_summary_max_tokens:
+                summaries[level + 1] = await self._generate_summary(summaries.pop(level), model_name, summaries.get(level + 1))
         # 构建压缩后的消息列表
         compressed_messages = []
         # 添加系统消息
         compressed_messages.extend(system_messages)
-        # 添加摘要作为系统消息
-        if summary:
-            compressed_messages.append(SystemMessage(content=f"之前的对话摘要: {summary}"))
+        # 添加摘要作为系统消息（从最早的高层摘要到最近的低层摘要）
+        for level in sorted(summaries, reverse=True):
+            prefix = "之前的对话摘要" if level == 0 else f"更早的对话摘要（第{level}层）"
+            compressed_messages.append(SystemMessage(content=f"{prefix}: {summaries[level]}", additional_kwargs={"summary_level": level}))
         # 添加保留的消息
         compressed_messages.extend(messages_to_keep)
-        return compressed_messages, summary
+        return compressed_messages, summaries.get(0, "")
+
+    @staticmethod
+    def _summary_level(message: BaseMessage) -> int | None:
+        """获取摘要消息的层级，非摘要消息返回None（兼容没有层级标记的旧摘要）"""
+        if not isinstance(message, SystemMessage):
+            return None
+        if (level := message.additional_kwargs.get("summary_level")) is not None:
+            return level
+        if isinstance(message.content, str) and message.content.startswith("之前的对话摘要: "):
+            return 0
+        return None
 
-    async def _generate_summary(self, messages: list[BaseMessage], model_name: str) -> str:
+    async def _generate_summary(self, content: list[BaseMessage] | str, model_name: str, previous_summary: str | None = None) -> str:
         """
-        生成对话摘要
+        生成对话摘要（按内容哈希缓存）
 
         Args:
-            messages: 要摘要的消息列表
+            content: 要摘要的消息列表，或要并入的下层摘要文本
             model_name: 模型名称
+            previous_summary: 已有摘要，提供时只把新内容合并进去
 
         Returns:
             str: 摘要内容
+
+        Raises:
+            Exception: 摘要模型调用失败或超时（由 compress_messages 处理，已有摘要保持不变）
         """
-        if not messages or not self._compression_model:
-            return "没有要摘要的对话历史"
-        try:
-            # 构建摘要提示
-            conversation_text = get_buffer_string(messages)
-            summary_prompt = f"""请提供以下对话的简洁摘要。 
+        conversation_text = content if isinstance(content, str) else get_buffer_string(content)
+        cache_key = hashlib.sha256(json.dumps([model_name, previous_summary, conversation_text], ensure_ascii=False).encode("utf-8")).hexdigest()
+        if (cached := self._summary_cache.get(cache_key)) is not None:
+            self._summary_cache.move_to_end(cache_key)
+            self.metrics.increment_metric("chat_compression", "summary_cache_hits")
+            return cached
+        # 构建摘要提示
+        if previous_summary:
+            summary_prompt = f"""以下是之前对话的摘要和之后新增的内容。
+请将新增内容合并进摘要，输出更新后的简洁摘要，保留关键点、决策和重要的上下文，以便将来参考。
+
+已有摘要:
+{previous_summary}
+
+新增内容:
+{conversation_text}
+"""
+        else:
+            summary_prompt = f"""请提供以下对话的简洁摘要。
 关注关键点、决策和重要的上下文，以便将来参考。
 
 要摘要的对话:
 {conversation_text}
 """
-            # 使用独立的模型实例，无历史记录干扰
-            messages = [HumanMessage(content=summary_prompt)]
-            # 添加超时控制，避免压缩操作无限等待
-            response = await asyncio.wait_for(
-                asyncio.get_event_loop().run_in_executor(None, self._compression_model.invoke, messages), timeout=120.0  # 120秒超时
+        # 使用独立的模型实例，无历史记录干扰
+        messages = [HumanMessage(content=summary_prompt)]
+        # 添加超时控制，避免压缩操作无限等待
+        if self.request_manager:
+            response = await self.request_manager.request(
+                self._compression_model.ainvoke,
+                messages,
+                priority=RequestPriority.LOW,
+                timeout=120.0,
+                metadata={"type": "compression"},
+                estimated_tokens=self.token_counter.count_messages(messages),
             )
-            summary_response = response.content if response and response.content else "生成摘要失败"
-            return summary_response.strip()
-        except Exception as e:
-            self.logger.error(f"生成摘要失败: {e}")
-            return f"生成摘要失败: {str(e)}"
+        else:
+            response = await asyncio.wait_for(self._compression_model.ainvoke(messages), timeout=120.0)  # 120秒超时
+        if not response or not response.content:
+            raise ValueError("摘要模型返回空内容")
+        summary = response.content.strip()
+        self._summary_cache[cache_key] = summary
+        while len(self._summary_cache) > 128:
+            self._summary_cache.popitem(last=False)
+        return summary
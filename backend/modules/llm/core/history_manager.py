@@ -1,16 +1,23 @@
-import copy
+import itertools
 import json
 import time
+from collections import deque
 
+from config import CONFIG
 from langchain.schema import BaseMessage
+from langchain_core.messages import message_to_dict
+from langchain_core.messages import messages_from_dict
 from pydantic import BaseModel
 
 from ..enums import HistoryMode
 from ..schemas import MessageMetadata
+from .history_store import HistoryStore
+from .token_counter import get_token_counter
+from .token_counter import TokenCounter
 
 
 class HistoryEntry(BaseModel):
-    """历史记录条目"""
+    """历史记录条目（不可变，读取时直接共享，不再复制）"""
 
     message: BaseMessage
     metadata: MessageMetadata
@@ -19,6 +26,7 @@ class HistoryEntry(BaseModel):
 
     class Config:
         arbitrary_types_allowed = True  # 允许BaseMessage类型
+        frozen = True  # 条目创建后不可修改
 
 
 class ContentValidator:
@@ -29,6 +37,9 @@ class ContentValidator:
         """验证消息是否有效"""
         if not message:
             return False
+        # 工具调用消息的内容通常为空
+        if ContentValidator.has_tool_calls(message):
+            return True
         # 检查消息内容
         if not hasattr(message, "content") or not message.content:
             return False
@@ -66,9 +77,22 @@ class HistoryManager:
     - 支持curated/comprehensive双模式
     - 内容验证和过滤
     - 历史记录清理和压缩
+    - 可选的持久化存储后端（只追加写入，按需加载最近的记录）
+    - 逐条缓存消息token数并增量维护总数
     """
 
-    def __init__(self, logger, metrics, max_history_size: int = 1000, enable_validation: bool = True, auto_cleanup: bool = True):
+    def __init__(
+        self,
+        logger,
+        metrics,
+        max_history_size: int = 1000,
+        enable_validation: bool = True,
+        auto_cleanup: bool = True,
+        store: HistoryStore | None = None,
+        conversation_id: str | None = None,
+        load_limit: int | None = None,
+        token_counter: TokenCounter | None = None,
+    ):
         """初始化历史记录管理器
 
         Args:
@@ -77,16 +101,71 @@ class HistoryManager:
             max_history_size: 最大历史记录数量
             enable_validation: 是否启用内容验证
             auto_cleanup: 是否自动清理无效记录
+            store: 持久化存储后端（可选，需同时提供conversation_id）
+            conversation_id: 会话ID
+            load_limit: 首次访问时从存储加载的最近记录条数，默认为max_history_size
+            token_counter: Token计数器，默认按 CONFIG.llm_tokenizer 创建
         """
         self.logger = logger
         self.metrics = metrics
         self.max_history_size = max_history_size
         self.enable_validation = enable_validation
         self.auto_cleanup = auto_cleanup
-        # 历史记录存储
-        self._comprehensive_history: list[HistoryEntry] = []
-        self._curated_cache: list[HistoryEntry] | None = None
-        self._cache_valid = False
+        # 历史记录存储：固定容量的环形缓冲区（auto_cleanup 关闭时不限容量），淘汰最旧条目为 O(1)
+        self._comprehensive_history: deque[HistoryEntry] = deque(maxlen=max_history_size if auto_cleanup else None)
+        # 条目ID索引（ID单调递增，清理后不会重复）
+        self._entries_by_id: dict[str, HistoryEntry] = {}
+        self._id_counter = itertools.count()
+        # 精选历史增量维护：已确定的条目 + 最后一条用户消息之后仍然有效的模型输出序列
+        self._curated_history: deque[HistoryEntry] = deque()
+        self._open_sequence: deque[HistoryEntry] = deque()  # 最后一条用户消息之后的模型输出序列
+        self._open_sequence_valid = True
+        # 每条消息的token数缓存在元数据中，两种模式的总数随增删增量更新
+        self.token_counter = token_counter or get_token_counter(CONFIG.llm_tokenizer)
+        self._comprehensive_tokens = 0
+        self._curated_tokens = 0
+        # 持久化存储：首次访问时才加载会话最近的记录
+        self.store = store if conversation_id else None
+        self.conversation_id = conversation_id
+        self.load_limit = load_limit or max_history_size
+        self._loaded = self.store is None
+
+    def _ensure_loaded(self) -> None:
+        """首次访问时从存储加载会话最近的记录"""
+        if not self._loaded:
+            self._loaded = True
+            self._load_from_store()
+
+    def _load_from_store(self) -> None:
+        """从存储加载会话最近的记录，替换当前内存中的历史"""
+        records = self.store.load_recent(self.conversation_id, self.load_limit)
+        self._comprehensive_history.clear()
+        self._entries_by_id.clear()
+        self._comprehensive_tokens = 0
+        last_seq = -1
+        for record in records:
+            message = messages_from_dict([record["message"]])[0]
+            metadata = MessageMetadata(**record["metadata"])
+            if metadata.token_count is None:
+                metadata.token_count = self.token_counter.count_message(message)
+            entry = HistoryEntry(message=message, metadata=metadata, entry_id=record["entry_id"], parent_id=record["parent_id"])
+            self._comprehensive_history.append(entry)
+            self._comprehensive_tokens += metadata.token_count
+            self._entries_by_id[entry.entry_id] = entry
+            # 条目ID格式为 msg_{序号}_{时间戳}，新ID从已有最大序号之后继续
+            try:
+                last_seq = max(last_seq, int(entry.entry_id.split("_")[1]))
+            except (IndexError, ValueError):
+                pass
+        self._id_counter = itertools.count(last_seq + 1)
+        self._rebuild_curated()
+        self.logger.debug(f"从存储加载会话 {self.conversation_id} 的 {len(records)} 条历史记录")
+
+    def reload(self) -> None:
+        """从存储重新加载会话（会话在其他进程中被更新后使用）"""
+        if self.store:
+            self._loaded = True
+            self._load_from_store()
 
     def add_message(self, message: BaseMessage, metadata: MessageMetadata | None = None, parent_id: str | None = None) -> str:
         """添加消息到历史记录
@@ -99,8 +178,9 @@ class HistoryManager:
         Returns:
             str: 消息条目ID
         """
+        self._ensure_loaded()
         # 生成条目ID
-        entry_id = f"msg_{len(self._comprehensive_history)}_{int(time.time())}"
+        entry_id = f"msg_{next(self._id_counter)}_{int(time.time())}"
         # 创建或更新元数据
         if metadata is None:
             metadata = MessageMetadata(timestamp=time.time())
@@ -120,16 +200,29 @@ class HistoryManager:
             self.metrics.increment_metric("history", "function_responses")
         if ContentValidator.has_tool_calls(message):
             self.metrics.increment_metric("history", "tool_calls")
-        # 创建历史条目
-        entry = HistoryEntry(message=copy.deepcopy(message), metadata=metadata, entry_id=entry_id, parent_id=parent_id)
+        # 计算一次token数并缓存在元数据中，之后的阈值检查不再重新计数
+        if metadata.token_count is None:
+            metadata.token_count = self.token_counter.count_message(message)
+        # 创建历史条目（浅复制，调用方之后替换消息字段不会影响历史记录）
+        entry = HistoryEntry(message=message.model_copy(), metadata=metadata, entry_id=entry_id, parent_id=parent_id)
+        # 缓冲区已满时先淘汰最旧的条目
+        if self._comprehensive_history.maxlen is not None and len(self._comprehensive_history) == self._comprehensive_history.maxlen:
+            self._evict_oldest()
         # 添加到综合历史记录
         self._comprehensive_history.append(entry)
+        self._entries_by_id[entry_id] = entry
+        self._comprehensive_tokens += metadata.token_count
+        if self.store:
+            record = {
+                "entry_id": entry_id,
+                "parent_id": parent_id,
+                "message": message_to_dict(entry.message),
+                "metadata": metadata.model_dump(mode="json"),
+            }
+            self.store.append(self.conversation_id, record)
         self.metrics.increment_metric("history", "total_entries")
-        # 使缓存失效
-        self._invalidate_cache()
-        # 自动清理
-        if self.auto_cleanup and len(self._comprehensive_history) > self.max_history_size:
-            self._cleanup_old_entries()
+        # 增量更新精选历史
+        self._update_curated(entry)
         self.logger.debug(f"添加历史条目: {entry_id}, 验证状态: {metadata.validation_status}")
         return entry_id
 
@@ -138,6 +231,8 @@ class HistoryManager:
     ) -> list[BaseMessage | HistoryEntry]:
         """获取历史记录
 
+        返回的消息和条目与历史记录共享（不复制），调用方应视为只读。
+
         Args:
             mode: 历史记录模式（comprehensive/curated）
             limit: 限制返回的条目数量
@@ -146,50 +241,90 @@ class HistoryManager:
         Returns:
             历史记录列表
         """
-        if mode == HistoryMode.COMPREHENSIVE:
-            entries = self._comprehensive_history
-        else:
-            entries = self._get_curated_history()
+        self._ensure_loaded()
+        entries = self._comprehensive_history if mode == HistoryMode.COMPREHENSIVE else self._curated_history
         # 应用限制
         if limit:
-            entries = entries[-limit:]
+            # 从尾部取最近的条目，耗时与limit成正比
+            entries = list(itertools.islice(reversed(entries), limit))[::-1]
         # 返回格式
         if include_metadata:
-            return [copy.deepcopy(entry) for entry in entries]
+            return list(entries)
         else:
-            return [copy.deepcopy(entry.message) for entry in entries]
-
-    def _get_curated_history(self) -> list[HistoryEntry]:
-        """获取筛选后的历史记录（只包含有效内容）"""
-        if self._cache_valid and self._curated_cache is not None:
-            return self._curated_cache
-        curated_entries = []
-        i = 0
-        while i < len(self._comprehensive_history):
-            entry = self._comprehensive_history[i]
-            if entry.message.type == "human":
-                # 用户消息总是保留
-                curated_entries.append(entry)
-                i += 1
-            else:
-                # 处理模型输出序列
-                model_sequence = []
-                is_valid_sequence = True
-                # 收集连续的模型消息
-                while i < len(self._comprehensive_history) and self._comprehensive_history[i].message.type != "human":
-                    model_entry = self._comprehensive_history[i]
-                    model_sequence.append(model_entry)
-                    # 检查序列有效性
-                    if self.enable_validation and model_entry.metadata.validation_status != "valid":
-                        is_valid_sequence = False
-                    i += 1
-                # 只有当整个模型序列都有效时才添加
-                if is_valid_sequence:
-                    curated_entries.extend(model_sequence)
-        # 更新缓存
-        self._curated_cache = curated_entries
-        self._cache_valid = True
-        return curated_entries
+            return [entry.message for entry in entries]
+
+    def count_tokens(self, mode: HistoryMode = HistoryMode.CURATED) -> int:
+        """获取历史记录的token总数（增量维护，耗时与历史长度无关）
+
+        Args:
+            mode: 历史记录模式（comprehensive/curated）
+
+        Returns:
+            int: token总数
+        """
+        self._ensure_loaded()
+        return self._comprehensive_tokens if mode == HistoryMode.COMPREHENSIVE else self._curated_tokens
+
+    def _update_curated(self, entry: HistoryEntry) -> None:
+        """增量更新精选历史（只重新检查当前未结束的模型输出序列）
+
+        用户消息总是保留并结束当前模型输出序列；连续的模型消息只有整个序列都有效时才保留。
+
+        Args:
+            entry: 新追加的历史条目
+        """
+        if entry.message.type == "human":
+            self._open_sequence.clear()
+            self._open_sequence_valid = True
+            self._curated_history.append(entry)
+            self._curated_tokens += entry.metadata.token_count
+            return
+        self._open_sequence.append(entry)
+        if not self._open_sequence_valid:
+            return
+        if self.enable_validation and entry.metadata.validation_status != "valid":
+            # 序列中出现无效条目：已加入精选历史的序列条目全部移出
+            self._open_sequence_valid = False
+            for _ in range(len(self._open_sequence) - 1):
+                self._curated_tokens -= self._curated_history.pop().metadata.token_count
+        else:
+            self._curated_history.append(entry)
+            self._curated_tokens += entry.metadata.token_count
+
+    def _rebuild_curated(self) -> None:
+        """根据综合历史重建精选历史（仅在清空、替换等批量修改后使用）"""
+        self._curated_history.clear()
+        self._curated_tokens = 0
+        self._open_sequence.clear()
+        self._open_sequence_valid = True
+        for entry in self._comprehensive_history:
+            self._update_curated(entry)
+
+    def get_entry(self, entry_id: str) -> HistoryEntry | None:
+        """按ID获取历史条目
+
+        Args:
+            entry_id: 条目ID
+
+        Returns:
+            HistoryEntry | None: 历史条目，不存在或已被清理时返回None
+        """
+        self._ensure_loaded()
+        return self._entries_by_id.get(entry_id)
+
+    def get_parent(self, entry_id: str) -> HistoryEntry | None:
+        """获取条目的父条目（对话树）
+
+        Args:
+            entry_id: 条目ID
+
+        Returns:
+            HistoryEntry | None: 父条目，不存在时返回None
+        """
+        self._ensure_loaded()
+        if (entry := self._entries_by_id.get(entry_id)) and entry.parent_id:
+            return self._entries_by_id.get(entry.parent_id)
+        return None
 
     def clear_history(self, keep_system_messages: bool = True):
         """清空历史记录
@@ -197,28 +332,51 @@ class HistoryManager:
         Args:
             keep_system_messages: 是否保留系统消息
         """
+        self._ensure_loaded()
         if keep_system_messages:
             # 只保留系统消息
             system_entries = [entry for entry in self._comprehensive_history if entry.message.type == "system"]
-            self._comprehensive_history = system_entries
+            self._comprehensive_history.clear()
+            self._comprehensive_history.extend(system_entries)
         else:
             self._comprehensive_history.clear()
-        self._invalidate_cache()
+        self._entries_by_id = {entry.entry_id: entry for entry in self._comprehensive_history}
+        self._comprehensive_tokens = sum(entry.metadata.token_count for entry in self._comprehensive_history)
+        self._rebuild_curated()
+        if self.store:
+            self.store.clear(self.conversation_id, keep_system_messages)
         self.logger.debug("历史记录已清空")
 
-    def replace_with_compressed_messages(self, compressed_messages: list[BaseMessage]) -> None:
+    def replace_with_compressed_messages(self, compressed_messages: list[BaseMessage], upto_entry_id: str | None = None) -> bool:
         """用压缩后的消息替换当前历史记录
 
+        压缩后的消息已包含需要保留的系统消息，因此替换前不再单独保留系统消息。
+
         Args:
             compressed_messages: 压缩后的消息列表
+            upto_entry_id: 压缩快照的最后一条条目ID，之后新增的条目保留在压缩消息之后；None表示替换全部历史
+
+        Returns:
+            bool: 是否已替换（快照条目已被清理时不替换）
         """
-        # 清空历史记录，保留系统消息
-        self.clear_history(keep_system_messages=True)
+        self._ensure_loaded()
+        tail: list[HistoryEntry] = []
+        if upto_entry_id is not None:
+            if upto_entry_id not in self._entries_by_id:
+                return False
+            entries = list(self._comprehensive_history)
+            index = next(i for i, entry in enumerate(entries) if entry.entry_id == upto_entry_id)
+            tail = entries[index + 1 :]
+        self.clear_history(keep_system_messages=False)
         # 添加压缩后的消息
         for message in compressed_messages:
             metadata = MessageMetadata(timestamp=time.time(), validation_status="valid", additional_data={"compressed": True})
             self.add_message(message, metadata)
-        self.logger.debug(f"历史记录已替换为压缩版本，包含 {len(compressed_messages)} 条消息")
+        # 恢复压缩期间新增的消息
+        for entry in tail:
+            self.add_message(entry.message, entry.metadata.model_copy(), entry.parent_id)
+        self.logger.debug(f"历史记录已替换为压缩版本，包含 {len(compressed_messages)} 条压缩消息和 {len(tail)} 条新消息")
+        return True
 
     def find_entries_by_content(self, search_text: str, mode: HistoryMode = HistoryMode.COMPREHENSIVE) -> list[HistoryEntry]:
         """根据内容搜索历史条目
@@ -230,13 +388,14 @@ class HistoryManager:
         Returns:
             匹配的历史条目列表
         """
-        entries = self._comprehensive_history if mode == HistoryMode.COMPREHENSIVE else self._get_curated_history()
+        self._ensure_loaded()
+        entries = self._comprehensive_history if mode == HistoryMode.COMPREHENSIVE else self._curated_history
         matching_entries = []
         search_lower = search_text.lower()
         for entry in entries:
             content = str(entry.message.content).lower()
             if search_lower in content:
-                matching_entries.append(copy.deepcopy(entry))
+                matching_entries.append(entry)
         return matching_entries
 
     def export_history(self, mode: HistoryMode = HistoryMode.COMPREHENSIVE, format: str = "json") -> str:
@@ -285,17 +444,31 @@ class HistoryManager:
         else:
             raise ValueError(f"Unsupported export format: {format}")
 
-    def _cleanup_old_entries(self):
-        """清理旧的历史条目"""
-        if len(self._comprehensive_history) <= self.max_history_size:
+    def _evict_oldest(self) -> None:
+        """淘汰最旧的历史条目（同步移出ID索引、精选历史和未结束序列，必要时重新检查同一序列的剩余条目）"""
+        entry = self._comprehensive_history.popleft()
+        self._entries_by_id.pop(entry.entry_id, None)
+        self._comprehensive_tokens -= entry.metadata.token_count
+        # 被淘汰的条目如在精选历史或未结束序列中，必然位于头部
+        if self._curated_history and self._curated_history[0] is entry:
+            self._curated_history.popleft()
+            self._curated_tokens -= entry.metadata.token_count
+        if self._open_sequence and self._open_sequence[0] is entry:
+            self._open_sequence.popleft()
+        if entry.message.type != "human" and self.enable_validation and entry.metadata.validation_status != "valid":
+            self._reevaluate_head_sequence()
+        self.logger.debug(f"淘汰旧的历史条目: {entry.entry_id}")
+
+    def _reevaluate_head_sequence(self) -> None:
+        """淘汰序列中的无效条目后，重新检查该序列剩余的条目（位于综合历史头部，之前因整个序列无效未进入精选历史）"""
+        if not self._open_sequence:
+            # 未结束序列已被全部淘汰，之后追加的模型消息开始新的序列
+            self._open_sequence_valid = True
+        head = list(itertools.takewhile(lambda e: e.message.type != "human", self._comprehensive_history))
+        if not head or any(e.metadata.validation_status != "valid" for e in head):
             return
-        # 保留最新的条目
-        remove_count = len(self._comprehensive_history) - self.max_history_size
-        self._comprehensive_history = self._comprehensive_history[remove_count:]
-        self._invalidate_cache()
-        self.logger.debug(f"清理了 {remove_count} 个旧的历史条目")
-
-    def _invalidate_cache(self):
-        """使缓存失效"""
-        self._cache_valid = False
-        self._curated_cache = None
+        # 剩余条目全部有效：按完整重建的结果放回精选历史头部
+        self._curated_history.extendleft(reversed(head))
+        self._curated_tokens += sum(e.metadata.token_count for e in head)
+        if self._open_sequence and self._open_sequence[0] is head[0]:
+            self._open_sequence_valid = True
@@ -0,0 +1,233 @@
+import json
+import logging
+import sqlite3
+import threading
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import delete
+from sqlalchemy import select
+from utils import DatabaseManager
+
+from ..models import LLMHistoryRecord
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryStore:
+    """
+    对话历史存储后端基类
+
+    记录格式为字典：entry_id、parent_id、message（message_to_dict的结果）、metadata（MessageMetadata的字典）。
+    写入只追加，读取只加载会话最近的若干条，会话历史不必常驻进程内存。
+    """
+
+    def append(self, conversation_id: str, record: dict[str, Any]) -> None:
+        """追加一条记录"""
+        raise NotImplementedError
+
+    def load_recent(self, conversation_id: str, limit: int | None = None) -> list[dict[str, Any]]:
+        """
+        加载会话最近的记录
+
+        Args:
+            conversation_id: 会话ID
+            limit: 最多加载的条数，None表示全部
+
+        Returns:
+            按写入顺序排列的记录列表
+        """
+        raise NotImplementedError
+
+    def clear(self, conversation_id: str, keep_system_messages: bool = True) -> None:
+        """清空会话记录"""
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """等待已提交的写入完成"""
+
+
+class MemoryHistoryStore(HistoryStore):
+    """进程内存储（同一进程内的多个客户端可共享会话）"""
+
+    def __init__(self):
+        self._records: dict[str, list[dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def append(self, conversation_id, record):
+        with self._lock:
+            self._records.setdefault(conversation_id, []).append(record)
+
+    def load_recent(self, conversation_id, limit=None):
+        with self._lock:
+            records = self._records.get(conversation_id, [])
+            return list(records[-limit:] if limit else records)
+
+    def clear(self, conversation_id, keep_system_messages=True):
+        with self._lock:
+            records = self._records.get(conversation_id, [])
+            self._records[conversation_id] = [record for record in records if keep_system_messages and record["message"]["type"] == "system"]
+
+
+class _WriteBehindStore(HistoryStore):
+    """
+    后台顺序写入的存储基类
+
+    追加和清空提交到单线程执行器按顺序执行，不阻塞调用方；
+    读取前先等待已提交的写入完成，保证读到自己的写入。
+    """
+
+    def __init__(self):
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-history")
+        self._pending: Future | None = None
+
+    def _submit(self, func, *args) -> None:
+        def run():
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"写入对话历史失败: {e}")
+
+        self._pending = self._writer.submit(run)
+
+    def append(self, conversation_id, record):
+        self._submit(self._append, conversation_id, record)
+
+    def clear(self, conversation_id, keep_system_messages=True):
+        self._submit(self._clear, conversation_id, keep_system_messages)
+
+    def flush(self):
+        if self._pending:
+            self._pending.result()
+
+    def load_recent(self, conversation_id, limit=None):
+        self.flush()
+        return self._load_recent(conversation_id, limit)
+
+    def _append(self, conversation_id: str, record: dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def _clear(self, conversation_id: str, keep_system_messages: bool) -> None:
+        raise NotImplementedError
+
+    def _load_recent(self, conversation_id: str, limit: int | None) -> list[dict[str, Any]]:
+        raise NotImplementedError
+
+
+class SQLiteHistoryStore(_WriteBehindStore):
+    """SQLite存储（单文件，可在同一主机的多个进程间共享）"""
+
+    def __init__(self, path: str | Path):
+        super().__init__()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_history ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, conversation_id TEXT NOT NULL, entry_id TEXT NOT NULL, parent_id TEXT, "
+                "message_type TEXT NOT NULL, message TEXT NOT NULL, message_metadata TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_history_conversation_id_id ON llm_history (conversation_id, id)")
+            self._conn.commit()
+
+    def _append(self, conversation_id, record):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO llm_history (conversation_id, entry_id, parent_id, message_type, message, message_metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    conversation_id,
+                    record["entry_id"],
+                    record["parent_id"],
+                    record["message"]["type"],
+                    json.dumps(record["message"], ensure_ascii=False, default=str),
+                    json.dumps(record["metadata"], ensure_ascii=False, default=str),
+                ),
+            )
+            self._conn.commit()
+
+    def _clear(self, conversation_id, keep_system_messages):
+        with self._lock:
+            if keep_system_messages:
+                self._conn.execute("DELETE FROM llm_history WHERE conversation_id = ? AND message_type != 'system'", (conversation_id,))
+            else:
+                self._conn.execute("DELETE FROM llm_history WHERE conversation_id = ?", (conversation_id,))
+            self._conn.commit()
+
+    def _load_recent(self, conversation_id, limit):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT entry_id, parent_id, message, message_metadata FROM llm_history WHERE conversation_id = ? ORDER BY id DESC LIMIT ?",
+                (conversation_id, limit or -1),
+            ).fetchall()
+        return [
+            {"entry_id": entry_id, "parent_id": parent_id, "message": json.loads(message), "metadata": json.loads(metadata)}
+            for entry_id, parent_id, message, metadata in reversed(rows)
+        ]
+
+
+class DatabaseHistoryStore(_WriteBehindStore):
+    """数据库存储（使用 db_uri 配置的数据库，多个服务进程/主机共享会话）"""
+
+    def _append(self, conversation_id, record):
+        with DatabaseManager() as db:
+            db.add(
+                LLMHistoryRecord(
+                    conversation_id=conversation_id,
+                    entry_id=record["entry_id"],
+                    parent_id=record["parent_id"],
+                    message_type=record["message"]["type"],
+                    message=json.loads(json.dumps(record["message"], ensure_ascii=False, default=str)),
+                    message_metadata=json.loads(json.dumps(record["metadata"], ensure_ascii=False, default=str)),
+                )
+            )
+
+    def _clear(self, conversation_id, keep_system_messages):
+        stmt = delete(LLMHistoryRecord).where(LLMHistoryRecord.conversation_id == conversation_id)
+        if keep_system_messages:
+            stmt = stmt.where(LLMHistoryRecord.message_type != "system")
+        with DatabaseManager() as db:
+            db.execute(stmt)
+
+    def _load_recent(self, conversation_id, limit):
+        stmt = select(LLMHistoryRecord).where(LLMHistoryRecord.conversation_id == conversation_id).order_by(LLMHistoryRecord.id.desc())
+        if limit:
+            stmt = stmt.limit(limit)
+        with DatabaseManager() as db:
+            rows = db.execute(stmt).scalars().all()
+            return [
+                {"entry_id": row.entry_id, "parent_id": row.parent_id, "message": row.message, "metadata": row.message_metadata}
+                for row in reversed(rows)
+            ]
+
+
+# 进程内共享的存储实例（同一后端只创建一个写入线程和连接）
+_STORES: dict[tuple[str, str], HistoryStore] = {}
+
+
+def create_history_store(backend: str, sqlite_path: str | Path | None = None) -> HistoryStore:
+    """
+    获取对话历史存储后端（同一配置在进程内共享一个实例）
+
+    Args:
+        backend: 存储后端，memory（进程内）、sqlite 或 database（db_uri 配置的数据库）
+        sqlite_path: sqlite 后端的数据库文件路径
+
+    Returns:
+        HistoryStore: 存储后端实例
+    """
+    key = (backend, str(sqlite_path) if backend == "sqlite" else "")
+    if key not in _STORES:
+        match backend:
+            case "memory":
+                _STORES[key] = MemoryHistoryStore()
+            case "sqlite":
+                _STORES[key] = SQLiteHistoryStore(sqlite_path)
+            case "database":
+                _STORES[key] = DatabaseHistoryStore()
+            case _:
+                raise ValueError(f"不支持的对话历史存储后端: {backend}")
+    return _STORES[key]
@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import get_logger
+
+from ..schemas import RequestConfig
+from .chat_compressor import ChatCompressor
+from .metrics_collector import MetricsCollector
+from .request_manager import RequestManager
+from .response_cache import ResponseCache
+from .semantic_cache import SemanticCache
+from .tool_manager import ToolMemo
+
+
+class LLMCore:
+    """
+    LLM共享核心
+
+    集中保存可在多个会话之间共享的重量级组件：
+    - RequestManager（后台worker、监控任务和线程池）
+    - 指标收集器、聊天压缩器、响应缓存和语义缓存
+    - 同步工具的执行线程池
+
+    每个会话（LLMClient）只保存自己的对话历史、工具列表和压缩状态，创建成本很低；
+    服务端可为每个用户或规划任务创建会话，而不会随会话数增加后台任务和线程池。
+    """
+
+    def __init__(
+        self,
+        logger=None,
+        request_config: RequestConfig | None = None,
+        response_cache: ResponseCache | None = None,
+        semantic_cache: SemanticCache | None = None,
+    ):
+        """
+        初始化共享核心
+
+        Args:
+            logger: 日志记录器（可选，默认自动创建）
+            request_config: RequestManager 统一配置
+            response_cache: 响应缓存（可选，默认按 request_config 创建）
+            semantic_cache: 语义缓存（可选，默认按 request_config.enable_semantic_cache 创建）
+        """
+        self.logger = logger or get_logger("llm")
+        self.metrics = MetricsCollector(self.logger)
+        self.request_config = request_config or RequestConfig()
+        self.request_manager = RequestManager(self.logger, self.metrics, self.request_config)
+        self.chat_compressor = ChatCompressor(self.logger, self.metrics, request_manager=self.request_manager)
+        self.response_cache = response_cache
+        if self.response_cache is None:
+            self.response_cache = ResponseCache(
+                self.logger,
+                self.metrics,
+                max_size=self.request_config.response_cache_size,
+                ttl=self.request_config.response_cache_ttl,
+                persist_path=self.request_config.response_cache_path,
+            )
+        self.semantic_cache = semantic_cache
+        if self.semantic_cache is None and self.request_config.enable_semantic_cache:
+            self.semantic_cache = SemanticCache(
+                self.logger,
+                self.metrics,
+                threshold=self.request_config.semantic_cache_threshold,
+                max_size=self.request_config.semantic_cache_size,
+                ttl=self.request_config.semantic_cache_ttl,
+                eviction=self.request_config.semantic_cache_eviction,
+            )
+        # 所有会话的同步工具共用一个线程池
+        self.tool_executor = ThreadPoolExecutor(max_workers=self.request_config.tool_thread_pool_size, thread_name_prefix="llm-tool")
+        # 所有会话共用工具结果记忆，相似行程规划的重复查询可跨会话复用
+        self.tool_memo = ToolMemo(self.request_config.tool_memo_size)
+
+
+# 进程内默认共享的核心
+_DEFAULT_CORE: LLMCore | None = None
+
+
+def get_llm_core() -> LLMCore:
+    """
+    获取进程内默认共享的LLM核心（首次调用时按默认配置创建）
+
+    Returns:
+        LLMCore: 共享核心
+    """
+    global _DEFAULT_CORE
+    if _DEFAULT_CORE is None:
+        _DEFAULT_CORE = LLMCore()
+    return _DEFAULT_CORE
@@ -19,6 +19,8 @@ class MetricsCollector:
         self.chat_compression: dict[str, Any] = {}
         self.request_manager: dict[str, Any] = {}
         self.stream_processing: dict[str, Any] = {}
+        self.response_cache: dict[str, Any] = {}
+        self.semantic_cache: dict[str, Any] = {}
         # 全局指标
         self.global_metrics: dict[str, Any] = {}
         # 初始化默认指标
@@ -61,6 +63,10 @@ class MetricsCollector:
             "successful_calls": 0,
             "failed_calls": 0,
             "cancelled_calls": 0,
+            "timeout_calls": 0,
+            "memo_hits": 0,
+            "memo_misses": 0,
+            "agent_iterations": 0,
             "average_execution_time": 0.0,
             "active_calls_count": 0,
             "queued_calls_count": 0,
@@ -71,8 +77,10 @@ class MetricsCollector:
             "total_compressions": 0,
             "successful_compressions": 0,
             "failed_compressions": 0,
+            "truncation_fallbacks": 0,
             "total_tokens_saved": 0,
             "total_messages_compressed": 0,
+            "summary_cache_hits": 0,
             "average_compression_ratio": 0.0,
             "success_rate": 0.0,
             "trigger_counts": {},
@@ -92,6 +100,8 @@ class MetricsCollector:
             "average_queue_wait_time": 0.0,
             "total_execution_time": 0.0,
             "throughput_per_minute": 0.0,
+            "token_budget_waits": 0,  # 因Token预算不足而等待的请求数
+            "token_budget_wait_time": 0.0,  # Token预算等待的总时间（秒）
             # 优先级分布
             "priority_urgent": 0,
             "priority_high": 0,
@@ -104,7 +114,32 @@ class MetricsCollector:
             "successful_streams": 0,
             "failed_streams": 0,
             "total_chunks_processed": 0,
+            "total_tokens_streamed": 0,
             "average_stream_duration": 0.0,
+            "average_time_to_first_token": 0.0,
+            "average_tokens_per_second": 0.0,
+            "idle_timeouts": 0,
+            "cancelled_streams": 0,
+        }
+        # 响应缓存指标
+        self.response_cache = {
+            "hits": 0,
+            "memory_hits": 0,
+            "persistent_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "stores": 0,
+            "hit_rate": 0.0,
+            "total_tokens_saved": 0,
+        }
+        # 语义缓存指标
+        self.semantic_cache = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "hit_rate": 0.0,
+            "average_similarity": 0.0,
         }
         # 全局指标
         self.global_metrics = {
@@ -162,6 +197,8 @@ class MetricsCollector:
             "chat_compression": self.chat_compression.copy(),
             "request_manager": self.request_manager.copy(),
             "stream_processing": self.stream_processing.copy(),
+            "response_cache": self.response_cache.copy(),
+            "semantic_cache": self.semantic_cache.copy(),
             "global_metrics": self.global_metrics.copy(),
         }
 
@@ -193,5 +230,7 @@ class MetricsCollector:
             "retry_success_rate": self.retry.get("success_rate", 0.0),
             "tool_calls": self.tool_management.get("total_calls", 0),
             "tokens_saved": self.chat_compression.get("total_tokens_saved", 0),
+            "cache_hit_rate": self.response_cache.get("hit_rate", 0.0),
+            "cache_tokens_saved": self.response_cache.get("total_tokens_saved", 0),
             "uptime_seconds": time.time() - self.global_metrics.get("client_start_time", time.time()),
         }
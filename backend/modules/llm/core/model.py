@@ -1,22 +1,112 @@
+import threading
+from collections import OrderedDict
+from typing import Any
+
+import httpx
 from config import CONFIG
+from langchain.tools import BaseTool
+from langchain_core.runnables import Runnable
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_openai import ChatOpenAI
 
+# 进程内共享的模型实例：(模型名, 温度, base_url) -> ChatOpenAI
+_MODELS: dict[tuple[str, float, str], ChatOpenAI] = {}
+# 进程内共享的HTTP客户端：base_url -> (同步客户端, 异步客户端)，同一服务的所有模型共用连接池
+_HTTP_CLIENTS: dict[str, tuple[httpx.Client, httpx.AsyncClient]] = {}
+_REGISTRY_LOCK = threading.Lock()
+# 工具schema缓存：id(工具) -> (工具, OpenAI格式schema)，保存工具引用以免id被新对象复用
+_TOOL_SCHEMAS: OrderedDict[int, tuple[BaseTool, dict]] = OrderedDict()
+_TOOL_SCHEMAS_SIZE = 512
+# 绑定工具后的模型缓存：(id(模型), 工具集指纹) -> (模型, 工具列表, 绑定后的模型)
+_BOUND_MODELS: OrderedDict[tuple[int, tuple[int, ...]], tuple[Any, list[BaseTool], Runnable]] = OrderedDict()
+_BOUND_MODELS_SIZE = 64
+
+
+def _get_http_clients(base_url: str) -> tuple[httpx.Client, httpx.AsyncClient]:
+    """获取指定服务的共享HTTP客户端（连接数和keep-alive按配置限制）"""
+    if base_url not in _HTTP_CLIENTS:
+        limits = httpx.Limits(
+            max_connections=CONFIG.llm_max_connections,
+            max_keepalive_connections=CONFIG.llm_max_keepalive_connections,
+            keepalive_expiry=CONFIG.llm_keepalive_expiry,
+        )
+        timeout = httpx.Timeout(CONFIG.llm_timeout)
+        _HTTP_CLIENTS[base_url] = (
+            httpx.Client(base_url=base_url, limits=limits, timeout=timeout),
+            httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout),
+        )
+    return _HTTP_CLIENTS[base_url]
+
 
 def create_llm_model(model: str = CONFIG.llm_model, temperature: float = CONFIG.llm_temperature) -> ChatOpenAI:
-    """创建LLM模型实例的工厂方法（无状态，无工具绑定）
+    """获取LLM模型实例的工厂方法（无状态，无工具绑定）
+
+    模型实例按 (模型名, 温度, base_url) 在进程内共享，同一服务的所有模型共用一个HTTP连接池，
+    创建再多的 LLMClient 也不会增加连接数和TLS握手次数。
 
     Args:
         model: 模型名称
         temperature: 温度参数
 
     Returns:
-        ChatOpenAI: 原始模型实例
+        ChatOpenAI: 原始模型实例（共享对象，调用方不应修改其属性）
+    """
+    key = (model, temperature, CONFIG.llm_base_url)
+    with _REGISTRY_LOCK:
+        if key not in _MODELS:
+            http_client, http_async_client = _get_http_clients(CONFIG.llm_base_url)
+            _MODELS[key] = ChatOpenAI(
+                model=model,
+                api_key=CONFIG.llm_api_key,
+                base_url=CONFIG.llm_base_url,
+                temperature=temperature,
+                max_retries=CONFIG.llm_retry_count,
+                timeout=CONFIG.llm_timeout,
+                http_client=http_client,
+                http_async_client=http_async_client,
+            )
+        return _MODELS[key]
+
+
+def get_tool_schema(tool: BaseTool) -> dict:
+    """获取工具的OpenAI格式schema（每个工具对象只序列化一次）
+
+    Args:
+        tool: 工具
+
+    Returns:
+        dict: 工具schema（共享对象，调用方不应修改）
+    """
+    if (cached := _TOOL_SCHEMAS.get(id(tool))) is not None and cached[0] is tool:
+        _TOOL_SCHEMAS.move_to_end(id(tool))
+        return cached[1]
+    schema = convert_to_openai_tool(tool)
+    _TOOL_SCHEMAS[id(tool)] = (tool, schema)
+    while len(_TOOL_SCHEMAS) > _TOOL_SCHEMAS_SIZE:
+        _TOOL_SCHEMAS.popitem(last=False)
+    return schema
+
+
+def bind_tools_cached(model: Any, tools: list[BaseTool]) -> Any:
+    """为模型绑定工具（相同模型和工具集只绑定一次）
+
+    工具集指纹为工具对象ID的有序元组，在不同工具集之间切换时直接复用之前绑定的模型。
+
+    Args:
+        model: 未绑定工具的模型
+        tools: 工具列表
+
+    Returns:
+        绑定工具后的模型，工具列表为空时返回原模型
     """
-    return ChatOpenAI(
-        model=model,
-        api_key=CONFIG.llm_api_key,
-        base_url=CONFIG.llm_base_url,
-        temperature=temperature,
-        max_retries=CONFIG.llm_retry_count,
-        timeout=CONFIG.llm_timeout,
-    )
+    if not tools:
+        return model
+    key = (id(model), tuple(id(tool) for tool in tools))
+    if (cached := _BOUND_MODELS.get(key)) is not None and cached[0] is model:
+        _BOUND_MODELS.move_to_end(key)
+        return cached[2]
+    bound = model.bind_tools([get_tool_schema(tool) for tool in tools])
+    _BOUND_MODELS[key] = (model, list(tools), bound)
+    while len(_BOUND_MODELS) > _BOUND_MODELS_SIZE:
+        _BOUND_MODELS.popitem(last=False)
+    return bound
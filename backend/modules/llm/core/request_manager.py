@@ -1,7 +1,9 @@
 import asyncio
+import functools
 import heapq
 import time
 import uuid
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 from typing import Callable
@@ -11,6 +13,7 @@ from typing import TypeVar
 from pydantic import BaseModel
 from pydantic import Field
 from utils import RateLimiter
+from utils import TokenBudget
 
 from ..enums import RequestPriority
 from ..enums import RequestStatus
@@ -31,9 +34,12 @@ class RequestInfo(BaseModel):
     completed_at: float | None = None
     timeout: float | None = None
     retry_count: int = 0
+    estimated_tokens: int = 0  # 估算的提示词token数（用于Token预算和短作业优先调度）
+    tenant_id: str | None = None  # 租户标识（同一优先级内各租户轮流调度）
     error_message: str | None = None
     result: Any | None = None
     metadata: dict[str, Any] = Field(default_factory=dict)
+    future: asyncio.Future | None = Field(default=None, exclude=True, repr=False)  # 请求结束（完成/失败/超时）时完成
 
     class Config:
         arbitrary_types_allowed = True  # 允许任意类型的result
@@ -54,27 +60,69 @@ class RequestInfo(BaseModel):
 
 
 class AsyncPriorityQueue(Generic[T]):
-    """异步优先级队列"""
+    """
+    异步优先级队列
+
+    出队顺序依次比较：
+    - 有效优先级：基础优先级，每等待 aging_interval 秒提升一级，长期高负载下低优先级请求也不会饿死
+    - 租户轮次：同一有效优先级内各租户轮流出队，单个租户大量提交不会挤占其他租户（未指定租户的项目不参与轮转）
+    - cost：同一轮次内按 cost 从小到大（如短作业优先）
+    - 插入顺序
+
+    等待时间带来的提升对所有项目相同，有效优先级的相对顺序不随时间变化，入队时计算一次排序键即可保持堆有序。
+    项目带有 request_id 时建立索引，支持O(1)查找和取消（惰性删除）。
+    """
 
-    def __init__(self):
-        self._heap: list[tuple[int, int, T]] = []  # (priority_value, counter, item)
+    def __init__(self, aging_interval: float | None = None):
+        """
+        初始化队列
+
+        Args:
+            aging_interval: 等待多少秒提升一级优先级，None 表示严格按优先级出队
+        """
+        self.aging_interval = aging_interval
+        self._heap: list[list] = []  # [有效优先级, 租户轮次, cost, counter, item]，item 为 None 表示已移除
+        self._index: dict[str, list] = {}  # request_id -> 堆条目
+        self._size = 0  # 未移除的项目数
         self._counter = 0  # 用于维持插入顺序
+        self._epoch = time.monotonic()
+        self._round = 0  # 最近出队项目的租户轮次
+        self._tenant_rounds: dict[str, int] = {}  # 租户 -> 下一个项目的轮次
         self._lock = asyncio.Lock()
         self._not_empty = asyncio.Condition(self._lock)
 
-    async def put(self, item: T, priority: RequestPriority) -> None:
-        """添加项目到队列"""
+    async def put(self, item: T, priority: RequestPriority, cost: int = 0, tenant: str | None = None) -> None:
+        """
+        添加项目到队列
+
+        Args:
+            item: 项目
+            priority: 优先级
+            cost: 同一轮次内的排序代价（越小越先出队），默认0即按插入顺序
+            tenant: 租户标识（如用户ID），None 表示不参与租户轮转
+        """
         async with self._not_empty:
-            # 优先级值越小，优先级越高（与RequestPriority.value相反）
+            # 优先级值越小，优先级越高（与RequestPriority.value相反）；后入队的项目按已过的老化周期数降级，等价于先入队的项目随等待提升
             priority_value = 5 - priority.value
-            heapq.heappush(self._heap, (priority_value, self._counter, item))
+            if self.aging_interval:
+                priority_value += int((time.monotonic() - self._epoch) // self.aging_interval)
+            if tenant is None:
+                tenant_round = self._round
+            else:
+                tenant_round = max(self._round, self._tenant_rounds.get(tenant, 0))
+                self._tenant_rounds[tenant] = tenant_round + 1
+            entry = [priority_value, tenant_round, cost, self._counter, item]
+            heapq.heappush(self._heap, entry)
+            if request_id := getattr(item, "request_id", None):
+                self._index[request_id] = entry
             self._counter += 1
+            self._size += 1
             self._not_empty.notify()
 
     async def get(self, timeout: float | None = None) -> T | None:
         """从队列获取项目（按优先级）"""
         async with self._not_empty:
-            while not self._heap:
+            while not self._size:
                 if timeout is None:
                     await self._not_empty.wait()
                 else:
@@ -82,30 +130,70 @@ class AsyncPriorityQueue(Generic[T]):
                         await asyncio.wait_for(self._not_empty.wait(), timeout=timeout)
                     except asyncio.TimeoutError:
                         return None
-
-            _, _, item = heapq.heappop(self._heap)
+            while True:
+                entry = heapq.heappop(self._heap)
+                if (item := entry[-1]) is not None:
+                    break
+            self._size -= 1
+            self._round = max(self._round, entry[1])
+            if request_id := getattr(item, "request_id", None):
+                self._index.pop(request_id, None)
+            self._prune_tenants()
             return item
 
+    def _prune_tenants(self) -> None:
+        """清理已轮转完的租户记录（下一轮次不超过当前轮次的租户与新租户等价）"""
+        if not self._size:
+            self._tenant_rounds.clear()
+        elif len(self._tenant_rounds) > 2 * self._size + 64:
+            self._tenant_rounds = {tenant: r for tenant, r in self._tenant_rounds.items() if r > self._round}
+
+    def remove(self, request_id: str) -> T | None:
+        """
+        从队列中移除项目
+
+        Args:
+            request_id: 请求ID
+
+        Returns:
+            T | None: 被移除的项目，不在队列中时返回None
+        """
+        if not (entry := self._index.pop(request_id, None)):
+            return None
+        item, entry[-1] = entry[-1], None
+        self._size -= 1
+        # 已移除的条目在出队时跳过；占比过高时重建堆，避免堆无限增长
+        if len(self._heap) > 2 * self._size + 64:
+            self._heap = [kept for kept in self._heap if kept[-1] is not None]
+            heapq.heapify(self._heap)
+        return item
+
     def size(self) -> int:
         """获取队列总大小"""
-        return len(self._heap)
+        return self._size
 
     def empty(self) -> bool:
         """检查队列是否为空"""
-        return len(self._heap) == 0
+        return self._size == 0
+
+    def items(self) -> list[T]:
+        """获取队列中的所有项目（不保证顺序）"""
+        return [entry[-1] for entry in self._heap if entry[-1] is not None]
 
     def get_items_by_id(self, request_id: str) -> T | None:
         """根据请求ID查找队列中的项目"""
-        for _, _, item in self._heap:
-            if hasattr(item, "request_id") and item.request_id == request_id:
-                return item
-        return None
+        entry = self._index.get(request_id)
+        return entry[-1] if entry else None
 
     async def clear(self) -> None:
         """清空队列"""
         async with self._lock:
             self._heap.clear()
+            self._index.clear()
+            self._tenant_rounds.clear()
+            self._size = 0
             self._counter = 0
+            self._round = 0
 
 
 class RequestManager:
@@ -115,7 +203,7 @@ class RequestManager:
     作为LLM模块的核心组件，负责：
     - 并发控制与队列管理
     - 请求优先级处理
-    - 速率限制与资源管理
+    - 速率限制（每分钟请求数）与Token预算（每分钟token数）
     - 请求生命周期管理
     - 统计信息收集
     """
@@ -138,15 +226,19 @@ class RequestManager:
         self.logger = logger
         self.metrics = metrics
         self.active_requests: dict[str, RequestInfo] = {}
-        self.completed_requests: list[RequestInfo] = []
+        self.completed_requests: deque[RequestInfo] = deque(maxlen=1000)  # 最近完成的请求
+        self._requests: dict[str, RequestInfo] = {}  # 请求ID索引（排队中、执行中及最近完成的请求）
         # 异步优先级队列
-        self.request_queue = AsyncPriorityQueue[RequestInfo]()
+        self.request_queue = AsyncPriorityQueue[RequestInfo](aging_interval=self.config.queue_aging_interval)
         self._semaphore = asyncio.Semaphore(self.config.max_concurrent_requests)
         self._lock = asyncio.Lock()
         self.rate_limiter = RateLimiter(self.config.max_requests_per_minute, 60.0)
-        self.thread_pool = ThreadPoolExecutor(max_workers=self.config.max_concurrent_requests)
+        # Token预算在出队执行时扣减，预算不足时请求留在队列中等待（而不是像请求数限制一样在提交时拒绝）
+        self.token_budget = TokenBudget(self.config.max_tokens_per_minute, 60.0) if self.config.max_tokens_per_minute else None
+        self.thread_pool = ThreadPoolExecutor(max_workers=self.config.sync_thread_pool_size, thread_name_prefix="llm-request")
         self._worker_task: asyncio.Task | None = None
         self._monitoring_task: asyncio.Task | None = None
+        self._running_tasks: set[asyncio.Task] = set()  # 正在执行的请求任务（保持引用，避免被垃圾回收）
         self._shutdown_event = asyncio.Event()
 
         self._start_background_tasks()
@@ -180,22 +272,73 @@ class RequestManager:
                 self.logger.error(f"启动后台任务失败: {e}")
 
     async def _worker_loop(self) -> None:
-        """工作线程循环"""
+        """
+        工作线程循环
+
+        先获取并发名额再从队列取请求，保证有空闲名额时才按优先级出队；
+        每个请求作为独立任务执行，最多同时执行 max_concurrent_requests 个。
+        """
         self.logger.debug("worker循环启动")
         loop_count = 0
         while not self._shutdown_event.is_set():
+            acquired = False
             try:
                 loop_count += 1
+                await self._semaphore.acquire()
+                acquired = True
                 self.logger.debug(f"worker循环第{loop_count}次，队列大小: {self.request_queue.size()}")
                 # 从优先级队列获取请求
                 if request_info := await self.request_queue.get(timeout=1.0):
                     self.logger.debug(f"从队列获取到请求: {request_info.request_id}")
-                    await self._execute_request(request_info)
+                    await self._wait_for_token_budget(request_info)
+                    # 等待预算期间可能已被取消
+                    if request_info.status == RequestStatus.CANCELLED:
+                        continue
+                    task = asyncio.create_task(self._dispatch_request(request_info))
+                    self._running_tasks.add(task)
+                    task.add_done_callback(self._running_tasks.discard)
+                    # 名额由任务结束时释放
+                    acquired = False
                 else:
                     self.logger.debug("队列超时，继续等待")
             except Exception as e:
                 self.logger.exception(f"工作线程循环错误: {e}")
                 await asyncio.sleep(1.0)
+            finally:
+                if acquired:
+                    self._semaphore.release()
+
+    async def _wait_for_token_budget(self, request_info: RequestInfo) -> None:
+        """
+        等待Token预算足够执行请求
+
+        出队的请求已是当前优先级最高（或同优先级内最先/最小）的请求，预算不足时worker在此等待，
+        后续请求不会越过它执行，大请求不会被持续到达的小请求饿死。
+        """
+        if not self.token_budget:
+            return
+        waited = 0.0
+        while True:
+            # 等待期间被取消的请求直接放弃，不占用预算
+            if request_info.status == RequestStatus.CANCELLED:
+                return
+            if self.token_budget.try_consume(request_info.estimated_tokens):
+                break
+            # 分段等待（每次最多0.5秒），取消后及时释放worker和并发名额
+            wait_time = min(max(self.token_budget.wait_time(request_info.estimated_tokens), 0.05), 0.5)
+            self.logger.debug(f"Token预算不足，请求 {request_info.request_id} 等待 {wait_time:.2f} 秒")
+            await asyncio.sleep(wait_time)
+            waited += wait_time
+        if waited:
+            self.metrics.increment_metric("request_manager", "token_budget_waits")
+            self.metrics.increment_metric("request_manager", "token_budget_wait_time", waited)
+
+    async def _dispatch_request(self, request_info: RequestInfo) -> None:
+        """执行请求并在结束后释放并发名额"""
+        try:
+            await self._execute_request(request_info)
+        finally:
+            self._semaphore.release()
 
     async def _monitoring_loop(self) -> None:
         """监控循环"""
@@ -218,10 +361,6 @@ class RequestManager:
                         [req for req in self.completed_requests if req.completed_at and (time.time() - req.completed_at) <= 60.0]
                     )
                     self.metrics.update_metric("request_manager", "throughput_per_minute", completed_in_last_minute)
-                    # 清理已完成的请求记录
-                    if len(self.completed_requests) > 1000:
-                        # 保留最近的记录
-                        self.completed_requests = self.completed_requests[-1000:]
             except Exception as e:
                 self.logger.error(f"监控循环错误: {e}")
 
@@ -232,6 +371,8 @@ class RequestManager:
         priority: RequestPriority = RequestPriority.NORMAL,
         timeout: float | None = None,
         metadata: dict[str, Any] | None = None,
+        estimated_tokens: int = 0,
+        tenant_id: str | None = None,
         **kwargs,
     ) -> Any:
         """
@@ -243,6 +384,8 @@ class RequestManager:
             priority: 请求优先级
             timeout: 超时时间
             metadata: 元数据
+            estimated_tokens: 估算的提示词token数（计入Token预算，启用短作业优先时决定同优先级内的顺序）
+            tenant_id: 租户标识（如用户ID），同一优先级内各租户轮流调度
             **kwargs: 函数关键字参数
 
         Returns:
@@ -251,10 +394,17 @@ class RequestManager:
         # 确保worker任务正在运行
         await self._ensure_worker_running()
         # 提交请求到队列
-        request_id = await self._request(func, *args, priority=priority, timeout=timeout, metadata=metadata, **kwargs)
+        request_id = await self._request(
+            func, *args, priority=priority, timeout=timeout, metadata=metadata, estimated_tokens=estimated_tokens, tenant_id=tenant_id, **kwargs
+        )
         self.logger.debug(f"请求已提交到队列: {request_id}")
         # 等待完成并返回结果
-        result = await self.wait_for_request(request_id, timeout)
+        try:
+            result = await self.wait_for_request(request_id, timeout)
+        except asyncio.CancelledError:
+            # 调用方已放弃（如流被关闭），尚在排队的请求不再执行
+            self.cancel_request(request_id)
+            raise
         self.logger.debug(f"请求完成: {request_id}")
         return result
 
@@ -265,6 +415,8 @@ class RequestManager:
         priority: RequestPriority = RequestPriority.NORMAL,
         timeout: float | None = None,
         metadata: dict[str, Any] | None = None,
+        estimated_tokens: int = 0,
+        tenant_id: str | None = None,
         **kwargs,
     ) -> str:
         """
@@ -276,6 +428,8 @@ class RequestManager:
             priority: 请求优先级
             timeout: 超时时间
             metadata: 元数据
+            estimated_tokens: 估算的提示词token数
+            tenant_id: 租户标识
             **kwargs: 函数关键字参数
 
         Returns:
@@ -297,84 +451,102 @@ class RequestManager:
             status=RequestStatus.QUEUED,
             created_at=time.time(),
             timeout=timeout or self.config.default_timeout,
+            estimated_tokens=estimated_tokens,
+            tenant_id=tenant_id,
             metadata=metadata or {},
+            future=asyncio.get_running_loop().create_future(),
         )
+        self._requests[request_id] = request_info
 
         # 存储函数和参数
         request_info.metadata.update({"func": func, "args": args, "kwargs": kwargs})
         # 添加到优先级队列
         self.logger.debug(f"准备将请求添加到队列: {request_id}, 优先级: {priority.name}")
-        await self.request_queue.put(request_info, priority)
+        await self.request_queue.put(request_info, priority, self._queue_cost(request_info), tenant_id)
         self.logger.debug(f"添加后队列大小: {self.request_queue.size()}")
         self.logger.debug(f"提交请求: {request_id} ({func.__name__ if hasattr(func, '__name__') else str(func)}) 优先级: {priority.name}")
         return request_id
 
+    def _queue_cost(self, request_info: RequestInfo) -> int:
+        """同一优先级内的排序代价：启用短作业优先时为估算token数，否则为0（按提交顺序）"""
+        return request_info.estimated_tokens if self.config.enable_shortest_job_first else 0
+
     async def _execute_request(self, request_info: RequestInfo) -> None:
         """执行请求"""
-        self.logger.debug(f"进入_execute_request: {request_info.request_id}")
-        async with self._semaphore:
-            self.logger.debug(f"获得semaphore，开始执行: {request_info.request_id}")
+        self.logger.debug(f"开始执行: {request_info.request_id}")
+        async with self._lock:
+            self.active_requests[request_info.request_id] = request_info
+            self.logger.debug(f"请求加入活动列表: {request_info.request_id}")
+            current_active = len(self.active_requests)
+            if current_active > self.metrics.request_manager.get("peak_concurrent_requests", 0):
+                self.metrics.update_metric("request_manager", "peak_concurrent_requests", current_active)
+        try:
+            request_info.status = RequestStatus.EXECUTING
+            request_info.started_at = time.time()
+            self.logger.debug(f"开始执行请求: {request_info.request_id}, 函数: {request_info.function_name}")
+            # 获取函数和参数
+            func = request_info.metadata["func"]
+            args = request_info.metadata["args"]
+            kwargs = request_info.metadata["kwargs"]
+            self.logger.debug(f"函数类型: {type(func)}, 是否协程函数: {asyncio.iscoroutinefunction(func)}")
+            # 执行函数（支持同步和异步）
+            if asyncio.iscoroutinefunction(func):
+                # 异步函数
+                self.logger.debug(f"执行异步函数: {func.__name__ if hasattr(func, '__name__') else str(func)}")
+                result = await asyncio.wait_for(func(*args, **kwargs), timeout=request_info.timeout)
+            else:
+                # 同步函数 - 使用专用线程池执行，避免占满事件循环的默认线程池
+                self.logger.debug(f"执行同步函数: {func.__name__ if hasattr(func, '__name__') else str(func)}")
+                loop = asyncio.get_running_loop()
+                result = await asyncio.wait_for(
+                    loop.run_in_executor(self.thread_pool, functools.partial(func, *args, **kwargs)),
+                    timeout=request_info.timeout,
+                )
+            self.logger.debug(f"函数执行完成，结果类型: {type(result)}")
+            request_info.result = result
+            request_info.status = RequestStatus.COMPLETED
+            request_info.completed_at = time.time()
+            self.logger.debug(f"请求执行成功: {request_info.request_id}")
+        except asyncio.TimeoutError as e:
+            request_info.status = RequestStatus.TIMEOUT
+            request_info.completed_at = time.time()
+            # 函数自身抛出的超时（如流式空闲超时）保留其原因
+            request_info.error_message = str(e) or f"LLM API请求超时 (当前超时设置: {request_info.timeout}秒)。"
+            self.logger.warning(f"请求超时: {request_info.request_id} - {request_info.error_message}")
+        except Exception as e:
+            request_info.status = RequestStatus.FAILED
+            request_info.completed_at = time.time()
+            request_info.error_message = str(e)
+            self.logger.exception(f"请求执行失败: {request_info.request_id} - {e}")
+            self.logger.debug(f"异常详情 - 类型: {type(e)}, 函数: {request_info.function_name}")
+            # 检查是否需要重试（异常可通过 retryable=False 声明不可重试，如已输出部分内容的流）
+            if self.config.enable_auto_retry and getattr(e, "retryable", True) and request_info.retry_count < self.config.max_retry_attempts:
+                self.logger.debug(f"准备重试请求: {request_info.request_id}")
+                await self._retry_request(request_info)
+                return
+        finally:
+            # 移出活动请求
             async with self._lock:
-                self.active_requests[request_info.request_id] = request_info
-                self.logger.debug(f"请求加入活动列表: {request_info.request_id}")
-            try:
-                request_info.status = RequestStatus.EXECUTING
-                request_info.started_at = time.time()
-                self.logger.debug(f"开始执行请求: {request_info.request_id}, 函数: {request_info.function_name}")
-                # 获取函数和参数
-                func = request_info.metadata["func"]
-                args = request_info.metadata["args"]
-                kwargs = request_info.metadata["kwargs"]
-                self.logger.debug(f"函数类型: {type(func)}, 是否协程函数: {asyncio.iscoroutinefunction(func)}")
-                # 执行函数（支持同步和异步）
-                if asyncio.iscoroutinefunction(func):
-                    # 异步函数
-                    self.logger.debug(f"执行异步函数: {func.__name__ if hasattr(func, '__name__') else str(func)}")
-                    result = await asyncio.wait_for(func(*args, **kwargs), timeout=request_info.timeout)
-                else:
-                    # 同步函数 - 使用线程池执行
-                    self.logger.debug(f"执行同步函数: {func.__name__ if hasattr(func, '__name__') else str(func)}")
-                    # 创建一个独立的执行任务，避免共享线程池的问题
-                    loop = asyncio.get_event_loop()
-                    # 使用loop.run_in_executor而不是共享的thread_pool
-                    # 这样可以避免线程池状态冲突
-                    result = await asyncio.wait_for(
-                        loop.run_in_executor(None, func, *args, **kwargs),
-                        timeout=request_info.timeout,
-                    )
-                self.logger.debug(f"函数执行完成，结果类型: {type(result)}")
-                request_info.result = result
-                request_info.status = RequestStatus.COMPLETED
-                request_info.completed_at = time.time()
-                self.logger.debug(f"请求执行成功: {request_info.request_id}")
-            except asyncio.TimeoutError:
-                request_info.status = RequestStatus.TIMEOUT
-                request_info.completed_at = time.time()
-                request_info.error_message = f"LLM API请求超时 (当前超时设置: {request_info.timeout}秒)。"
-                self.logger.warning(f"请求超时: {request_info.request_id} (当前超时设置: {request_info.timeout}秒)。")
-            except Exception as e:
-                request_info.status = RequestStatus.FAILED
-                request_info.completed_at = time.time()
-                request_info.error_message = str(e)
-                self.logger.exception(f"请求执行失败: {request_info.request_id} - {e}")
-                self.logger.debug(f"异常详情 - 类型: {type(e)}, 函数: {request_info.function_name}")
-                # 检查是否需要重试
-                if self.config.enable_auto_retry and request_info.retry_count < self.config.max_retry_attempts:
-                    self.logger.debug(f"准备重试请求: {request_info.request_id}")
-                    await self._retry_request(request_info)
-                    return
-            finally:
-                # 移出活动请求
-                async with self._lock:
-                    if request_info.request_id in self.active_requests:
-                        del self.active_requests[request_info.request_id]
-                        self.logger.debug(f"请求从活动列表移除: {request_info.request_id}")
-                # 添加到完成列表
-                self.completed_requests.append(request_info)
-                self.logger.debug(f"请求加入完成列表: {request_info.request_id}")
+                if request_info.request_id in self.active_requests:
+                    del self.active_requests[request_info.request_id]
+                    self.logger.debug(f"请求从活动列表移除: {request_info.request_id}")
+            # 重新入队等待重试的请求在最终结束时再归档；重试退避期间被取消的请求已由 cancel_request 归档
+            if request_info.status not in (RequestStatus.QUEUED, RequestStatus.CANCELLED):
+                self._finish_request(request_info)
                 # 更新统计信息
                 self._update_request_metrics(request_info)
 
+    def _finish_request(self, request_info: RequestInfo) -> None:
+        """归档已结束的请求并通知等待方"""
+        # 完成列表已满时，最早的记录被淘汰，同时移出ID索引
+        if len(self.completed_requests) == self.completed_requests.maxlen:
+            evicted = self.completed_requests.popleft()
+            self._requests.pop(evicted.request_id, None)
+        self.completed_requests.append(request_info)
+        self.logger.debug(f"请求加入完成列表: {request_info.request_id}")
+        if request_info.future and not request_info.future.done():
+            request_info.future.set_result(None)
+
     def _update_request_metrics(self, request_info: RequestInfo) -> None:
         """更新请求指标"""
         self.metrics.increment_metric("request_manager", "total_requests")
@@ -402,6 +574,8 @@ class RequestManager:
             self.metrics.increment_metric("request_manager", "failed_requests")
         elif request_info.status == RequestStatus.TIMEOUT:
             self.metrics.increment_metric("request_manager", "timeout_requests")
+        elif request_info.status == RequestStatus.CANCELLED:
+            self.metrics.increment_metric("request_manager", "cancelled_requests")
         if request_info.retry_count > 0:
             self.metrics.increment_metric("request_manager", f"retries_{request_info.retry_count}")
 
@@ -412,64 +586,71 @@ class RequestManager:
         request_info.created_at = time.time()
         request_info.started_at = None
         request_info.completed_at = None
-        # 延迟后重新提交
+        # 延迟后重新提交（等待期间可能已被取消）
         await asyncio.sleep(self.config.retry_delay * request_info.retry_count)
-        await self.request_queue.put(request_info, request_info.priority)
+        if request_info.status == RequestStatus.CANCELLED:
+            return
+        await self.request_queue.put(request_info, request_info.priority, self._queue_cost(request_info), request_info.tenant_id)
         self.logger.info(f"重试请求: {request_info.request_id} (第 {request_info.retry_count} 次)")
 
-    async def get_request_status(self, request_id: str) -> RequestInfo | None:
-        """获取请求状态"""
-        # 检查活动请求
-        async with self._lock:
-            if request_id in self.active_requests:
-                return self.active_requests[request_id]
+    def cancel_request(self, request_id: str) -> bool:
+        """
+        取消尚未开始执行的请求
 
-        # 检查完成请求
-        for request_info in self.completed_requests:
-            if request_info.request_id == request_id:
-                return request_info
+        Args:
+            request_id: 请求ID
 
-        # 检查队列中的请求
-        if queued_item := self.request_queue.get_items_by_id(request_id):
-            return queued_item
+        Returns:
+            bool: 是否已取消（请求不存在、已开始执行或已结束时返回False）
+        """
+        request_info = self._requests.get(request_id)
+        if not request_info or request_info.status != RequestStatus.QUEUED:
+            return False
+        # 排队中的请求从队列移除；重试退避或等待Token预算中的请求不在队列里，标记后不再执行
+        self.request_queue.remove(request_id)
+        request_info.status = RequestStatus.CANCELLED
+        request_info.completed_at = time.time()
+        request_info.error_message = "请求已取消"
+        self._finish_request(request_info)
+        self._update_request_metrics(request_info)
+        self.logger.debug(f"取消请求: {request_id}")
+        return True
 
-        return None
+    async def get_request_status(self, request_id: str) -> RequestInfo | None:
+        """获取请求状态"""
+        return self._requests.get(request_id)
 
     async def wait_for_request(self, request_id: str, timeout: float | None = None) -> Any | None:
         """等待请求完成"""
         self.logger.debug(f"开始等待请求完成: {request_id}, 超时: {timeout}")
-        start_time = time.time()
-        loop_count = 0
-        while True:
-            loop_count += 1
-            request_info = await self.get_request_status(request_id)
-            self.logger.debug(f"等待循环第{loop_count}次，请求状态: {request_info.status if request_info else 'None'}")
-            if not request_info:
-                self.logger.debug(f"请求信息不存在: {request_id}")
-                return None
-            if request_info.status in [
-                RequestStatus.COMPLETED,
-                RequestStatus.FAILED,
-                RequestStatus.TIMEOUT,
-            ]:
-                if request_info.status == RequestStatus.COMPLETED:
-                    self.logger.debug(f"请求完成，返回结果: {request_info.result}")
-                    return request_info.result
-                else:
-                    self.logger.debug(f"请求失败: {request_info.error_message}")
-                    raise RuntimeError(f"请求失败: {request_info.error_message}")
-            # 检查超时
-            if timeout and (time.time() - start_time) > timeout:
-                self.logger.debug(f"等待请求超时: {request_id}")
-                raise asyncio.TimeoutError(f"等待请求完成超时 (当前超时设置: {timeout}秒)。")
-            await asyncio.sleep(0.1)
+        request_info = self._requests.get(request_id)
+        if not request_info:
+            self.logger.debug(f"请求信息不存在: {request_id}")
+            return None
+        try:
+            # shield：等待方超时不影响请求本身的完成通知
+            await asyncio.wait_for(asyncio.shield(request_info.future), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.logger.debug(f"等待请求超时: {request_id}")
+            raise asyncio.TimeoutError(f"等待请求完成超时 (当前超时设置: {timeout}秒)。")
+        if request_info.status == RequestStatus.COMPLETED:
+            self.logger.debug(f"请求完成，返回结果: {request_info.result}")
+            return request_info.result
+        self.logger.debug(f"请求失败: {request_info.error_message}")
+        raise RuntimeError(f"请求失败: {request_info.error_message}")
 
     def get_queue_info(self) -> dict[str, Any]:
-        """获取队列信息"""
+        """获取队列信息（含Token预算使用情况）"""
         return {
             "current_queue_size": self.request_queue.size(),
             "max_queue_size": self.config.max_queue_size,
             "current_active_requests": len(self.active_requests),
             "max_concurrent_requests": self.config.max_concurrent_requests,
             "rate_limit_per_minute": self.config.max_requests_per_minute,
+            "token_limit_per_minute": self.config.max_tokens_per_minute,
+            "tokens_used_last_minute": self.token_budget.used() if self.token_budget else None,
+            "queued_tokens": sum(item.estimated_tokens for item in self.request_queue.items()),
+            "shortest_job_first": self.config.enable_shortest_job_first,
+            "aging_interval": self.config.queue_aging_interval,
+            "queued_tenants": len({item.tenant_id for item in self.request_queue.items() if item.tenant_id is not None}),
         }
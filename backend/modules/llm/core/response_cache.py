@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from langchain.schema import BaseMessage
+from langchain.tools import BaseTool
+from langchain_core.messages import message_to_dict
+from langchain_core.messages import messages_from_dict
+from pydantic import BaseModel
+
+from .model import get_tool_schema
+
+
+def make_cache_key(
+    model_name: str,
+    temperature: float,
+    messages: list[BaseMessage],
+    tools: list[BaseTool] | None = None,
+    response_format: dict | type[BaseModel] | None = None,
+) -> str:
+    """
+    计算响应缓存键
+
+    只取消息中影响模型输出的字段（类型、内容、工具调用），忽略消息ID等运行时信息。
+
+    Args:
+        model_name: 模型名称
+        temperature: 温度参数
+        messages: 发送给模型的完整消息列表
+        tools: 绑定到模型的工具
+        response_format: 结构化输出格式
+
+    Returns:
+        str: 缓存键
+    """
+    if isinstance(response_format, type) and issubclass(response_format, BaseModel):
+        schema = response_format.model_json_schema()
+    else:
+        schema = response_format
+    raw = json.dumps(
+        {
+            "model": model_name,
+            "temperature": temperature,
+            "messages": [
+                [message.type, message.content, getattr(message, "tool_calls", None) or None, getattr(message, "tool_call_id", None)]
+                for message in messages
+            ],
+            "tools": [get_tool_schema(tool) for tool in tools or []],
+            "schema": schema,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def copy_response(response: Any) -> Any:
+    """复制缓存的响应，避免调用方修改影响缓存内容"""
+    if isinstance(response, BaseModel):
+        return response.model_copy(deep=True)
+    if isinstance(response, dict):
+        return json.loads(json.dumps(response, ensure_ascii=False))
+    return response
+
+
+def _serialize_response(response: Any) -> tuple[str, str]:
+    """将响应序列化为（类型, JSON字符串），用于持久化"""
+    if isinstance(response, BaseMessage):
+        return "message", json.dumps(message_to_dict(response), ensure_ascii=False)
+    if isinstance(response, BaseModel):
+        return "model", response.model_dump_json()
+    return "dict", json.dumps(response, ensure_ascii=False)
+
+
+def _deserialize_response(kind: str, payload: str, response_format: dict | type[BaseModel] | None) -> Any:
+    """从持久化数据还原响应"""
+    if kind == "message":
+        return messages_from_dict([json.loads(payload)])[0]
+    if kind == "model":
+        return response_format.model_validate_json(payload)
+    return json.loads(payload)
+
+
+class SQLiteResponseStore:
+    """响应缓存的持久化层（SQLite单文件，可在多个进程间共享）"""
+
+    def __init__(self, path: str | Path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_response_cache ("
+                "key TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, tokens INTEGER NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def load(self, key: str) -> tuple[str, str, int, float] | None:
+        """读取缓存记录，不存在时返回None"""
+        with self._lock:
+            return self._conn.execute("SELECT kind, payload, tokens, created_at FROM llm_response_cache WHERE key = ?", (key,)).fetchone()
+
+    def save(self, key: str, kind: str, payload: str, tokens: int) -> None:
+        """写入缓存记录"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_response_cache (key, kind, payload, tokens, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, payload, tokens, time.time()),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        """删除缓存记录"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_response_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """清空缓存记录"""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_response_cache")
+            self._conn.commit()
+
+
+class ResponseCache:
+    """
+    LLM响应精确匹配缓存
+
+    两级缓存：
+    - 内存LRU（进程内，命中无IO）
+    - 可选的SQLite持久化层（重启后仍有效，命中后回填内存）
+    """
+
+    def __init__(self, logger, metrics, max_size: int = 256, ttl: float | None = None, persist_path: str | Path | None = None):
+        """
+        初始化响应缓存
+
+        Args:
+            logger: 日志记录器
+            metrics: MetricsCollector实例，用于统计记录
+            max_size: 内存缓存最大条目数
+            ttl: 缓存有效期（秒），None表示不过期
+            persist_path: 持久化缓存的SQLite文件路径，None表示仅使用内存缓存
+        """
+        self.logger = logger
+        self.metrics = metrics
+        self.max_size = max_size
+        self.ttl = ttl
+        # key -> (响应, token数, 写入时间)
+        self._memory: OrderedDict[str, tuple[Any, int, float]] = OrderedDict()
+        self._store = SQLiteResponseStore(persist_path) if persist_path else None
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def _remember(self, key: str, response: Any, tokens: int, created_at: float) -> None:
+        """写入内存LRU"""
+        self._memory[key] = (response, tokens, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    def _record_hit(self, tier: str, tokens: int) -> None:
+        self.metrics.increment_metric("response_cache", "hits")
+        self.metrics.increment_metric("response_cache", f"{tier}_hits")
+        self.metrics.increment_metric("response_cache", "total_tokens_saved", tokens)
+        self._update_hit_rate()
+
+    def _update_hit_rate(self) -> None:
+        hits = self.metrics.response_cache.get("hits", 0)
+        lookups = hits + self.metrics.response_cache.get("misses", 0)
+        self.metrics.update_metric("response_cache", "hit_rate", round(hits / lookups * 100, 2) if lookups else 0.0)
+
+    async def get(self, key: str, response_format: dict | type[BaseModel] | None = None) -> Any | None:
+        """
+        查询缓存
+
+        Args:
+            key: 缓存键
+            response_format: 结构化输出格式（用于从持久化层还原Pydantic模型）
+
+        Returns:
+            缓存的响应副本，未命中时返回None
+        """
+        if (cached := self._memory.get(key)) is not None:
+            response, tokens, created_at = cached
+            if not self._expired(created_at):
+                self._memory.move_to_end(key)
+                self._record_hit("memory", tokens)
+                return copy_response(response)
+            del self._memory[key]
+        if self._store:
+            try:
+                if (row := await asyncio.to_thread(self._store.load, key)) is not None:
+                    kind, payload, tokens, created_at = row
+                    if not self._expired(created_at):
+                        response = _deserialize_response(kind, payload, response_format)
+                        self._remember(key, response, tokens, created_at)
+                        self._record_hit("persistent", tokens)
+                        return copy_response(response)
+                    await asyncio.to_thread(self._store.delete, key)
+            except Exception as e:
+                self.logger.warning(f"读取持久化响应缓存失败: {e}")
+        self.metrics.increment_metric("response_cache", "misses")
+        self._update_hit_rate()
+        return None
+
+    async def set(self, key: str, response: Any, tokens: int = 0) -> None:
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            response: 模型响应（AIMessage、Pydantic模型或字典）
+            tokens: 本次调用消耗的token数（命中时计入节省量）
+        """
+        self._remember(key, copy_response(response), tokens, time.time())
+        self.metrics.increment_metric("response_cache", "stores")
+        if self._store:
+            try:
+                kind, payload = _serialize_response(response)
+                await asyncio.to_thread(self._store.save, key, kind, payload, tokens)
+            except Exception as e:
+                self.logger.warning(f"写入持久化响应缓存失败: {e}")
+
+    def clear(self, include_persistent: bool = False) -> None:
+        """
+        清空缓存
+
+        Args:
+            include_persistent: 是否同时清空持久化层
+        """
+        self._memory.clear()
+        if include_persistent and self._store:
+            self._store.clear()
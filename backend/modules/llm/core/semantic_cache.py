@@ -0,0 +1,326 @@
+import hashlib
+import json
+import re
+import time
+import zlib
+from typing import Any
+
+import numpy as np
+
+from .response_cache import copy_response
+
+# 归一化时移除的字符（空白、标点、下划线），保留中文、字母和数字
+_NON_WORD = re.compile(r"[\W_]+")
+# 中文数字统一为阿拉伯数字（"三日游"与"3日游"视为相同）
+_NUMERALS = str.maketrans("零一二两三四五六七八九", "01223456789")
+
+
+# 数字（阿拉伯数字或中文数字）
+_NUMBER = r"[\d.]+|[零一二两三四五六七八九十百千万]+"
+_CN_DIGITS = {char: value for value, char in enumerate("零一二三四五六七八九")} | {"两": 2}
+_CN_UNITS = {"十": 10, "百": 100, "千": 1000}
+# 出发日期（"5月3日"、"五月三号"）
+_DATE = re.compile(rf"({_NUMBER})\s*月\s*({_NUMBER})\s*(?:日|号)")
+# 出行天数
+_DAYS = re.compile(rf"({_NUMBER})\s*(?:天|日)")
+# 预算金额（"预算五千"、"预算1.5万元"、"5000元"）
+_BUDGET = re.compile(
+    rf"(?:预算|花费|费用|经费)[^\d零一二两三四五六七八九十]{{0,6}}({_NUMBER})\s*(万|千|k|w)?\s*(?:元|块|rmb)?|({_NUMBER})\s*(万|千|k|w)?\s*(?:元|块)",
+    re.IGNORECASE,
+)
+# 出行人数
+_TRAVELERS = re.compile(rf"({_NUMBER})\s*(?:个人|位|人)")
+# 目的地：紧邻天数或"旅游/旅行/游"等词之前的中文片段，再去掉前面的动词和量词
+_DESTINATION = re.compile(r"([\u4e00-\u9fff]{2,}?)(?=#天|旅游|旅行|之旅|自由行|游|玩)")
+_DESTINATION_PREFIX = re.compile(r"^.*(?:规划|安排|设计|制定|计划|推荐|帮我|给我|一个|一趟|一次|一份|去|到|往|在|的|个|趟|次|份)")
+# 不影响语义的客套词和语气词（计算相似度前移除）
+_FILLERS = re.compile(r"请|帮我|帮忙|麻烦|给我|一下|一个|一份|一趟|的|了|吧|呢|啊|呀|左右|大概|大约|差不多")
+
+
+def parse_number(text: str) -> float | None:
+    """
+    解析阿拉伯数字或中文数字（如 "5000"、"1.5"、"五千"、"两万三"）
+
+    Args:
+        text: 数字文本
+
+    Returns:
+        float | None: 数值，无法解析时返回None
+    """
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    total = section = digit = 0
+    last_unit = 1
+    for char in text:
+        if char in _CN_DIGITS:
+            digit = _CN_DIGITS[char]
+        elif char == "万":
+            total += (section + digit) * 10000
+            section = digit = 0
+            last_unit = 10000
+        elif char in _CN_UNITS:
+            section += (digit or 1) * _CN_UNITS[char]
+            digit = 0
+            last_unit = _CN_UNITS[char]
+        else:
+            return None
+    # 末尾省略的单位按上一个单位的下一级计算（"两万三"为23000，"三千五"为3500）
+    if digit and last_unit >= 100 and not text.endswith("零" + text[-1]):
+        digit *= last_unit // 10
+    return float(total + section + digit)
+
+
+def _format_number(value: float | None) -> str | None:
+    """数值格式化为不带多余小数的字符串"""
+    return None if value is None else f"{value:g}"
+
+
+class SlotExtractor:
+    """
+    规划请求的关键槽位提取器
+
+    提取目的地、出发日期、天数、预算和人数。向量相似度无法区分"北京"和"上海"、"五千"和"两万"这类只改了一个实体的提示词，
+    因此槽位必须完全相同才可能命中；槽位文本在计算相似度前替换为占位符，避免同一数值的不同写法（"五千"/"5000元"）降低相似度。
+    无法识别的槽位视为缺失，两个提示词只有缺失的槽位也一致时才可能命中（宁可未命中，不返回其他行程的结果）。
+    """
+
+    def extract(self, prompt: str) -> tuple[dict[str, str], str]:
+        """
+        提取槽位
+
+        Args:
+            prompt: 用户提示词
+
+        Returns:
+            tuple: (槽位字典, 槽位替换为占位符后的文本)
+        """
+        text = prompt.lower()
+        slots: dict[str, str] = {}
+        if match := _DATE.search(text):
+            month, day = parse_number(match.group(1)), parse_number(match.group(2))
+            if month is not None and day is not None:
+                slots["date"] = f"{month:g}-{day:g}"
+            text = text[: match.start()] + "#月#日" + text[match.end() :]
+        if match := _BUDGET.search(text):
+            number, unit = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+            if (value := parse_number(number)) is not None:
+                slots["budget"] = _format_number(value * {"万": 10000, "w": 10000, "千": 1000, "k": 1000}.get(unit or "", 1))
+            text = text[: match.start()] + "预算#" + text[match.end() :]
+        if match := _DAYS.search(text):
+            if (value := parse_number(match.group(1))) is not None:
+                slots["days"] = _format_number(value)
+            text = text[: match.start()] + "#天" + text[match.end() :]
+        if match := _DESTINATION.search(text):
+            if destination := _DESTINATION_PREFIX.sub("", match.group(1)):
+                slots["destination"] = destination
+                text = text[: match.end(1) - len(destination)] + "#" + text[match.end(1) :]
+        if match := _TRAVELERS.search(text):
+            if (value := parse_number(match.group(1))) is not None:
+                slots["travelers"] = _format_number(value)
+            text = text[: match.start()] + "#人" + text[match.end() :]
+        return slots, _FILLERS.sub("", text)
+
+
+class HashingVectorizer:
+    """
+    哈希n-gram向量化器
+
+    无需模型文件，在CPU上直接把文本映射为定长向量：
+    字符n-gram覆盖中文和拼写差异，英文单词特征覆盖词序变化，特征经CRC32哈希到固定维度并带符号累加。
+    """
+
+    def __init__(self, dim: int = 1024, ngram_range: tuple[int, int] = (2, 3)):
+        """
+        初始化向量化器
+
+        Args:
+            dim: 向量维度
+            ngram_range: 字符n-gram长度范围（闭区间）
+        """
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def _features(self, text: str) -> list[str]:
+        """提取文本特征"""
+        text = text.lower().translate(_NUMERALS)
+        features = [f"w:{word}" for word in _NON_WORD.split(text) if word]
+        compact = _NON_WORD.sub("", text)
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            features.extend(compact[i : i + n] for i in range(len(compact) - n + 1))
+        return features
+
+    def transform(self, text: str) -> np.ndarray:
+        """
+        将文本转换为L2归一化向量
+
+        Args:
+            text: 输入文本
+
+        Returns:
+            np.ndarray: float32向量
+        """
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if features := self._features(text):
+            hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in features), dtype=np.uint32, count=len(features))
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vector, hashes % self.dim, signs)
+        return vector
+
+
+class SemanticCache:
+    """
+    语义缓存
+
+    按提示词向量的余弦相似度查找近似请求并返回缓存的结构化结果：
+    - 向量保存在预分配的NumPy矩阵中，查询为一次矩阵向量乘法
+    - 只在同一作用域（模型、上下文、工具和输出格式相同，且目的地、日期、天数、预算、人数等槽位完全一致）内匹配
+    - 支持LRU或FIFO淘汰以及可选的有效期
+    """
+
+    def __init__(
+        self,
+        logger,
+        metrics,
+        threshold: float = 0.95,
+        max_size: int = 512,
+        ttl: float | None = None,
+        eviction: str = "lru",
+        vectorizer: Any | None = None,
+        slot_extractor: Any | None = None,
+    ):
+        """
+        初始化语义缓存
+
+        Args:
+            logger: 日志记录器
+            metrics: MetricsCollector实例，用于统计记录
+            threshold: 命中所需的最小余弦相似度（0~1）
+            max_size: 最大条目数
+            ttl: 缓存有效期（秒），None表示不过期
+            eviction: 淘汰策略，lru（最久未命中）或 fifo（最早写入）
+            vectorizer: 向量化器，需提供 transform(text) 或 embed_query(text)（如本地Embeddings模型），默认使用HashingVectorizer
+            slot_extractor: 槽位提取器，需提供 extract(prompt) -> (槽位字典, 替换槽位后的文本)，默认使用SlotExtractor
+        """
+        if eviction not in ("lru", "fifo"):
+            raise ValueError(f"不支持的淘汰策略: {eviction}")
+        self.logger = logger
+        self.metrics = metrics
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.eviction = eviction
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self.slot_extractor = slot_extractor or SlotExtractor()
+        self._size = 0
+        # 向量矩阵在首次写入时按实际维度分配
+        self._vectors: np.ndarray | None = None
+        self._scope_ids = np.zeros(max_size, dtype=np.int64)
+        self._created_at = np.zeros(max_size, dtype=np.float64)
+        self._last_used = np.zeros(max_size, dtype=np.float64)
+        self._responses: list[Any] = [None] * max_size
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _scope_id(scope: str, slots: dict[str, str]) -> int:
+        """将作用域（十六进制哈希）和槽位压缩为整数，便于向量化比较"""
+        if slots:
+            scope = hashlib.sha256(json.dumps([scope, sorted(slots.items())], ensure_ascii=False).encode("utf-8")).hexdigest()
+        return int(scope[:15], 16)
+
+    def _prepare(self, prompt: str, scope: str) -> tuple[np.ndarray, int]:
+        """提取槽位并计算向量和作用域ID"""
+        slots, text = self.slot_extractor.extract(prompt)
+        return self._embed(text), self._scope_id(scope, slots)
+
+    def _embed(self, text: str) -> np.ndarray:
+        """计算归一化的文本向量"""
+        if hasattr(self.vectorizer, "transform"):
+            vector = np.asarray(self.vectorizer.transform(text), dtype=np.float32)
+        else:
+            vector = np.asarray(self.vectorizer.embed_query(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _similarities(self, vector: np.ndarray, scope_id: int) -> np.ndarray:
+        """计算与同作用域内有效条目的相似度（其余条目为-1）"""
+        similarities = self._vectors[: self._size] @ vector
+        invalid = self._scope_ids[: self._size] != scope_id
+        if self.ttl is not None:
+            invalid |= self._created_at[: self._size] < time.time() - self.ttl
+        similarities[invalid] = -1.0
+        return similarities
+
+    def lookup(self, prompt: str, scope: str) -> Any | None:
+        """
+        查询语义缓存
+
+        Args:
+            prompt: 用户提示词
+            scope: 作用域（除当前提示词外的请求指纹）
+
+        Returns:
+            缓存结果的副本，未命中时返回None
+        """
+        if self._size and self._vectors is not None:
+            vector, scope_id = self._prepare(prompt, scope)
+            similarities = self._similarities(vector, scope_id)
+            best = int(np.argmax(similarities))
+            if (similarity := float(similarities[best])) >= self.threshold:
+                self._last_used[best] = time.time()
+                self.metrics.increment_metric("semantic_cache", "hits")
+                hits = self.metrics.semantic_cache["hits"]
+                current_avg = self.metrics.semantic_cache.get("average_similarity", 0.0)
+                self.metrics.update_metric("semantic_cache", "average_similarity", (current_avg * (hits - 1) + similarity) / hits)
+                self._update_hit_rate()
+                self.logger.debug(f"语义缓存命中: 相似度 {similarity:.3f}")
+                return copy_response(self._responses[best])
+        self.metrics.increment_metric("semantic_cache", "misses")
+        self._update_hit_rate()
+        return None
+
+    def add(self, prompt: str, scope: str, response: Any) -> None:
+        """
+        写入语义缓存
+
+        Args:
+            prompt: 用户提示词
+            scope: 作用域（除当前提示词外的请求指纹）
+            response: 结构化结果
+        """
+        vector, scope_id = self._prepare(prompt, scope)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+        slot = self._size
+        if self._size:
+            similarities = self._similarities(vector, scope_id)
+            best = int(np.argmax(similarities))
+            if similarities[best] >= 0.999:
+                # 相同提示词直接覆盖
+                slot = best
+            elif self._size == self.max_size:
+                slot = int(np.argmin(self._last_used if self.eviction == "lru" else self._created_at))
+                self.metrics.increment_metric("semantic_cache", "evictions")
+        if slot == self._size:
+            self._size += 1
+        now = time.time()
+        self._vectors[slot] = vector
+        self._scope_ids[slot] = scope_id
+        self._created_at[slot] = now
+        self._last_used[slot] = now
+        self._responses[slot] = copy_response(response)
+        self.metrics.increment_metric("semantic_cache", "stores")
+
+    def _update_hit_rate(self) -> None:
+        hits = self.metrics.semantic_cache.get("hits", 0)
+        lookups = hits + self.metrics.semantic_cache.get("misses", 0)
+        self.metrics.update_metric("semantic_cache", "hit_rate", round(hits / lookups * 100, 2) if lookups else 0.0)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._size = 0
+        self._responses = [None] * self.max_size
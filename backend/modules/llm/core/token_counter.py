@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from langchain.schema import BaseMessage
+
+logger = logging.getLogger(__name__)
+
+# 中日韩字符（BPE分词中通常每个字符对应1个或更多token）
+_CJK = re.compile(r"[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+# 每条消息的格式开销（角色标记、分隔符等，参考OpenAI聊天格式）
+MESSAGE_OVERHEAD = 4
+# tiktoken编码文件：编码名 -> (文件名, sha256)，与 tiktoken_ext.openai_public 一致
+_ENCODING_BASE_URL = "https://openaipublic.blob.core.windows.net/encodings/"
+_ENCODING_FILES = {
+    "r50k_base": ("r50k_base.tiktoken", "306cd27f03c1a714eca7108e03d66b7dc042abe8c258b44c199a7ed9838dd930"),
+    "p50k_base": ("p50k_base.tiktoken", "94b5ca7dff4d00767bc256fdd1b27e5b17361d7b8a5f968547f9f23eb70d2069"),
+    "p50k_edit": ("p50k_base.tiktoken", "94b5ca7dff4d00767bc256fdd1b27e5b17361d7b8a5f968547f9f23eb70d2069"),
+    "cl100k_base": ("cl100k_base.tiktoken", "223921b76ee99bde995b7ff738513eef100fb51d18c93597a113bcffe865b2a7"),
+    "o200k_base": ("o200k_base.tiktoken", "446a9538cb6c348e3516120d7c08b09f57c36495e2acfffe59a5bf8b0cfb1a2d"),
+}
+
+
+class TokenCounter:
+    """
+    Token计数器基类
+
+    子类只需实现 count(text)；消息的计数在文本基础上加上工具调用参数和固定的格式开销。
+    """
+
+    name = "base"
+
+    def count(self, text: str) -> int:
+        """计算文本的token数"""
+        raise NotImplementedError
+
+    def count_message(self, message: BaseMessage) -> int:
+        """
+        计算单条消息的token数
+
+        Args:
+            message: 消息
+
+        Returns:
+            int: token数（含格式开销）
+        """
+        if isinstance(message.content, str):
+            text = message.content
+        else:
+            # 多模态内容只统计文本部分
+            text = "".join(part if isinstance(part, str) else str(part.get("text", "")) for part in message.content)
+        tokens = self.count(text) + MESSAGE_OVERHEAD
+        if tool_calls := getattr(message, "tool_calls", None):
+            tokens += self.count(json.dumps([[call["name"], call["args"]] for call in tool_calls], ensure_ascii=False, default=str))
+        return tokens
+
+    def count_messages(self, messages: list[BaseMessage]) -> int:
+        """计算消息列表的token数"""
+        return sum(self.count_message(message) for message in messages)
+
+
+class TiktokenCounter(TokenCounter):
+    """基于tiktoken BPE编码的精确计数"""
+
+    def __init__(self, encoding):
+        """
+        Args:
+            encoding: tiktoken.Encoding 实例
+        """
+        self.encoding = encoding
+        self.name = encoding.name
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=())) if text else 0
+
+
+class HeuristicTokenCounter(TokenCounter):
+    """
+    估算计数（无法加载分词器时使用）
+
+    中日韩字符按每字1个token计，其余字符按每4个字符1个token计，比按总长度估算更接近BPE分词结果。
+    """
+
+    name = "heuristic"
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        cjk = len(_CJK.findall(text))
+        return cjk + (len(text) - cjk + 3) // 4
+
+
+def resolve_encoding_name(encoding: str) -> str:
+    """
+    将模型名解析为tiktoken编码名（编码名原样返回）
+
+    Args:
+        encoding: 编码名（如 cl100k_base）或模型名（如 gpt-4o）
+
+    Returns:
+        str: 编码名
+
+    Raises:
+        KeyError: 无法识别的模型名
+    """
+    if encoding in _ENCODING_FILES:
+        return encoding
+    from tiktoken.model import encoding_name_for_model
+
+    return encoding_name_for_model(encoding)
+
+
+def tiktoken_cache_path(encoding_name: str) -> Path | None:
+    """
+    编码文件在tiktoken本地缓存中的路径（缓存目录规则与tiktoken一致：TIKTOKEN_CACHE_DIR、DATA_GYM_CACHE_DIR 或系统临时目录）
+
+    Args:
+        encoding_name: 编码名
+
+    Returns:
+        Path | None: 缓存文件路径，未知编码或禁用了缓存时返回None
+    """
+    if encoding_name not in _ENCODING_FILES:
+        return None
+    if "TIKTOKEN_CACHE_DIR" in os.environ:
+        cache_dir = os.environ["TIKTOKEN_CACHE_DIR"]
+    elif "DATA_GYM_CACHE_DIR" in os.environ:
+        cache_dir = os.environ["DATA_GYM_CACHE_DIR"]
+    else:
+        cache_dir = os.path.join(tempfile.gettempdir(), "data-gym-cache")
+    if not cache_dir:
+        return None
+    url = _ENCODING_BASE_URL + _ENCODING_FILES[encoding_name][0]
+    return Path(cache_dir) / hashlib.sha1(url.encode()).hexdigest()
+
+
+def _is_cached(encoding_name: str) -> bool:
+    """编码文件已在本地缓存中且内容完整（校验失败时tiktoken会重新下载，因此必须提前校验）"""
+    path = tiktoken_cache_path(encoding_name)
+    if path is None or not path.is_file():
+        return False
+    return hashlib.sha256(path.read_bytes()).hexdigest() == _ENCODING_FILES[encoding_name][1]
+
+
+@lru_cache(maxsize=None)
+def get_token_counter(encoding: str = "cl100k_base") -> TokenCounter:
+    """
+    获取Token计数器（同一编码在进程内共享一个实例）
+
+    编码文件只从tiktoken本地缓存加载，不访问网络（离线主机不会在创建客户端时等待网络超时）；
+    缓存中没有时回退为估算计数，可通过 `python command.py llm --download-tokenizer` 预先下载到缓存目录。
+
+    Args:
+        encoding: tiktoken编码名（如 cl100k_base、o200k_base）或模型名（如 gpt-4o），heuristic 表示直接使用估算
+
+    Returns:
+        TokenCounter: 计数器实例
+    """
+    if encoding == "heuristic":
+        return HeuristicTokenCounter()
+    try:
+        import tiktoken
+
+        encoding_name = resolve_encoding_name(encoding)
+        if not _is_cached(encoding_name):
+            logger.warning(f"分词器 {encoding_name} 不在本地缓存（{tiktoken_cache_path(encoding_name)}）中，使用估算计数")
+            return HeuristicTokenCounter()
+        return TiktokenCounter(tiktoken.get_encoding(encoding_name))
+    except Exception as e:
+        logger.warning(f"加载分词器 {encoding} 失败，使用估算计数: {e}")
+        return HeuristicTokenCounter()
+
+
+def download_tokenizer(encoding: str) -> Path | None:
+    """
+    下载编码文件到tiktoken本地缓存（需要网络，仅用于部署时预先准备）
+
+    Args:
+        encoding: tiktoken编码名或模型名
+
+    Returns:
+        Path | None: 缓存文件路径
+    """
+    import tiktoken
+
+    encoding_name = resolve_encoding_name(encoding)
+    tiktoken.get_encoding(encoding_name)
+    get_token_counter.cache_clear()
+    return tiktoken_cache_path(encoding_name)
@@ -1,9 +1,17 @@
 import asyncio
+import copy
+import functools
+import json
+import threading
 import time
 import uuid
+from collections import deque
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 from langchain.tools import BaseTool
+from langchain_core.messages import ToolMessage
 from pydantic import BaseModel
 
 from ..enums import ToolCallStatus
@@ -23,6 +31,80 @@ class ToolCallInfo(BaseModel):
     result: Any | None = None
 
 
+class ToolMemo:
+    """
+    工具结果记忆存储
+
+    (工具名, 规范化参数) -> (结果, 写入时间)，LRU淘汰。LLMCore 持有一个实例供所有会话共享，
+    不同会话（如不同用户的相似行程规划）对同一地点的地理编码、POI详情等调用可直接复用结果；
+    因此启用记忆的工具在进程内应名称唯一。写入和命中时都复制结果，调用方修改返回值不会影响记忆内容。
+    """
+
+    def __init__(self, max_size: int = 256):
+        """
+        Args:
+            max_size: 最大条目数
+        """
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple[str, str], tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(tool_name: str, arguments: dict[str, Any]) -> tuple[str, str]:
+        """记忆键：工具名 + 规范化参数（键排序，与参数顺序无关）"""
+        return tool_name, json.dumps(arguments, sort_keys=True, ensure_ascii=False, default=str)
+
+    def get(self, tool_name: str, arguments: dict[str, Any], ttl: float | None = None) -> tuple[bool, Any]:
+        """
+        查询记忆结果
+
+        Args:
+            tool_name: 工具名称
+            arguments: 调用参数
+            ttl: 有效期（秒），None表示不过期
+
+        Returns:
+            tuple: (是否命中, 结果副本)
+        """
+        key = self._key(tool_name, arguments)
+        with self._lock:
+            if (cached := self._entries.get(key)) is None:
+                return False, None
+            result, created_at = cached
+            if ttl is not None and time.time() - created_at > ttl:
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+        return True, copy.deepcopy(result)
+
+    def set(self, tool_name: str, arguments: dict[str, Any], result: Any) -> None:
+        """写入记忆结果"""
+        key = self._key(tool_name, arguments)
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._entries[key] = (result, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self, tool_name: str | None = None) -> None:
+        """
+        清除记忆结果
+
+        Args:
+            tool_name: 工具名称，None表示清除全部
+        """
+        with self._lock:
+            if tool_name is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == tool_name]:
+                    del self._entries[key]
+
+
 class ToolManager:
     """
     工具调用管理器
@@ -31,101 +113,192 @@ class ToolManager:
     - 工具调用状态跟踪
     - 自动函数响应处理
     - 完整工具调用流程管理
+    - 有界并发调度：超出并发上限的调用进入FIFO队列，同步工具在独立线程池中执行，不阻塞事件循环
+    - 确定性工具的结果记忆（按工具启用，相同参数在有效期内直接返回上次结果）
     """
 
-    def __init__(self, logger, metrics, max_concurrent_calls: int = 3):
+    def __init__(
+        self,
+        logger,
+        metrics,
+        max_concurrent_calls: int = 3,
+        memo_size: int = 256,
+        executor: ThreadPoolExecutor | None = None,
+        memo: ToolMemo | None = None,
+    ):
         """
         初始化工具管理器
 
         Args:
             max_concurrent_calls: 最大并发工具调用数
             metrics: MetricsCollector实例，用于统计记录
+            memo_size: 单独创建记忆存储时的最大条目数（所有启用记忆的工具共享，LRU淘汰）
+            executor: 同步工具的执行线程池（可选，传入后多个工具管理器共用，默认单独创建）
+            memo: 工具结果记忆存储（可选，传入后多个工具管理器共用，默认单独创建）
         """
         self.logger = logger
         self.metrics = metrics
         self.tools: dict[str, BaseTool] = {}
         self.active_calls: dict[str, ToolCallInfo] = {}
-        self.call_queue: list[ToolCallInfo] = []
+        # 等待执行的调用：(调用信息, 超时时间, 结果Future)
+        self.call_queue: deque[tuple[ToolCallInfo, float | None, asyncio.Future]] = deque()
         self.max_concurrent_calls = max_concurrent_calls
+        # 同步工具的执行线程池（单独创建时线程数与并发上限一致）
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_concurrent_calls, thread_name_prefix="llm-tool")
+        # 结果记忆：本管理器中启用记忆的工具 -> 有效期（秒，None表示不过期）；记忆内容保存在（可共享的）存储中
+        self._memo_ttls: dict[str, float | None] = {}
+        self.memo = memo if memo is not None else ToolMemo(memo_size)
+
+    def register_tool(self, tool: BaseTool, memoize: bool = False, memo_ttl: float | None = None) -> None:
+        """
+        注册工具
 
-    def register_tool(self, tool: BaseTool) -> None:
-        """注册工具"""
+        Args:
+            tool: 工具
+            memoize: 是否记忆结果（仅用于相同参数总是返回相同结果的工具，如地理编码、POI详情）
+            memo_ttl: 记忆结果的有效期（秒），None表示不过期
+        """
         self.tools[tool.name] = tool
+        if memoize:
+            self._memo_ttls[tool.name] = memo_ttl
+        else:
+            self._memo_ttls.pop(tool.name, None)
         self.logger.debug(f"注册工具: {tool.name}")
 
-    def register_tools(self, tools: list[BaseTool]) -> None:
+    def register_tools(self, tools: list[BaseTool], memoize: bool = False, memo_ttl: float | None = None) -> None:
         """批量注册工具"""
         for tool in tools:
-            self.register_tool(tool)
+            self.register_tool(tool, memoize=memoize, memo_ttl=memo_ttl)
 
     def unregister_tool(self, tool_name: str) -> None:
         """注销工具"""
         if tool_name in self.tools:
             del self.tools[tool_name]
+            # 记忆存储可能与其他会话共享，只停止本管理器对该工具的记忆，不清除已有结果
+            self._memo_ttls.pop(tool_name, None)
             self.logger.debug(f"注销工具: {tool_name}")
 
-    async def schedule_tool_call(self, tool_name: str, arguments: dict[str, Any]) -> str:
+    def clear_memo(self, tool_name: str | None = None) -> None:
+        """
+        清除记忆的工具结果
+
+        Args:
+            tool_name: 工具名称，None表示清除全部
+        """
+        self.memo.clear(tool_name)
+
+    def _get_memo(self, tool_name: str, arguments: dict[str, Any]) -> tuple[bool, Any]:
+        """查询记忆结果，返回 (是否命中, 结果副本)"""
+        if tool_name not in self._memo_ttls:
+            return False, None
+        hit, result = self.memo.get(tool_name, arguments, self._memo_ttls[tool_name])
+        if not hit:
+            self.metrics.increment_metric("tool_management", "memo_misses")
+        return hit, result
+
+    def _set_memo(self, tool_name: str, arguments: dict[str, Any], result: Any) -> None:
+        """记忆成功的工具结果"""
+        if tool_name in self._memo_ttls:
+            self.memo.set(tool_name, arguments, result)
+
+    def schedule_tool_call(
+        self, tool_name: str, arguments: dict[str, Any], timeout: float | None = None, call_id: str | None = None
+    ) -> asyncio.Future:
         """
         调度工具调用
 
+        并发调用数未达上限时立即执行，否则进入队列等待。取消返回的Future会取消排队或执行中的调用。
+
         Args:
             tool_name: 工具名称
             arguments: 工具参数
+            timeout: 超时时间（秒），None表示不限制
+            call_id: 调用ID（如模型返回的工具调用ID），默认自动生成
 
         Returns:
-            str: 调用ID
+            asyncio.Future: 调用结束后返回 ToolCallInfo（包含状态、结果或错误信息）
         """
         if tool_name not in self.tools:
             raise ValueError(f"工具 '{tool_name}' 未注册")
-        call_id = str(uuid.uuid4())
-        # 创建工具调用信息
         call_info = ToolCallInfo(
-            call_id=call_id,
+            call_id=call_id or str(uuid.uuid4()),
             tool_name=tool_name,
             arguments=arguments,
             status=ToolCallStatus.EXECUTING,
         )
-        # 验证参数
-        try:
-            tool = self.tools[tool_name]
-            # 这里可以添加参数验证逻辑
-            self.logger.debug(f"工具调用开始: {call_id}")
-        except Exception as e:
-            call_info.status = ToolCallStatus.ERROR
-            call_info.error_message = f"参数验证失败: {e}"
-            self.logger.error(f"工具调用验证失败 {call_id}: {e}")
-            # 记录验证失败的工具调用
-            self.metrics.increment_metric("tool_management", "failed_calls")
+        future = asyncio.get_running_loop().create_future()
+        # 命中记忆结果时不再执行工具
+        hit, result = self._get_memo(tool_name, arguments)
+        if hit:
+            call_info.status = ToolCallStatus.SUCCESS
+            call_info.result = result
+            call_info.start_time = call_info.end_time = time.time()
+            call_info.duration_ms = 0.0
+            self.metrics.increment_metric("tool_management", "memo_hits")
             self.metrics.increment_metric("tool_management", "total_calls")
-            return call_id
+            self.logger.debug(f"工具调用命中记忆结果: {call_info.call_id} ({tool_name})")
+            future.set_result(call_info)
+            return future
         # 添加到队列或直接执行
         if len(self.active_calls) >= self.max_concurrent_calls:
-            self.call_queue.append(call_info)
-            self.logger.debug(f"工具调用加入队列: {call_id}")
+            self.call_queue.append((call_info, timeout, future))
+            self.logger.debug(f"工具调用加入队列: {call_info.call_id}")
         else:
-            self.active_calls[call_id] = call_info
-            asyncio.create_task(self._execute_tool_call(call_id))
-        return call_id
-
-    async def _execute_tool_call(self, call_id: str) -> None:
-        """执行工具调用"""
-        if call_id not in self.active_calls:
-            return
-        call_info = self.active_calls[call_id]
+            self._start_tool_call(call_info, timeout, future)
+        self._update_call_counts()
+        return future
+
+    def _start_tool_call(self, call_info: ToolCallInfo, timeout: float | None, future: asyncio.Future) -> None:
+        """开始执行工具调用（调用方取消Future时同时取消执行）"""
+        self.active_calls[call_info.call_id] = call_info
+        task = asyncio.create_task(self._execute_tool_call(call_info, timeout, future))
+        future.add_done_callback(lambda f: task.cancel() if f.cancelled() else None)
+
+    async def _execute_tool_call(self, call_info: ToolCallInfo, timeout: float | None, future: asyncio.Future) -> None:
+        """执行工具调用并设置结果"""
+        try:
+            await self._run_tool(call_info, timeout)
+        except asyncio.CancelledError:
+            call_info.status = ToolCallStatus.CANCELLED
+            self.metrics.increment_metric("tool_management", "cancelled_calls")
+            self.logger.debug(f"工具调用已取消: {call_info.call_id}")
+        finally:
+            self.active_calls.pop(call_info.call_id, None)
+            if not future.done():
+                future.set_result(call_info)
+            # 处理队列中的下一个调用
+            self._process_next_in_queue()
+
+    @staticmethod
+    def _is_async_tool(tool: BaseTool) -> bool:
+        """判断工具是否有原生异步实现（BaseTool都有arun，但同步工具的arun只是包装了同步函数）"""
+        if hasattr(tool, "coroutine"):
+            # StructuredTool / Tool：是否提供了协程函数
+            return tool.coroutine is not None
+        return type(tool)._arun is not BaseTool._arun
+
+    async def _run_tool(self, call_info: ToolCallInfo, timeout: float | None = None) -> None:
+        """
+        执行单个工具调用并记录状态和指标（结果或错误写入call_info）
+
+        Args:
+            call_info: 工具调用信息
+            timeout: 超时时间（秒），None表示不限制
+        """
         tool = self.tools[call_info.tool_name]
         try:
             call_info.start_time = time.time()
-            self.logger.debug(f"开始执行工具调用: {call_id} ({call_info.tool_name})")
-            # 执行工具
-            if hasattr(tool, "arun"):
-                # 异步工具
-                result = await tool.arun(**call_info.arguments)
+            self.logger.debug(f"开始执行工具调用: {call_info.call_id} ({call_info.tool_name})")
+            # 执行工具：异步工具在事件循环中执行，同步工具在线程池中执行
+            if self._is_async_tool(tool):
+                execution = tool.ainvoke(call_info.arguments)
             else:
-                # 同步工具
-                result = tool.run(**call_info.arguments)
+                execution = asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(tool.invoke, call_info.arguments))
+            result = await asyncio.wait_for(execution, timeout=timeout)
 
             call_info.result = result
             call_info.status = ToolCallStatus.SUCCESS
+            self._set_memo(call_info.tool_name, call_info.arguments, result)
             call_info.end_time = time.time()
             call_info.duration_ms = (call_info.end_time - call_info.start_time) * 1000
             # 记录成功的工具调用
@@ -135,27 +308,72 @@ class ToolManager:
             total_successful = self.metrics.tool_management.get("successful_calls", 1)
             new_avg = (current_avg * (total_successful - 1) + call_info.duration_ms) / total_successful
             self.metrics.update_metric("tool_management", "average_execution_time", new_avg)
-            self.logger.debug(f"工具调用执行成功: {call_id}, 耗时: {call_info.duration_ms:.2f}ms")
+            self.logger.debug(f"工具调用执行成功: {call_info.call_id}, 耗时: {call_info.duration_ms:.2f}ms")
         except Exception as e:
             call_info.status = ToolCallStatus.ERROR
-            call_info.error_message = str(e)
             call_info.end_time = time.time()
             if call_info.start_time:
                 call_info.duration_ms = (call_info.end_time - call_info.start_time) * 1000
+            if isinstance(e, asyncio.TimeoutError):
+                call_info.error_message = f"工具调用超时（{timeout}秒）"
+                self.metrics.increment_metric("tool_management", "timeout_calls")
+            else:
+                call_info.error_message = str(e)
             # 记录失败的工具调用
             self.metrics.increment_metric("tool_management", "failed_calls")
-            self.logger.error(f"工具调用执行失败: {call_id} - {e}")
+            self.logger.error(f"工具调用执行失败: {call_info.call_id} - {call_info.error_message}")
         finally:
             # 记录总调用数
             self.metrics.increment_metric("tool_management", "total_calls")
-            del self.active_calls[call_id]
-            # 处理队列中的下一个调用
-            await self._process_next_in_queue()
-
-    async def _process_next_in_queue(self) -> None:
-        """处理队列中的下一个调用"""
-        if not self.call_queue or len(self.active_calls) >= self.max_concurrent_calls:
-            return
-        next_call = self.call_queue.pop(0)
-        self.active_calls[next_call.call_id] = next_call
-        asyncio.create_task(self._execute_tool_call(next_call.call_id))
+
+    async def execute_tool_calls(self, tool_calls: list[dict[str, Any]], timeout: float | None = None) -> list[ToolMessage]:
+        """
+        并发执行模型一轮返回的全部工具调用（与其他调用共享 max_concurrent_calls 上限）
+
+        工具未注册、执行失败或超时时，错误信息作为工具结果返回给模型，不抛出异常。
+
+        Args:
+            tool_calls: 模型返回的工具调用列表（AIMessage.tool_calls）
+            timeout: 单个工具调用的超时时间（秒）
+
+        Returns:
+            list[ToolMessage]: 与工具调用顺序一致的工具结果消息
+        """
+
+        async def run(tool_call: dict[str, Any]) -> ToolMessage:
+            call_id = tool_call.get("id") or str(uuid.uuid4())
+            if tool_call["name"] in self.tools:
+                call_info = await self.schedule_tool_call(tool_call["name"], tool_call.get("args") or {}, timeout=timeout, call_id=call_id)
+            else:
+                call_info = ToolCallInfo(
+                    call_id=call_id,
+                    tool_name=tool_call["name"],
+                    arguments=tool_call.get("args") or {},
+                    status=ToolCallStatus.ERROR,
+                    error_message=f"工具 '{tool_call['name']}' 未注册",
+                )
+                self.metrics.increment_metric("tool_management", "failed_calls")
+                self.metrics.increment_metric("tool_management", "total_calls")
+            if call_info.status == ToolCallStatus.SUCCESS:
+                content = call_info.result if isinstance(call_info.result, str) else json.dumps(call_info.result, ensure_ascii=False, default=str)
+            else:
+                content = f"工具调用失败: {call_info.error_message or call_info.status.value}"
+            return ToolMessage(content=content, tool_call_id=call_info.call_id, name=call_info.tool_name)
+
+        return list(await asyncio.gather(*(run(tool_call) for tool_call in tool_calls)))
+
+    def _process_next_in_queue(self) -> None:
+        """从队列头部开始执行等待的调用，直到达到并发上限（跳过已被调用方取消的调用）"""
+        while self.call_queue and len(self.active_calls) < self.max_concurrent_calls:
+            call_info, timeout, future = self.call_queue.popleft()
+            if future.done():
+                call_info.status = ToolCallStatus.CANCELLED
+                self.metrics.increment_metric("tool_management", "cancelled_calls")
+                continue
+            self._start_tool_call(call_info, timeout, future)
+        self._update_call_counts()
+
+    def _update_call_counts(self) -> None:
+        """更新执行中和排队中的调用数指标"""
+        self.metrics.update_metric("tool_management", "active_calls_count", len(self.active_calls))
+        self.metrics.update_metric("tool_management", "queued_calls_count", len(self.call_queue))
@@ -10,6 +10,12 @@ class EmptyStreamError(LLMBaseException):
     pass
 
 
+class StreamInterruptedError(LLMBaseException):
+    """流式输出中途失败异常（已向调用方输出部分内容，不可重试）"""
+
+    retryable = False
+
+
 class StructuredOutputError(LLMBaseException):
     """结构化输出异常"""
 
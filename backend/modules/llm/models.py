@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from common.model import *
+from sqlalchemy import Index
+from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import mapped_column
+
+
+class LLMHistoryRecord(ModelBase):
+    """
+    LLM对话历史记录表（只追加写入）
+    """
+
+    __tablename__ = "llm_history"
+    __table_args__ = (Index("ix_llm_history_conversation_id_id", "conversation_id", "id"),)
+
+    conversation_id: Mapped[str] = mapped_column(String(64), comment="会话ID")
+    entry_id: Mapped[str] = mapped_column(String(64), comment="历史条目ID")
+    parent_id: Mapped[str | None] = mapped_column(String(64), nullable=True, comment="父条目ID")
+    message_type: Mapped[str] = mapped_column(String(16), comment="消息类型：human、ai、system、tool")
+    message: Mapped[dict] = mapped_column(JSON, comment="消息内容")
+    message_metadata: Mapped[dict] = mapped_column(JSON, default={}, comment="消息元数据")
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=get_timestamp)
@@ -25,9 +25,31 @@ class RequestConfig(BaseModel):
     max_concurrent_requests: int = 5  # 最大并发请求数
     max_queue_size: int = 100  # 最大队列大小
     max_requests_per_minute: int = 60  # 每分钟最大请求数
+    max_tokens_per_minute: int | None = None  # 每分钟最大token数（按提交时估算的提示词token数计），None 表示不限制
+    enable_shortest_job_first: bool = False  # 同一优先级内是否按估算token数从小到大调度（默认按提交顺序）
+    queue_aging_interval: float | None = 30.0  # 排队请求每等待多少秒提升一级优先级，None 表示严格按优先级调度
+    sync_thread_pool_size: int = 4  # 同步函数线程池大小（模型调用为原生异步，仅真正的同步函数使用）
+    tool_thread_pool_size: int = 8  # 同步工具线程池大小（共享核心中所有会话共用）
+    tool_memo_size: int = 256  # 工具结果记忆的最大条目数（共享核心中所有会话共用）
     # 超时配置
     default_timeout: float = 30.0  # 默认超时时间
+    stream_idle_timeout: float = 30.0  # 流式输出相邻两个分片之间的最大间隔
+    stream_total_timeout: float = 300.0  # 流式输出的总超时时间（从开始执行到最后一个分片）
     # 请求重试配置
     enable_auto_retry: bool = True  # 是否启用自动重试
     max_retry_attempts: int = 3  # 最大重试次数
     retry_delay: float = 1.0  # 重试延迟
+    # 工具调用配置
+    max_tool_iterations: int = 5  # 单次对话中模型调用工具的最大轮数
+    tool_call_timeout: float = 30.0  # 单个工具调用的超时时间
+    # 响应缓存配置
+    enable_response_cache: bool = True  # 是否启用精确匹配响应缓存（temperature > 0 时需调用方传入 use_cache=True）
+    response_cache_size: int = 256  # 内存缓存最大条目数
+    response_cache_ttl: float | None = None  # 缓存有效期（秒），None 表示不过期
+    response_cache_path: str | None = None  # 持久化缓存的 SQLite 文件路径，None 表示仅使用内存缓存
+    # 语义缓存配置（仅用于结构化输出请求）
+    enable_semantic_cache: bool = False  # 是否启用语义缓存（相似提示词返回缓存的结构化结果）
+    semantic_cache_threshold: float = 0.95  # 命中所需的最小余弦相似度（槽位不同的提示词不会命中）
+    semantic_cache_size: int = 512  # 最大条目数
+    semantic_cache_ttl: float | None = None  # 缓存有效期（秒），None 表示不过期
+    semantic_cache_eviction: str = "lru"  # 淘汰策略：lru 或 fifo
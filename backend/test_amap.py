@@ -1,4 +1,9 @@
+import argparse
 import asyncio
+import os
+import sys
+import tempfile
+import time
 
 from config import CONFIG
 from modules.amap import *
@@ -244,14 +249,182 @@ async def test_error_handling(sdk: AMapSDK):
         return False
 
 
-async def main():
+async def run_load_test(sdk: AMapSDK, total: int, concurrency: int):
+    """并发压测（建议配合回放或桩服务器离线运行）"""
+    print(f"\n🔍 并发压测: {total}个请求, 并发{concurrency}...")
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def one_call():
+        nonlocal failures
+        async with semaphore:
+            try:
+                await sdk.geocoding.geocode("北京大学")
+            except Exception:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_call() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    print(f"    ✅ 耗时: {elapsed:.2f}秒, 吞吐: {total / elapsed:.1f} req/s, 失败: {failures}")
+
+
+# region 离线功能测试
+
+
+class FakeTransport(AmapTransport):
+    """按端点返回固定响应的传输层，可切换为模拟网络故障"""
+
+    def __init__(self):
+        self.calls = 0
+        self.failing = False
+
+    async def send(self, session, method, url, params=None, data=None, headers=None):
+        self.calls += 1
+        if self.failing:
+            raise ConnectionError("模拟网络故障")
+        return {"status": "1", "info": "OK", "count": "1", "geocodes": [{"formatted_address": params.get("address"), "location": "116.31,39.99"}]}
+
+
+async def check_replay_transport():
+    """回放传输层：录制的响应可回放，缺失录制文件时抛出 FixtureMissingError 且不计入熔断器"""
+    logger = get_logger(filename="test-amap")
+    with tempfile.TemporaryDirectory() as fixture_dir:
+        recorder = RecordingTransport(fixture_dir, inner=FakeTransport())
+        async with AmapClient(logger, transport=recorder) as client:
+            recorded = await client.get("/v3/geocode/geo", params={"address": "北京大学"})
+        assert len(os.listdir(fixture_dir)) == 1
+        async with AmapClient(logger, transport=ReplayTransport(fixture_dir)) as client:
+            assert await client.get("/v3/geocode/geo", params={"address": "北京大学"}) == recorded
+            for _ in range(client.circuit_breaker.failure_threshold + 1):
+                try:
+                    await client.get("/v3/geocode/geo", params={"address": "清华大学"})
+                    raise AssertionError("缺失录制文件时应抛出 FixtureMissingError")
+                except FixtureMissingError as e:
+                    assert e.endpoint == "/v3/geocode/geo"
+            breaker = client.circuit_breaker.snapshot()
+            assert breaker["state"] == "closed" and breaker["consecutive_failures"] == 0, breaker
+
+
+async def check_circuit_breaker():
+    """熔断器：按主机跨客户端实例共享，熔断期间返回缓存响应的副本，状态计入指标快照"""
+    logger = get_logger(filename="test-amap")
+    registry = CircuitBreakerRegistry()
+    transport = FakeTransport()
+    params = {"address": "北京大学"}
+    async with AmapClient(logger, transport=transport, circuit_breakers=registry) as client:
+        cached = await client.get("/v3/geocode/geo", params=params)
+        transport.failing = True
+        for _ in range(client.circuit_breaker.failure_threshold):
+            try:
+                await client.get("/v3/geocode/geo", params={"address": "清华大学"})
+            except AmapAPIException:
+                pass
+    # 新的客户端实例共享同一主机的熔断状态，不再访问后端
+    calls = transport.calls
+    async with AmapClient(logger, transport=transport, circuit_breakers=registry) as client:
+        assert client.circuit_breaker.is_open()
+        stale = await client.get("/v3/geocode/geo", params=params)
+        assert stale == cached, stale
+        stale["geocodes"].clear()
+        assert (await client.get("/v3/geocode/geo", params=params))["geocodes"], "缓存响应被调用方修改"
+        try:
+            await client.get("/v3/geocode/geo", params={"address": "清华大学"})
+            raise AssertionError("熔断且无缓存时应抛出 AmapCircuitOpenException")
+        except AmapCircuitOpenException:
+            pass
+        assert transport.calls == calls
+        host = client._host
+    snapshot = registry.snapshot()[host]
+    assert snapshot["state"] == "open" and snapshot["opened_count"] == 1 and snapshot["stale_served"] == 2, snapshot
+
+
+async def check_hedging():
+    """对冲请求：耗时样本和对冲预算跨客户端实例共享，慢请求触发对冲并计入统计"""
+
+    class SlowOnceTransport(FakeTransport):
+        """首次请求变慢，模拟长尾延迟"""
+
+        async def send(self, session, method, url, params=None, data=None, headers=None):
+            delay = 0.01 if self.calls else 0.5
+            self.calls += 1
+            await asyncio.sleep(delay)
+            return {"status": "1", "info": "OK", "count": "0", "geocodes": []}
+
+    logger = get_logger(filename="test-amap")
+    tracker, stats = LatencyTracker(), HedgeStats()
+    original = CONFIG.amap_hedge_enabled
+    CONFIG.amap_hedge_enabled = True
+    try:
+        # 每个请求使用新的短生命周期客户端
+        for _ in range(CONFIG.amap_hedge_min_samples):
+            async with AmapClient(logger, transport=FakeTransport(), latency_tracker=tracker, hedge_stats=stats) as client:
+                await client.get("/v3/geocode/geo", params={"address": "北京大学"})
+        assert tracker.count("/v3/geocode/geo") == CONFIG.amap_hedge_min_samples
+        async with AmapClient(logger, transport=SlowOnceTransport(), latency_tracker=tracker, hedge_stats=stats) as client:
+            start = time.perf_counter()
+            await client.get("/v3/geocode/geo", params={"address": "北京大学"})
+            assert time.perf_counter() - start < 0.45, "对冲请求未生效"
+            assert client.get_metrics()["hedging"] == stats.snapshot()
+        snapshot = stats.snapshot()
+        assert snapshot["eligible_requests"] == CONFIG.amap_hedge_min_samples + 1, snapshot
+        assert snapshot["hedged_requests"] == 1 and snapshot["hedge_wins"] == 1, snapshot
+        # 默认使用进程级共享的统计
+        client = AmapClient(logger, transport=FakeTransport())
+        assert client.latency_tracker is AMAP_LATENCY_TRACKER and client.hedge_stats is AMAP_HEDGE_STATS
+    finally:
+        CONFIG.amap_hedge_enabled = original
+
+
+CHECKS = [
+    check_replay_transport,
+    check_circuit_breaker,
+    check_hedging,
+]
+
+
+async def run_checks() -> bool:
+    """运行所有离线功能测试"""
+    print("🔍 高德地图模块离线功能测试开始...")
+    failed = []
+    for check in CHECKS:
+        try:
+            await check()
+            print(f"  ✅ {check.__name__}")
+        except Exception as e:
+            failed.append(check.__name__)
+            print(f"  ❌ {check.__name__}: {type(e).__name__} {e}")
+    print(f"📊 离线功能测试: {len(CHECKS) - len(failed)}/{len(CHECKS)} 通过")
+    return not failed
+
+
+# endregion
+
+
+async def main(args):
     """主测试函数"""
     print(f"🔑 API密钥: {CONFIG.amap_key[:8]}...")
+    print(f"🔌 传输模式: {args.mode}")
+    # 桩服务器模式：基于录制文件在本地启动高德API服务
+    stub_server = None
+    if args.mode == "stub":
+        stub_server = AmapStubServer(CONFIG.amap_fixture_dir, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+        print(f"🧪 桩服务器启动: {await stub_server.start()}")
     # 创建SDK实例
     print("📦 创建AMapSDK实例...")
     try:
-        async with AMapSDK(get_logger(filename="test-amap")) as sdk:
+        transport = None
+        if args.mode == "record":
+            transport = RecordingTransport(CONFIG.amap_fixture_dir)
+        elif args.mode == "replay":
+            transport = ReplayTransport(CONFIG.amap_fixture_dir)
+        async with AMapSDK(get_logger(filename="test-amap"), transport=transport) as sdk:
+            if stub_server:
+                sdk.client.base_url = stub_server.base_url
             print("✅ SDK创建成功")
+            if args.load:
+                await run_load_test(sdk, args.load, args.concurrency)
+                return True
             # 运行测试
             tests = [
                 ("地理编码服务", test_geocoding_service),
@@ -294,11 +467,25 @@ async def main():
 
         traceback.print_exc()
         return False
+    finally:
+        if stub_server:
+            await stub_server.stop()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="高德地图API集成测试")
+    parser.add_argument("--mode", choices=["http", "record", "replay", "stub"], default="http", help="传输模式")
+    parser.add_argument("--load", type=int, default=0, help="压测请求数（0表示运行功能测试）")
+    parser.add_argument("--concurrency", type=int, default=20, help="压测并发数")
+    parser.add_argument("--latency", type=float, default=0.0, help="桩服务器固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="桩服务器随机延迟上限（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="桩服务器错误注入概率")
+    parser.add_argument("--check", action="store_true", help="运行离线功能测试（不访问网络）")
+    args = parser.parse_args()
+    if args.check:
+        sys.exit(0 if asyncio.run(run_checks()) else 1)
     print("🚀 启动高德地图API集成测试...")
-    success = asyncio.run(main())
+    success = asyncio.run(main(args))
 
     print("\n" + "=" * 80)
     if success:
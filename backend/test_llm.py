@@ -11,13 +11,46 @@ LLMClient 功能测试脚本
 6. 工具调用
 7. 错误处理
 8. 系统状态监控
+
+使用 `python test_llm.py --benchmark` 运行不依赖真实模型的性能基准测试，
+使用 `python test_llm.py --check` 运行不依赖真实模型的离线功能断言测试。
 """
 import asyncio
+import copy
 import json
+import os
+import sys
+import tempfile
 import time
 
+from config import CONFIG
+from langchain.schema import AIMessage
+from langchain.schema import HumanMessage
+from langchain.schema import SystemMessage
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.language_models import FakeMessagesListChatModel
+from langchain_core.tools import tool
 from modules.llm import LLMClient
+from modules.llm import LLMCore
 from modules.llm import RequestConfig
+from modules.llm.core import HistoryManager
+from modules.llm.core import make_cache_key
+from modules.llm.core import MemoryHistoryStore
+from modules.llm.core import MetricsCollector
+from modules.llm.core import RequestManager
+from modules.llm.core import ResponseCache
+from modules.llm.core import SemanticCache
+from modules.llm.core import SlotExtractor
+from modules.llm.core import SQLiteHistoryStore
+from modules.llm.core import ToolMemo
+from modules.llm.core.chat_compressor import CompressionResult
+from modules.llm.core.request_manager import AsyncPriorityQueue
+from modules.llm.core.token_counter import get_token_counter
+from modules.llm.core.token_counter import HeuristicTokenCounter
+from modules.llm.enums import CompressionStatus
+from modules.llm.enums import HistoryMode
+from modules.llm.enums import RequestPriority
+from modules.llm.enums import RequestStatus
 from modules.planning import PlanningSingleResultSchema  # 用于结构化输出的测试模型
 from utils import get_logger
 
@@ -333,8 +366,616 @@ class TestLLMClient:
         self.print_test_summary()
 
 
+# region 性能基准测试（使用模拟模型，不访问网络）
+
+
+async def benchmark_concurrent_chat(total: int = 20, latency: float = 0.2):
+    """基准测试：模拟慢速模型下不同并发上限的聊天吞吐量"""
+    print(f"\n⏱️ 并发聊天吞吐量: {total}个请求, 模型延迟{latency}秒")
+    for max_concurrent in (1, 5):
+        config = RequestConfig(max_concurrent_requests=max_concurrent, enable_auto_retry=False)
+        client = LLMClient(logger=logger, request_config=config)
+        client.model = FakeListChatModel(responses=["好的"], sleep=latency)
+        start = time.perf_counter()
+        await asyncio.gather(*(client.chat(f"问题{i}", save_history=False) for i in range(total)))
+        elapsed = time.perf_counter() - start
+        peak = client.metrics.request_manager.get("peak_concurrent_requests", 0)
+        print(f"  并发上限 {max_concurrent}: 耗时 {elapsed:.2f}秒, 吞吐 {total / elapsed:.1f} 次/秒, 峰值并发 {peak}")
+
+
+async def benchmark_stream_first_token(latency: float = 0.02):
+    """基准测试：流式输出的首分片耗时与总耗时（首分片应在完整响应生成前到达）"""
+    response = "这是一段用于测试流式输出首分片延迟的模拟回复" * 3
+    print(f"\n⏱️ 流式首分片耗时: 回复{len(response)}个分片, 每分片延迟{latency}秒")
+    client = LLMClient(logger=logger, request_config=RequestConfig(enable_auto_retry=False))
+    client.model = FakeListChatModel(responses=[response], sleep=latency)
+    start = time.perf_counter()
+    first_chunk_at = None
+    async for _ in await client.chat("讲个故事", stream=True):
+        if first_chunk_at is None:
+            first_chunk_at = time.perf_counter() - start
+    elapsed = time.perf_counter() - start
+    stats = client.metrics.stream_processing
+    print(f"  首分片 {first_chunk_at:.3f}秒, 总耗时 {elapsed:.2f}秒, 吞吐 {stats['average_tokens_per_second']:.1f} token/秒")
+    print(f"  历史记录已保存助手回复: {client.get_history()[-1].content == response}")
+
+
+async def benchmark_history_read(size: int = 1000, rounds: int = 200):
+    """基准测试：1000条消息时读取历史记录的耗时（与逐条深拷贝对比）"""
+    print(f"\n⏱️ 历史记录读取: {size}条消息, 读取{rounds}次")
+    manager = HistoryManager(logger, MetricsCollector(logger), max_history_size=size * 2)
+    for i in range(size):
+        message = HumanMessage(content=f"问题{i}：推荐一些景点") if i % 2 == 0 else AIMessage(content=f"回答{i}：" + "景点介绍" * 20)
+        manager.add_message(message)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        messages = manager.get_history(mode=HistoryMode.CURATED)
+    shared = (time.perf_counter() - start) / rounds
+    start = time.perf_counter()
+    for _ in range(rounds):
+        copy.deepcopy(messages)
+    copied = (time.perf_counter() - start) / rounds
+    print(f"  共享读取 {shared * 1000:.3f}毫秒/次, 深拷贝 {copied * 1000:.3f}毫秒/次, 提升 {copied / shared:.0f}倍")
+
+
+async def benchmark_history_turn(sizes: tuple[int, ...] = (100, 1000, 5000), rounds: int = 500):
+    """基准测试：不同历史长度下每轮对话的历史维护耗时（追加一问一答并读取最近20条精选历史）"""
+    print(f"\n⏱️ 每轮历史维护耗时: 历史长度 {sizes}")
+    for size in sizes:
+        manager = HistoryManager(logger, MetricsCollector(logger), max_history_size=size)
+        for i in range(size):
+            manager.add_message(HumanMessage(content=f"问题{i}") if i % 2 == 0 else AIMessage(content=f"回答{i}"))
+        start = time.perf_counter()
+        for i in range(rounds):
+            manager.add_message(HumanMessage(content=f"新问题{i}"))
+            manager.add_message(AIMessage(content=f"新回答{i}"))
+            manager.get_history(mode=HistoryMode.CURATED, limit=20)
+        print(f"  {size}条历史: {(time.perf_counter() - start) / rounds * 1000:.3f}毫秒/轮")
+
+
+async def benchmark_compression_check(sizes: tuple[int, ...] = (100, 1000), rounds: int = 200):
+    """基准测试：压缩阈值检查耗时（每次重新计数 vs 使用历史记录缓存的token总数）"""
+    print(f"\n⏱️ 压缩阈值检查耗时: 历史长度 {sizes}")
+    for size in sizes:
+        manager = HistoryManager(logger, MetricsCollector(logger), max_history_size=size)
+        for i in range(size):
+            if i % 2 == 0:
+                message = HumanMessage(content=f"帮我规划北京第{i}天的行程")
+            else:
+                message = AIMessage(content=f"第{i}天：故宫、景山公园")
+            manager.add_message(message)
+        messages = manager.get_history(mode=HistoryMode.CURATED)
+        counter = manager.token_counter
+        start = time.perf_counter()
+        for _ in range(rounds):
+            counter.count_messages(messages)
+        recount = (time.perf_counter() - start) / rounds * 1000
+        start = time.perf_counter()
+        for _ in range(rounds):
+            manager.count_tokens(HistoryMode.CURATED)
+        cached = (time.perf_counter() - start) / rounds * 1000
+        print(f"  {size}条历史（{counter.name}）: 重新计数 {recount:.3f}毫秒, 缓存总数 {cached:.4f}毫秒")
+
+
+async def benchmark_parallel_tools(calls: int = 6, latency: float = 0.2):
+    """基准测试：模型一轮返回多个工具调用时的执行耗时（并发执行时接近单个工具的延迟）"""
+
+    @tool
+    async def search_attractions(city: str) -> str:
+        """搜索城市景点信息"""
+        await asyncio.sleep(latency)
+        return f"{city}的热门景点"
+
+    print(f"\n⏱️ 工具调用循环: 一轮{calls}个工具调用, 工具延迟{latency}秒")
+    for max_concurrent in (1, calls):
+        client = LLMClient(logger=logger, max_concurrent_calls=max_concurrent)
+        client.tool_manager.register_tool(search_attractions)
+        tool_calls = [{"name": "search_attractions", "args": {"city": f"城市{i}"}, "id": f"call_{i}"} for i in range(calls)]
+        responses = [AIMessage(content="", tool_calls=tool_calls), AIMessage(content="规划完成")]
+        client.model = FakeMessagesListChatModel(responses=responses)
+        start = time.perf_counter()
+        await client.chat("帮我规划行程", save_history=False)
+        print(f"  并发上限 {max_concurrent}: 耗时 {time.perf_counter() - start:.2f}秒")
+
+
+async def benchmark_tool_binding(tool_count: int = 10, switches: int = 200):
+    """基准测试：在两套工具集之间切换后调用模型前的绑定耗时（每次重新绑定 vs 按工具集缓存）"""
+
+    def make_tool(i: int):
+        @tool(f"search_poi_{i}")
+        def search_poi(city: str, keyword: str, page: int = 1) -> str:
+            """按城市和关键词搜索兴趣点"""
+            return f"{city}{keyword}"
+
+        return search_poi
+
+    tools = [make_tool(i) for i in range(tool_count)]
+    client = LLMClient(logger=logger)
+    print(f"\n⏱️ 工具集切换: {tool_count}个工具, 切换{switches}次")
+    start = time.perf_counter()
+    for i in range(switches):
+        client._base_model.bind_tools(tools if i % 2 == 0 else tools[: tool_count // 2])
+    print(f"  每次重新绑定: {(time.perf_counter() - start) / switches * 1000:.3f}毫秒/次")
+    start = time.perf_counter()
+    for i in range(switches):
+        client.clear_tools()
+        client.add_tools(tools if i % 2 == 0 else tools[: tool_count // 2])
+        client.model
+    print(f"  缓存绑定: {(time.perf_counter() - start) / switches * 1000:.3f}毫秒/次")
+
+
+async def benchmark_session_creation(sessions: int = 200):
+    """基准测试：创建会话并完成一轮对话的耗时和后台任务数（每个会话独立核心 vs 共享核心）"""
+    config = RequestConfig(max_requests_per_minute=sessions * 2, enable_auto_retry=False)
+    print(f"\n⏱️ 会话创建: {sessions}个会话")
+    for label, core in (("独立核心", None), ("共享核心", LLMCore(logger, config))):
+        tasks_before = len(asyncio.all_tasks())
+        start = time.perf_counter()
+        for _ in range(sessions):
+            client = LLMClient("你是旅行助手", logger=logger, request_config=config, core=core)
+            client.model = FakeListChatModel(responses=["好的"])
+            await client.chat("你好")
+        elapsed = time.perf_counter() - start
+        print(f"  {label}: {elapsed / sessions * 1000:.3f}毫秒/会话, 后台任务 +{len(asyncio.all_tasks()) - tasks_before}")
+
+
+async def benchmark_shortest_job_first(small: int = 20, large: int = 4):
+    """基准测试：大请求先到时小请求的平均等待时间（提交顺序 vs 短作业优先），执行耗时与估算token数成正比"""
+
+    async def model_call(tokens: int) -> int:
+        await asyncio.sleep(tokens / 100000)
+        return tokens
+
+    jobs = [20000] * large + [500] * small
+    print(f"\n⏱️ 短作业优先: {large}个大请求(20000 tokens) 先于 {small}个小请求(500 tokens) 提交")
+    for label, sjf in (("提交顺序", False), ("短作业优先", True)):
+        config = RequestConfig(max_concurrent_requests=1, max_requests_per_minute=1000, enable_shortest_job_first=sjf, enable_auto_retry=False)
+        manager = RequestManager(logger, MetricsCollector(logger), config)
+        # 先占用唯一的并发名额，让所有请求入队后再开始调度
+        await manager._semaphore.acquire()
+        start = time.perf_counter()
+        finished: dict[int, float] = {}
+
+        async def submit(index: int, tokens: int):
+            await manager.request(model_call, tokens, estimated_tokens=tokens)
+            finished[index] = time.perf_counter() - start
+
+        tasks = [asyncio.create_task(submit(i, tokens)) for i, tokens in enumerate(jobs)]
+        await asyncio.sleep(0.01)
+        manager._semaphore.release()
+        await asyncio.gather(*tasks)
+        small_wait = sum(finished[i] for i in range(large, len(jobs))) / small
+        print(f"  {label}: 小请求平均完成时间 {small_wait * 1000:.0f}毫秒, 全部完成 {max(finished.values()):.2f}秒")
+
+
+async def benchmark_queue_aging(steps: int = 300, aging_interval: float = 0.02, tick: float = 0.002):
+    """基准测试：持续的HIGH负载下LOW请求的出队时间（严格优先级 vs 优先级老化），以及按ID查找排队请求的耗时"""
+
+    class Item:
+        def __init__(self, request_id: str):
+            self.request_id = request_id
+
+    print(f"\n⏱️ 优先级老化: 每{tick * 1000:.0f}毫秒到达并处理1个HIGH请求, 共{steps}轮")
+    for label, interval in (("严格优先级", None), (f"老化周期{aging_interval * 1000:.0f}毫秒", aging_interval)):
+        queue = AsyncPriorityQueue(aging_interval=interval)
+        await queue.put(Item("low"), RequestPriority.LOW)
+        await queue.put(Item("high-0"), RequestPriority.HIGH)
+        served_at = None
+        for step in range(1, steps + 1):
+            await asyncio.sleep(tick)
+            await queue.put(Item(f"high-{step}"), RequestPriority.HIGH)
+            if (await queue.get()).request_id == "low":
+                served_at = step
+                break
+        print(f"  {label}: " + (f"LOW请求在第{served_at}轮出队" if served_at else f"{steps}轮内LOW请求未出队"))
+    queue = AsyncPriorityQueue()
+    for i in range(5000):
+        await queue.put(Item(str(i)), RequestPriority.NORMAL)
+    start = time.perf_counter()
+    for i in range(1000):
+        next(item for item in queue.items() if item.request_id == str(i * 5))
+    scan = (time.perf_counter() - start) / 1000
+    start = time.perf_counter()
+    for i in range(1000):
+        queue.get_items_by_id(str(i * 5))
+    print(f"  5000个排队请求按ID查找: 线性扫描 {scan * 1000:.3f}毫秒/次, 索引 {(time.perf_counter() - start) / 1000 * 1000:.4f}毫秒/次")
+
+
+BENCHMARKS = [
+    benchmark_concurrent_chat,
+    benchmark_stream_first_token,
+    benchmark_history_read,
+    benchmark_history_turn,
+    benchmark_compression_check,
+    benchmark_parallel_tools,
+    benchmark_tool_binding,
+    benchmark_session_creation,
+    benchmark_shortest_job_first,
+    benchmark_queue_aging,
+]
+
+
+async def run_benchmarks():
+    """运行所有基准测试"""
+    print("⏱️ LLM模块性能基准测试开始...")
+    for benchmark in BENCHMARKS:
+        await benchmark()
+
+
+# endregion
+
+
+# region 离线功能测试（使用模拟模型，不访问网络，断言失败即测试失败）
+
+
+async def check_request_cancellation():
+    """排队中与重试退避中的请求取消后只归档一次，指标只计一次"""
+    metrics = MetricsCollector(logger)
+    config = RequestConfig(max_concurrent_requests=1, enable_auto_retry=True, max_retry_attempts=1, retry_delay=0.2)
+    manager = RequestManager(logger, metrics, config)
+
+    async def flaky():
+        raise ValueError("模拟失败")
+
+    async def echo(value):
+        return value
+
+    # 重试退避中取消
+    request_id = await manager._request(flaky)
+    await manager._ensure_worker_running()
+    await asyncio.sleep(0.05)
+    assert (await manager.get_request_status(request_id)).retry_count == 1
+    assert manager.cancel_request(request_id)
+    await asyncio.sleep(0.3)
+    assert [info.request_id for info in manager.completed_requests].count(request_id) == 1
+    assert metrics.request_manager["total_requests"] == 1
+    assert metrics.request_manager["cancelled_requests"] == 1
+    assert metrics.request_manager["priority_normal"] == 1
+    assert manager.request_queue.empty()
+    try:
+        await manager.wait_for_request(request_id, 1.0)
+        raise AssertionError("取消的请求应抛出异常")
+    except RuntimeError as e:
+        assert "取消" in str(e)
+    # 排队中取消：占用唯一的并发名额，请求留在队列中
+    await manager._semaphore.acquire()
+    queued = [await manager._request(echo, i) for i in range(3)]
+    assert manager.request_queue.get_items_by_id(queued[1]) is not None
+    assert manager.cancel_request(queued[1]) and not manager.cancel_request(queued[1])
+    assert manager.request_queue.size() == 2 and manager.request_queue.get_items_by_id(queued[1]) is None
+    # 调用方取消 request() 时排队中的请求不再执行
+    caller = asyncio.create_task(manager.request(echo, "caller"))
+    await asyncio.sleep(0.01)
+    caller.cancel()
+    await asyncio.sleep(0.01)
+    assert manager.request_queue.size() == 2
+    manager._semaphore.release()
+    assert await manager.wait_for_request(queued[0], 1.0) == 0
+    assert await manager.wait_for_request(queued[2], 1.0) == 2
+    assert (await manager.get_request_status(queued[1])).status == RequestStatus.CANCELLED
+    assert metrics.request_manager["cancelled_requests"] == 3
+
+
+async def check_token_budget():
+    """Token预算不足时请求在队列中等待；等待预算期间取消的请求不消耗预算、不占用worker"""
+    metrics = MetricsCollector(logger)
+    config = RequestConfig(max_concurrent_requests=2, max_tokens_per_minute=1000, enable_auto_retry=False)
+    manager = RequestManager(logger, metrics, config)
+    manager.token_budget.time_window = 1.0
+
+    async def echo(value):
+        return value
+
+    first_at = time.perf_counter()
+    assert await manager.request(echo, "a", estimated_tokens=800) == "a"
+    waiting_id = await manager._request(echo, "b", estimated_tokens=800)
+    await manager._ensure_worker_running()
+    await asyncio.sleep(0.1)
+    assert (await manager.get_request_status(waiting_id)).status == RequestStatus.QUEUED
+    assert manager.cancel_request(waiting_id)
+    start = time.perf_counter()
+    assert await manager.request(echo, "c", estimated_tokens=100) == "c"
+    assert time.perf_counter() - start < 0.8, "取消后worker应及时处理后续请求"
+    assert manager.token_budget.used() == 900
+    assert manager.get_queue_info()["tokens_used_last_minute"] == 900
+    # 预算耗尽后请求等待第一个请求的消耗滑出窗口再执行
+    assert await manager.request(echo, "d", estimated_tokens=800) == "d"
+    assert time.perf_counter() - first_at >= 1.0
+    assert metrics.request_manager["token_budget_waits"] == 1
+    # 窗口内没有消耗时，超出预算的单个请求也会执行
+    await asyncio.sleep(1.0)
+    assert await manager.request(echo, "e", estimated_tokens=5000) == "e"
+
+
+async def check_semantic_cache():
+    """语义缓存：同义改写命中，目的地、预算、天数或偏好不同则未命中"""
+    slots, _ = SlotExtractor().extract("五月三日出发，两个人去成都旅游5天，预算两万三")
+    assert slots == {"date": "5-3", "destination": "成都", "days": "5", "travelers": "2", "budget": "23000"}, slots
+    metrics = MetricsCollector(logger)
+    cache = SemanticCache(logger, metrics)
+    scope = "0" * 64
+    prompt = "请帮我规划一个北京3日游行程，预算五千元，喜欢历史文化景点和地道美食，不想太累"
+    cache.add(prompt, scope, {"target": "北京"})
+    paraphrases = [
+        "帮我规划一个北京3日游的行程，预算五千元，喜欢历史文化景点和地道美食，不想太累",
+        "请帮我规划一个北京三日游行程，预算5000元，喜欢历史文化景点和地道美食，不想太累。",
+        "麻烦帮我规划北京3日游行程，预算大概五千元，喜欢历史文化景点和地道美食，不想太累",
+    ]
+    for paraphrase in paraphrases:
+        assert cache.lookup(paraphrase, scope) == {"target": "北京"}, paraphrase
+    different = [
+        "请帮我规划一个上海3日游行程，预算五千元，喜欢历史文化景点和地道美食，不想太累",
+        "请帮我规划一个北京3日游行程，预算两万元，喜欢历史文化景点和地道美食，不想太累",
+        "请帮我规划一个北京5日游行程，预算五千元，喜欢历史文化景点和地道美食，不想太累",
+        "请帮我规划一个北京3日游行程，预算五千元，喜欢自然风光和户外徒步，不想太累",
+        "请帮我规划一个北京3日游行程，预算五千元，喜欢历史文化景点和地道美食，节奏紧凑一点",
+    ]
+    for prompt in different:
+        assert cache.lookup(prompt, scope) is None, prompt
+    # 其他作用域（如不同的上下文或输出格式）不命中
+    assert cache.lookup(paraphrases[0], "1" * 64) is None
+    assert metrics.semantic_cache["hits"] == len(paraphrases)
+    # 命中返回副本，修改不影响缓存
+    cache.lookup(paraphrases[0], scope)["target"] = "已修改"
+    assert cache.lookup(paraphrases[0], scope) == {"target": "北京"}
+
+
+async def check_token_counter():
+    """分词器不在本地缓存时直接回退为估算计数，不访问网络"""
+    import tiktoken.load
+
+    downloads = []
+    original_read_file, original_cache_dir = tiktoken.load.read_file, os.environ.get("TIKTOKEN_CACHE_DIR")
+    tiktoken.load.read_file = lambda blobpath: downloads.append(blobpath) or b""
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            os.environ["TIKTOKEN_CACHE_DIR"] = cache_dir
+            get_token_counter.cache_clear()
+            for encoding in ("cl100k_base", "gpt-4o", "unknown-model"):
+                assert isinstance(get_token_counter(encoding), HeuristicTokenCounter), encoding
+    finally:
+        tiktoken.load.read_file = original_read_file
+        if original_cache_dir is None:
+            os.environ.pop("TIKTOKEN_CACHE_DIR", None)
+        else:
+            os.environ["TIKTOKEN_CACHE_DIR"] = original_cache_dir
+        get_token_counter.cache_clear()
+    assert not downloads, downloads
+    counter = HeuristicTokenCounter()
+    assert counter.count("北京三日游") == 5 and counter.count("abcdefgh") == 2
+    assert counter.count_message(AIMessage(content="你好")) == 2 + 4
+
+
+async def check_tool_memo():
+    """工具结果记忆：同一核心的不同会话共享结果，命中返回副本，有效期和LRU淘汰生效"""
+    calls = []
+
+    @tool
+    def geocode(address: str) -> dict:
+        """地理编码"""
+        calls.append(address)
+        return {"address": address, "location": [116.39, 39.90]}
+
+    core = LLMCore(logger, RequestConfig(enable_auto_retry=False))
+    sessions = [LLMClient(logger=logger, core=core) for _ in range(2)]
+    for session in sessions:
+        session.add_tools([geocode], memoize=True)
+    first = (await sessions[0].tool_manager.schedule_tool_call("geocode", {"address": "故宫"})).result
+    first["location"].append("已修改")
+    second = (await sessions[1].tool_manager.schedule_tool_call("geocode", {"address": "故宫"})).result
+    assert calls == ["故宫"], calls
+    assert second == {"address": "故宫", "location": [116.39, 39.90]}, second
+    assert core.metrics.tool_management["memo_hits"] == 1
+    # 一个会话移除工具不影响其他会话的记忆结果
+    sessions[0].clear_tools()
+    await sessions[1].tool_manager.schedule_tool_call("geocode", {"address": "故宫"})
+    assert calls == ["故宫"], calls
+
+    memo = ToolMemo(max_size=2)
+    memo.set("geocode", {"address": "故宫"}, "a")
+    memo.set("geocode", {"address": "天坛"}, "b")
+    assert memo.get("geocode", {"address": "故宫"}) == (True, "a")
+    memo.set("geocode", {"address": "颐和园"}, "c")
+    assert memo.get("geocode", {"address": "天坛"}) == (False, None)
+    assert memo.get("geocode", {"address": "故宫"}) == (True, "a") and len(memo) == 2
+    await asyncio.sleep(0.05)
+    assert memo.get("geocode", {"address": "故宫"}, ttl=0.01) == (False, None)
+    assert memo.get("geocode", {"address": "颐和园"}, ttl=10) == (True, "c") and len(memo) == 1
+
+
+async def check_compression_cooldown():
+    """后台压缩连续失败后暂停一段时间，冷却结束后重新尝试，而不是在会话内永久停用"""
+    attempts = 0
+
+    async def failing_compress(*args, **kwargs):
+        nonlocal attempts
+        attempts += 1
+        return CompressionResult(status=CompressionStatus.COMPRESSION_FAILED_MODEL_ERROR, error_message="模拟摘要失败")
+
+    client = LLMClient(logger=logger, core=LLMCore(logger, RequestConfig(enable_auto_retry=False)))
+    client.chat_compressor.compress_messages = failing_compress
+    client.history_manager.add_message(HumanMessage(content="你好"))
+    original_cooldown = CONFIG.compression_failure_cooldown
+    CONFIG.compression_failure_cooldown = 0.1
+    try:
+        for _ in range(CONFIG.compression_max_attempts + 2):
+            client._start_background_compression([HumanMessage(content="你好")], 10)
+            await client.wait_for_compression()
+        assert attempts == CONFIG.compression_max_attempts, attempts
+        await asyncio.sleep(0.15)
+        client._start_background_compression([HumanMessage(content="你好")], 10)
+        await client.wait_for_compression()
+        assert attempts == CONFIG.compression_max_attempts + 1, attempts
+        # 再次连续失败后冷却时间翻倍
+        for _ in range(CONFIG.compression_max_attempts - 1):
+            client._start_background_compression([HumanMessage(content="你好")], 10)
+            await client.wait_for_compression()
+        await asyncio.sleep(0.15)
+        client._start_background_compression([HumanMessage(content="你好")], 10)
+        assert client._compression_task is None and attempts == CONFIG.compression_max_attempts * 2
+    finally:
+        CONFIG.compression_failure_cooldown = original_cooldown
+
+
+async def check_history_eviction():
+    """精选历史：淘汰旧条目后的增量结果与按剩余综合历史完整重建的结果一致"""
+    import random
+
+    rng = random.Random(0)
+    messages = [
+        lambda: HumanMessage(content="问题"),
+        lambda: AIMessage(content="回答"),
+        lambda: AIMessage(content=""),  # 无效条目
+        lambda: AIMessage(content="", tool_calls=[{"name": "search", "args": {}, "id": "call_1"}]),
+    ]
+    for size in (1, 2, 3, 5, 8):
+        manager = HistoryManager(logger, MetricsCollector(logger), max_history_size=size, token_counter=HeuristicTokenCounter())
+        for step in range(300):
+            manager.add_message(rng.choices(messages, weights=(2, 3, 2, 1))[0]())
+            incremental = [entry.entry_id for entry in manager.get_history(HistoryMode.CURATED, include_metadata=True)]
+            tokens = manager.count_tokens(HistoryMode.CURATED)
+            open_sequence_valid = manager._open_sequence_valid
+            manager._rebuild_curated()
+            rebuilt = [entry.entry_id for entry in manager.get_history(HistoryMode.CURATED, include_metadata=True)]
+            assert incremental == rebuilt, (size, step, incremental, rebuilt)
+            assert tokens == manager.count_tokens(HistoryMode.CURATED), (size, step)
+            assert open_sequence_valid == manager._open_sequence_valid, (size, step)
+
+
+async def check_queue_aging():
+    """优先级老化：持续的HIGH负载下LOW请求最终出队，严格优先级时一直排在后面"""
+
+    class Item:
+        def __init__(self, request_id: str):
+            self.request_id = request_id
+
+    served = {}
+    for label, interval in (("strict", None), ("aging", 0.01)):
+        queue = AsyncPriorityQueue(aging_interval=interval)
+        await queue.put(Item("low"), RequestPriority.LOW)
+        await queue.put(Item("high-0"), RequestPriority.HIGH)
+        for step in range(1, 101):
+            await asyncio.sleep(0.002)
+            await queue.put(Item(f"high-{step}"), RequestPriority.HIGH)
+            if (await queue.get()).request_id == "low":
+                served[label] = step
+                break
+        # 出队后同步移出ID索引，仍在排队时可按ID找到
+        assert (queue.get_items_by_id("low") is None) == (label in served), label
+    assert "strict" not in served and "aging" in served, served
+
+
+async def check_response_cache():
+    """响应缓存：相同请求命中并返回副本，参数不同未命中，过期后未命中，持久化层重启后命中"""
+    messages = [SystemMessage(content="你是旅行助手"), HumanMessage(content="北京三日游")]
+    key = make_cache_key("gpt-4o-mini", 0.0, messages)
+    assert key == make_cache_key("gpt-4o-mini", 0.0, [SystemMessage(content="你是旅行助手", id="1"), HumanMessage(content="北京三日游")])
+    assert key != make_cache_key("gpt-4o-mini", 0.7, messages)
+    assert key != make_cache_key("gpt-4o-mini", 0.0, messages, response_format=PlanningSingleResultSchema)
+    with tempfile.TemporaryDirectory() as tmp:
+        metrics = MetricsCollector(logger)
+        cache = ResponseCache(logger, metrics, persist_path=os.path.join(tmp, "cache.db"))
+        assert await cache.get(key) is None
+        await cache.set(key, AIMessage(content="第一天：故宫"), tokens=100)
+        hit = await cache.get(key)
+        assert hit.content == "第一天：故宫"
+        hit.content = "已修改"
+        assert (await cache.get(key)).content == "第一天：故宫"
+        assert await cache.get(make_cache_key("gpt-4o-mini", 0.7, messages)) is None
+        assert metrics.response_cache["memory_hits"] == 2 and metrics.response_cache["misses"] == 2
+        assert metrics.response_cache["total_tokens_saved"] == 200
+        # 重启后（新的内存层）从持久化层命中
+        restarted = ResponseCache(logger, metrics, persist_path=os.path.join(tmp, "cache.db"))
+        assert (await restarted.get(key)).content == "第一天：故宫"
+        assert metrics.response_cache["persistent_hits"] == 1
+        expiring = ResponseCache(logger, metrics, ttl=0.01)
+        await expiring.set(key, {"target": "北京"})
+        await asyncio.sleep(0.05)
+        assert await expiring.get(key) is None and len(expiring) == 0
+
+    # 客户端：temperature 为 0 时相同请求不再调用模型
+    core = LLMCore(logger, RequestConfig(enable_auto_retry=False, enable_semantic_cache=False))
+    client = LLMClient("你是旅行助手", logger=logger, core=core, temperature=0)
+    client.model = FakeListChatModel(responses=["第一次", "第二次"])
+    first = await client.chat("北京三日游", save_history=False)
+    second = await client.chat("北京三日游", save_history=False)
+    third = await client.chat("上海三日游", save_history=False)
+    assert first.content == second.content == "第一次" and third.content == "第二次", (first, second, third)
+
+
+async def check_history_store():
+    """对话历史存储：写入后由新的管理器恢复，消息、条目ID、父子关系、token数和精选历史一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        for store in (MemoryHistoryStore(), SQLiteHistoryStore(os.path.join(tmp, "history.db"))):
+            manager = HistoryManager(logger, MetricsCollector(logger), store=store, conversation_id="trip", token_counter=HeuristicTokenCounter())
+            parent = manager.add_message(SystemMessage(content="你是旅行助手"))
+            parent = manager.add_message(HumanMessage(content="北京三日游"), parent_id=parent)
+            tool_call = {"name": "search", "args": {"city": "北京"}, "id": "call_1"}
+            parent = manager.add_message(AIMessage(content="", tool_calls=[tool_call]), parent_id=parent)
+            manager.add_message(AIMessage(content=""), parent_id=parent)  # 无效条目
+            manager.add_message(HumanMessage(content="预算五千"))
+            manager.add_message(AIMessage(content="第一天：故宫"))
+            store.flush()
+
+            restored = HistoryManager(logger, MetricsCollector(logger), store=store, conversation_id="trip", token_counter=HeuristicTokenCounter())
+            for mode in (HistoryMode.COMPREHENSIVE, HistoryMode.CURATED):
+                original = manager.get_history(mode, include_metadata=True)
+                loaded = restored.get_history(mode, include_metadata=True)
+                assert [(e.entry_id, e.parent_id, e.message) for e in original] == [(e.entry_id, e.parent_id, e.message) for e in loaded], mode
+                assert manager.count_tokens(mode) == restored.count_tokens(mode), mode
+            assert restored.get_parent(parent).message.content == "北京三日游"
+            # 新条目ID接续已有序号，不与恢复的条目重复
+            assert restored.add_message(HumanMessage(content="再加一天")) not in {e.entry_id for e in manager.get_history(include_metadata=True)}
+            store.flush()
+            limited = HistoryManager(logger, MetricsCollector(logger), store=store, conversation_id="trip", load_limit=2)
+            assert [m.content for m in limited.get_history()] == ["第一天：故宫", "再加一天"]
+            restored.clear_history()
+            store.flush()
+            cleared = HistoryManager(logger, MetricsCollector(logger), store=store, conversation_id="trip")
+            assert [m.type for m in cleared.get_history()] == ["system"], type(store).__name__
+
+
+CHECKS = [
+    check_request_cancellation,
+    check_token_budget,
+    check_semantic_cache,
+    check_token_counter,
+    check_tool_memo,
+    check_compression_cooldown,
+    check_history_eviction,
+    check_queue_aging,
+    check_response_cache,
+    check_history_store,
+]
+
+
+async def run_checks() -> bool:
+    """运行所有离线功能测试"""
+    print("🔍 LLM模块离线功能测试开始...")
+    failed = []
+    for check in CHECKS:
+        try:
+            await check()
+            print(f"  ✅ {check.__name__}")
+        except Exception as e:
+            failed.append(check.__name__)
+            print(f"  ❌ {check.__name__}: {type(e).__name__} {e}")
+    print(f"📊 离线功能测试: {len(CHECKS) - len(failed)}/{len(CHECKS)} 通过")
+    return not failed
+
+
+# endregion
+
+
 async def main():
     """主函数"""
+    if "--benchmark" in sys.argv:
+        await run_benchmarks()
+        return
+    if "--check" in sys.argv:
+        if not await run_checks():
+            sys.exit(1)
+        return
     tester = TestLLMClient()
     await tester.run_all_tests()
 
@@ -1,5 +1,7 @@
+from .classes import Histogram
 from .classes import RateLimiter
 from .classes import Singleton
+from .classes import TokenBudget
 from .database import DatabaseManager
 from .functions import bytes_to_str
 from .functions import exceptions
@@ -18,4 +20,6 @@ __all__ = [
     "str_to_bytes",
     "SecretManager",
     "RateLimiter",
+    "Histogram",
+    "TokenBudget",
 ]
@@ -1,5 +1,7 @@
 import threading
 import time
+from bisect import bisect_left
+from collections import deque
 
 
 class Singleton(type):
@@ -90,3 +92,148 @@ class RateLimiter:
             earliest_request = min(self.request_times)
             wait_time = self.time_window - (time.time() - earliest_request)
             return max(0.0, wait_time)
+
+
+class TokenBudget:
+    """
+    滑动时间窗口Token预算
+
+    与 RateLimiter 按请求数限流不同，本类按每次请求消耗的token数累计，用于遵守服务商的每分钟token数（TPM）限制。
+    窗口内没有任何消耗时，超过预算的单个请求也允许通过，避免大请求永远无法执行。
+    """
+
+    def __init__(self, max_tokens_per_minute: int, time_window: float = 60.0):
+        """
+        初始化Token预算
+
+        Args:
+            max_tokens_per_minute: 在时间窗口内允许消耗的最大token数
+            time_window: 时间窗口大小（秒），默认60秒（1分钟）
+        """
+        self.max_tokens_per_minute = max_tokens_per_minute
+        self.time_window = time_window
+        self._usage: deque[tuple[float, int]] = deque()  # (消耗时间, token数)
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        """移除超过时间窗口的消耗记录（调用方需持有锁）"""
+        cutoff_time = now - self.time_window
+        while self._usage and self._usage[0][0] <= cutoff_time:
+            self._used -= self._usage.popleft()[1]
+
+    def try_consume(self, tokens: int) -> bool:
+        """
+        预算足够时记录一次消耗
+
+        Args:
+            tokens: 本次消耗的token数
+
+        Returns:
+            bool: True表示已记录消耗可以发起请求，False表示需要等待
+        """
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            if self._used and self._used + tokens > self.max_tokens_per_minute:
+                return False
+            self._usage.append((now, tokens))
+            self._used += tokens
+            return True
+
+    def wait_time(self, tokens: int) -> float:
+        """
+        获取预算足够消耗指定token数需要等待的时间（秒）
+
+        Args:
+            tokens: 计划消耗的token数
+
+        Returns:
+            float: 需要等待的秒数，0表示可以立即消耗
+        """
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            # 从最早的记录开始依次过期，直到剩余消耗加上本次不超过预算
+            wait_time = 0.0
+            used = self._used
+            for timestamp, consumed in self._usage:
+                if not used or used + tokens <= self.max_tokens_per_minute:
+                    break
+                used -= consumed
+                wait_time = timestamp + self.time_window - now
+            return max(0.0, wait_time)
+
+    def used(self) -> int:
+        """获取当前时间窗口内已消耗的token数"""
+        with self._lock:
+            self._expire(time.time())
+            return self._used
+
+
+class Histogram:
+    """
+    固定分桶直方图
+
+    用于统计耗时等数值分布，内存占用固定，可近似计算分位数。
+    """
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        初始化直方图
+
+        Args:
+            buckets: 分桶上界（升序），超过最大上界的值计入+Inf桶
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """记录一个观测值"""
+        with self._lock:
+            self.bucket_counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    def percentile(self, q: float) -> float | None:
+        """
+        近似计算分位数（返回所在分桶的上界）
+
+        Args:
+            q: 分位数（0~1）
+
+        Returns:
+            float | None: 分位数近似值，没有观测值时返回None
+        """
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.bucket_counts):
+            cumulative += bucket_count
+            if cumulative >= target:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        """获取直方图快照"""
+        with self._lock:
+            buckets = {f"le_{bound}": count for bound, count in zip(self.buckets, self.bucket_counts)}
+            buckets["le_inf"] = self.bucket_counts[-1]
+            return {
+                "count": self.count,
+                "sum": self.sum,
+                "avg": self.sum / self.count if self.count else 0.0,
+                "max": self.max,
+                "p50": self.percentile(0.5),
+                "p95": self.percentile(0.95),
+                "p99": self.percentile(0.99),
+                "buckets": buckets,
+            }